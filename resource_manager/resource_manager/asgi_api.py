@@ -0,0 +1,22 @@
+"""
+API only ASGI config for resource_manager project, serving resource_manager.settings_api.
+
+It exposes the ASGI callable as a module-level variable named ``application``, warmed up at import so that servers
+loading it before forking their workers (gunicorn --preload -k uvicorn.workers.UvicornWorker
+resource_manager.asgi_api:application) do it once for all of them.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "resource_manager.settings_api")
+
+application = get_asgi_application()
+
+from resource_manager_app.warmup import preload  # noqa: E402
+
+preload()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "resource_manager_app.instrumentation.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -50,6 +52,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "resource_manager_app.idempotency.IdempotencyMiddleware",
 ]
 
 ROOT_URLCONF = "resource_manager.urls"
@@ -76,13 +79,162 @@ WSGI_APPLICATION = "resource_manager.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# The DATABASE_PROFILE environment variable picks one of:
+# - "sqlite-wal" (default): SQLite for single node deployments, in WAL mode so reads don't block the writer, with a
+#   busy timeout and transactions that take the write lock up front so concurrent writers queue instead of failing.
+# - "sqlite": SQLite with its default settings.
+# - "postgresql": PostgreSQL for multi worker deployments, with persistent connections checked before reuse. Every
+#   worker thread keeps its own connection, so workers x threads must fit in the server's max_connections (or in the
+#   pool of a PgBouncer in front of it, in which case set DATABASE_DISABLE_SERVER_SIDE_CURSORS=1).
+# DATABASE_NAME, DATABASE_USER, DATABASE_PASSWORD, DATABASE_HOST and DATABASE_PORT set the connection,
+# DATABASE_TEST_NAME the test database (a file path keeps SQLite test databases out of memory).
+
+DATABASE_PROFILE = os.environ.get("DATABASE_PROFILE", "sqlite-wal")
+
+SQLITE_BUSY_TIMEOUT = int(os.environ.get("DATABASE_BUSY_TIMEOUT", 5000))
+
+DATABASE_PROFILES = {
+    "sqlite": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ.get("DATABASE_NAME", BASE_DIR / "db.sqlite3"),
+    },
+    "sqlite-wal": {
+        "ENGINE": "resource_manager_app.backends.sqlite3",
+        "NAME": os.environ.get("DATABASE_NAME", BASE_DIR / "db.sqlite3"),
+        "OPTIONS": {
+            "timeout": SQLITE_BUSY_TIMEOUT / 1000,
+            "transaction_mode": "IMMEDIATE",
+            "pragmas": {
+                "journal_mode": "WAL",
+                "synchronous": "NORMAL",
+                "busy_timeout": SQLITE_BUSY_TIMEOUT,
+                "cache_size": -20000,
+                "temp_store": "MEMORY",
+                "mmap_size": 134217728,
+            },
+        },
+    },
+    "postgresql": {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("DATABASE_NAME", "resource_manager"),
+        "USER": os.environ.get("DATABASE_USER", "resource_manager"),
+        "PASSWORD": os.environ.get("DATABASE_PASSWORD", ""),
+        "HOST": os.environ.get("DATABASE_HOST", "localhost"),
+        "PORT": os.environ.get("DATABASE_PORT", "5432"),
+        "CONN_MAX_AGE": int(os.environ.get("DATABASE_CONN_MAX_AGE", 600)),
+        "CONN_HEALTH_CHECKS": True,
+        "DISABLE_SERVER_SIDE_CURSORS": os.environ.get("DATABASE_DISABLE_SERVER_SIDE_CURSORS") == "1",
+        "OPTIONS": {
+            "connect_timeout": 5,
+        },
+    },
+}
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        **DATABASE_PROFILES[DATABASE_PROFILE],
+        "TEST": {
+            "NAME": os.environ.get("DATABASE_TEST_NAME"),
+        },
     }
 }
 
+# The trigram lookups of the PostgreSQL search backend are registered by django.contrib.postgres.
+if DATABASE_PROFILE == "postgresql":
+    INSTALLED_APPS.append("django.contrib.postgres")
+
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    "DEFAULT_PAGINATION_CLASS": "resource_manager_app.pagination.ApiPagination",
+    "PAGE_SIZE": 100,
+}
+
+
+# Technician search backend: "auto" picks the index for the database in use (SQLite FTS5 or PostgreSQL pg_trgm),
+# None keeps the icontains filters, or a dotted path to a resource_manager_app.search.BaseSearchBackend subclass.
+
+TECHNICIAN_SEARCH_BACKEND = "auto"
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# The CACHE_BACKEND and CACHE_LOCATION environment variables set the default cache, local memory by default. It holds
+# the versions the API responses are cached under and the token revocations, which every process has to see: local
+# memory is private to each process, so it only suits development with a single one, and "manage.py check --deploy"
+# fails with it. Deployments use a shared backend: "django.core.cache.backends.redis.RedisCache" with a
+# "redis://127.0.0.1:6379" LOCATION, "django.core.cache.backends.memcached.PyMemcacheCache" with a "127.0.0.1:11211"
+# one, "django.core.cache.backends.db.DatabaseCache" with a table name ("manage.py createcachetable" creates it), or
+# "django.core.cache.backends.filebased.FileBasedCache" with a directory for the processes of a single node.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "resource-manager"),
+    }
+}
+
+# Cache used for API list and retrieve responses, and their lifetime in seconds.
+API_CACHE_ALIAS = "default"
+API_CACHE_TIMEOUT = 300
+
+# In-process cache of authentication tokens: maximum entries and lifetime in seconds. TOKEN_CACHE_ALIAS optionally
+# names a cache shared between processes as a second tier. Revoked tokens are counted in that tier, or in the default
+# cache without one, for every process to drop them: with the per process default cache, other workers keep
+# accepting a deleted, rotated or deactivated token for up to TOKEN_CACHE_TTL seconds.
+TOKEN_CACHE_SIZE = 1024
+TOKEN_CACHE_TTL = 60
+TOKEN_CACHE_ALIAS = None
+
+
+# Change feed
+# Entries of the change log younger than CHANGE_FEED_DELAY seconds are held back from /api/changes, so transactions
+# committing out of ID order (PostgreSQL with concurrent writers) can't be skipped; SQLite commits one writer at a
+# time and needs none. prune_changes deletes the entries older than CHANGE_LOG_RETENTION_DAYS days.
+
+CHANGE_FEED_DELAY = 2 if DATABASE_PROFILE == "postgresql" else 0
+CHANGE_LOG_RETENTION_DAYS = 30
+
+
+# Background jobs
+# Run by "manage.py run_jobs" with JOB_WORKERS threads (or processes with --pool process). Failed jobs are retried up
+# to JOB_MAX_ATTEMPTS times, waiting JOB_RETRY_BACKOFF seconds doubled on every attempt and capped at
+# JOB_RETRY_BACKOFF_MAX. Running jobs without a heartbeat for JOB_LEASE_TIMEOUT seconds are considered abandoned by a
+# dead worker and retried. Export jobs write their files to JOB_FILES_DIR.
+
+JOB_WORKERS = 4
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF = 5
+JOB_RETRY_BACKOFF_MAX = 600
+JOB_LEASE_TIMEOUT = 300
+JOB_FILES_DIR = os.environ.get("JOB_FILES_DIR", BASE_DIR / "job_files")
+
+
+# Idempotency keys
+# POST, PUT, PATCH and DELETE requests sent with an Idempotency-Key header and credentials run once per key: retries
+# get the first response replayed for IDEMPOTENCY_KEY_TTL seconds, or wait up to IDEMPOTENCY_WAIT_TIMEOUT seconds for
+# it while the first request is running. Keys held for IDEMPOTENCY_LOCK_TIMEOUT seconds without a response are
+# considered lost with their worker and taken over. prune_idempotency_keys deletes the expired keys.
+
+IDEMPOTENCY_KEY_TTL = 86400
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+
+# Instrumentation
+# Request metrics are exposed at /metrics in the Prometheus text format, to the addresses and networks of
+# METRICS_ALLOWED_IPS only (the comma separated METRICS_ALLOWED_IPS environment variable, loopback by default; empty,
+# nobody). They are parsed at startup, which invalid ones stop. Requests slower than SLOW_REQUEST_THRESHOLD seconds are
+# logged by the "resource_manager_app.slow_requests" logger with their SLOW_REQUEST_LOGGED_QUERIES slowest queries;
+# None disables the log.
+
+METRICS_ALLOWED_IPS = [network.strip() for network in os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+                       if network.strip()]
+SLOW_REQUEST_THRESHOLD = None
+SLOW_REQUEST_LOGGED_QUERIES = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -0,0 +1,52 @@
+"""
+API only settings for the resource_manager project, used by the resource_manager.wsgi_api and
+resource_manager.asgi_api entry points.
+
+The token authenticated API needs neither the admin nor the sessions, messages and static files apps, nor their
+middleware and template context processors, which every worker would otherwise import at startup and every request
+would run through. manage.py, migrations and the admin keep using resource_manager.settings.
+"""
+
+from .settings import *  # noqa
+
+INSTALLED_APPS = [
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "rest_framework",
+    "rest_framework.authtoken",
+    "resource_manager_app",
+]
+
+if DATABASE_PROFILE == "postgresql":  # noqa
+    INSTALLED_APPS.append("django.contrib.postgres")
+
+# Requests authenticate with tokens, so there are no sessions or cookies to protect against CSRF and clickjacking.
+MIDDLEWARE = [
+    "resource_manager_app.instrumentation.InstrumentationMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "resource_manager_app.idempotency.IdempotencyMiddleware",
+]
+
+ROOT_URLCONF = "resource_manager.urls_api"
+
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [],
+        "APP_DIRS": True,
+        "OPTIONS": {
+            "context_processors": [
+                "django.template.context_processors.request",
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = "resource_manager.wsgi_api.application"
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,  # noqa
+    "DEFAULT_AUTHENTICATION_CLASSES": ["resource_manager_app.authentication.CachedTokenAuthentication"],
+    "DEFAULT_RENDERER_CLASSES": ["rest_framework.renderers.JSONRenderer"],
+}
@@ -0,0 +1,8 @@
+"""resource_manager API only URL Configuration, the API and metrics of resource_manager.urls without the admin."""
+from django.urls import path, include
+from resource_manager_app.instrumentation import metrics_view
+
+urlpatterns = [
+    path("metrics", metrics_view),
+    path("api/", include("resource_manager_app.urls")),
+]
@@ -0,0 +1,21 @@
+"""
+API only WSGI config for resource_manager project, serving resource_manager.settings_api.
+
+It exposes the WSGI callable as a module-level variable named ``application``, warmed up at import so that servers
+loading it before forking their workers (gunicorn --preload resource_manager.wsgi_api) do it once for all of them.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.1/howto/deployment/wsgi/
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "resource_manager.settings_api")
+
+application = get_wsgi_application()
+
+from resource_manager_app.warmup import preload  # noqa: E402
+
+preload()
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ResourceManagerAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "resource_manager_app"
+
+    def ready(self):
+        from . import checks, signals, tasks  # noqa
+        from .instrumentation import get_metrics_networks
+        get_metrics_networks()
@@ -0,0 +1,191 @@
+"""API async views."""
+
+import json
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound, ParseError
+from rest_framework.request import Request
+from .authentication import CachedTokenAuthentication
+from .models import Technician, ResourceAssignment, StaleVersionError
+from .pagination import ApiPagination
+from .serializers import TechnicianSerializer, ResourceAssignmentSerializer
+from .views import (PreconditionFailed, check_if_match, create_assignment, delete_assignment, get_version_etag,
+                    update_assignment)
+
+
+class AsyncApiView(View):
+    """
+    Base class of the views served natively under ASGI. Reads go through the async ORM and requests authenticate
+    with the async path of CachedTokenAuthentication, so they don't hold a worker thread while waiting. Errors are
+    rendered like DRF does.
+    """
+
+    authentication_class = CachedTokenAuthentication
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        """
+        Returns the view exempt from CSRF checks, as DRF's APIView does: requests authenticate with tokens, never with
+        the session cookie CSRF protects.
+        """
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        """Authenticates the request and turns API exceptions into JSON error responses."""
+        handler = getattr(self, request.method.lower(), None)
+        if request.method.lower() not in self.http_method_names or handler is None:
+            return await self.http_method_not_allowed(request, *args, **kwargs)
+
+        try:
+            authentication = await self.authentication_class().aauthenticate(request)
+            if authentication is None:
+                raise NotAuthenticated()
+            request.user, request.auth = authentication
+            return await handler(request, *args, **kwargs)
+        except APIException as exception:
+            return self.handle_exception(exception)
+
+    def handle_exception(self, exception):
+        """Returns the error response for the exception, as DRF's default exception handler does."""
+        data = exception.detail if isinstance(exception.detail, (list, dict)) else {"detail": exception.detail}
+        response = JsonResponse(data, status=exception.status_code, safe=False)
+        if exception.status_code == status.HTTP_401_UNAUTHORIZED:
+            response["WWW-Authenticate"] = self.authentication_class().authenticate_header(None)
+        return response
+
+    @staticmethod
+    def get_data(request):
+        """Returns the parsed JSON body."""
+        try:
+            return json.loads(request.body or b"{}")
+        except ValueError as exception:
+            raise ParseError(f"JSON parse error - {exception}")
+
+    @staticmethod
+    def versioned_response(data, **kwargs):
+        """Returns the JSON response of a versioned row, with the ETag of its version."""
+        response = JsonResponse(data, **kwargs)
+        response["ETag"] = get_version_etag(data["version"])
+        return response
+
+    @staticmethod
+    async def get_object(queryset, pk):
+        """Returns the row with the given primary key, raising NotFound if it doesn't exist."""
+        try:
+            return await queryset.aget(pk=pk)
+        except queryset.model.DoesNotExist:
+            raise NotFound()
+
+    async def paginate(self, request, queryset, serializer_class):
+        """Returns the paginated response for the queryset, using the same pagination as the sync views."""
+        paginator = ApiPagination()
+        page = await paginator.apaginate_queryset(queryset, Request(request), view=self)
+        data = serializer_class(page, many=True).data
+        return JsonResponse(paginator.get_paginated_response(data).data)
+
+
+class AsyncTechnicianListView(AsyncApiView):
+    """Lists technicians."""
+
+    http_method_names = ["get"]
+
+    async def get(self, request):
+        """Technicians page."""
+        return await self.paginate(request, Technician.objects.all(), TechnicianSerializer)  # noqa
+
+
+class AsyncTechnicianDetailView(AsyncApiView):
+    """Retrieves technicians."""
+
+    http_method_names = ["get"]
+
+    async def get(self, request, pk):
+        """Technician detail."""
+        technician = await self.get_object(Technician.objects.all(), pk)  # noqa
+        return self.versioned_response(TechnicianSerializer(technician).data)
+
+
+@sync_to_async
+@transaction.atomic
+def save_assignment(pk, data, partial=False, if_match=None):
+    """
+    Validates and saves an assignment in a single transaction, returning its representation. Creates it if pk is None,
+    otherwise the row must have the version named by the If-Match header, if any. The ORM can't run transactions
+    across awaits yet, so writes run in a thread.
+    """
+    instance = None
+    if pk is not None:
+        instance = ResourceAssignment.objects.select_for_update().select_related("technician").filter(  # noqa
+            pk=pk).first()
+        if instance is None:
+            raise NotFound()
+        check_if_match(if_match, instance)
+
+    serializer = ResourceAssignmentSerializer(instance, data=data, partial=partial)
+    serializer.is_valid(raise_exception=True)
+    if instance is None:
+        create_assignment(serializer)
+    else:
+        try:
+            update_assignment(serializer)
+        except StaleVersionError:
+            raise PreconditionFailed()
+    return serializer.data
+
+
+@sync_to_async
+@transaction.atomic
+def remove_assignment(pk, if_match=None):
+    """Deletes an assignment in a single transaction, if it has the version named by the If-Match header, if any."""
+    instance = ResourceAssignment.objects.select_for_update().select_related("technician").filter(pk=pk).first()  # noqa
+    if instance is None:
+        raise NotFound()
+    check_if_match(if_match, instance)
+    delete_assignment(instance)
+
+
+class AsyncResourceAssignmentListView(AsyncApiView):
+    """Lists and creates resource assignments."""
+
+    http_method_names = ["get", "post"]
+    ordering = ("id",)
+
+    async def get(self, request):
+        """Resource assignments page."""
+        return await self.paginate(request, ResourceAssignment.objects.all(), ResourceAssignmentSerializer)  # noqa
+
+    async def post(self, request):
+        """Creates a resource assignment."""
+        data = await save_assignment(None, self.get_data(request))
+        return self.versioned_response(data, status=status.HTTP_201_CREATED)
+
+
+class AsyncResourceAssignmentDetailView(AsyncApiView):
+    """Retrieves, updates and deletes resource assignments."""
+
+    http_method_names = ["get", "put", "patch", "delete"]
+
+    async def get(self, request, pk):
+        """Resource assignment detail."""
+        assignment = await self.get_object(ResourceAssignment.objects.all(), pk)  # noqa
+        return self.versioned_response(ResourceAssignmentSerializer(assignment).data)
+
+    async def put(self, request, pk):
+        """Updates a resource assignment."""
+        data = await save_assignment(pk, self.get_data(request), if_match=request.headers.get("If-Match"))
+        return self.versioned_response(data)
+
+    async def patch(self, request, pk):
+        """Partially updates a resource assignment."""
+        data = await save_assignment(pk, self.get_data(request), partial=True,
+                                     if_match=request.headers.get("If-Match"))
+        return self.versioned_response(data)
+
+    async def delete(self, request, pk):
+        """Deletes a resource assignment."""
+        await remove_assignment(pk, if_match=request.headers.get("If-Match"))
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,180 @@
+"""API authentication."""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+
+class TokenCache:
+    """
+    Thread safe, size bounded LRU mapping token keys to their users for a limited time. Entries keep the revocation
+    count of their token when they were cached, and are dropped once it changes.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, revocations=0):
+        """Returns the cached user for the key, or None if it's missing, expired or revoked since it was cached."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            user, expires_at, cached_revocations = entry
+            if expires_at < time.monotonic() or cached_revocations != revocations:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return user
+
+    def set(self, key, user, revocations=0):
+        """Caches the user for the key, evicting the least recently used entry if full."""
+        with self.lock:
+            self.entries[key] = (user, time.monotonic() + self.ttl, revocations)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        """Removes the key."""
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def discard_user(self, user_id):
+        """Removes every key belonging to the user."""
+        with self.lock:
+            for key in [key for key, (user, _, _) in self.entries.items() if user.pk == user_id]:
+                del self.entries[key]
+
+    def clear(self):
+        """Removes every key."""
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache(max_size=getattr(settings, "TOKEN_CACHE_SIZE", 1024),
+                         ttl=getattr(settings, "TOKEN_CACHE_TTL", 60))
+
+
+def get_shared_cache():
+    """Returns the cache set in settings.TOKEN_CACHE_ALIAS to share tokens between processes, or None."""
+    alias = getattr(settings, "TOKEN_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def get_shared_cache_key(key):
+    """Returns the shared cache key for a token, hashed so tokens don't appear in the cache."""
+    return f"auth-token:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def get_revocation_cache():
+    """
+    Returns the cache counting the revocations of every token, the shared tier if there's one or the default cache,
+    through which every process learns about the tokens deleted or changed by another one.
+    """
+    shared_cache = get_shared_cache()
+    return shared_cache if shared_cache is not None else caches["default"]
+
+
+def get_revocation_key(key):
+    """Returns the cache key of a token's revocation count."""
+    return f"{get_shared_cache_key(key)}:revocations"
+
+
+def forget_token(key):
+    """
+    Removes a token from every cache tier and counts a revocation, so the other processes drop it from their LRU on
+    their next lookup. The count lives as long as the LRU entries it outdates.
+    """
+    token_cache.discard(key)
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        shared_cache.delete(get_shared_cache_key(key))
+    revocation_cache = get_revocation_cache()
+    revocation_key = get_revocation_key(key)
+    revocation_cache.add(revocation_key, 0, token_cache.ttl)
+    try:
+        revocation_cache.incr(revocation_key)
+    except ValueError:
+        # Expired in between.
+        revocation_cache.set(revocation_key, 1, token_cache.ttl)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that keeps the token's user in an in-process LRU, and optionally in a shared cache, so hot
+    endpoints don't run the Token join User query on every request. Every lookup reads the token's revocation count
+    from the shared tier or the default cache, so deleted, rotated and deactivated tokens are rejected by every
+    process right away. That takes a default cache shared between processes when there's no shared tier: with a per
+    process one, other workers keep accepting a revoked token for up to settings.TOKEN_CACHE_TTL seconds.
+    """
+
+    def authenticate_credentials(self, key):
+        """Looks the token up in the caches before falling back to the database."""
+        revocations = get_revocation_cache().get(get_revocation_key(key), 0)
+        user = token_cache.get(key, revocations)
+        shared_cache = get_shared_cache()
+        if user is None and shared_cache is not None:
+            user = shared_cache.get(get_shared_cache_key(key))
+            if user is not None:
+                token_cache.set(key, user, revocations)
+
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, revocations)
+            if shared_cache is not None:
+                shared_cache.set(get_shared_cache_key(key), user, token_cache.ttl)
+            return user, token
+
+        return user, Token(key=key, user=user)
+
+    async def aauthenticate(self, request):
+        """
+        Async version of authenticate() for the async views, which reads the token with the async ORM on cache
+        misses. Returns None if the request has no token.
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed(_("Invalid token header. Token string should not contain spaces."))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed(_("Invalid token header. Token string should not contain invalid characters."))
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        """Async version of authenticate_credentials()."""
+        revocations = await get_revocation_cache().aget(get_revocation_key(key), 0)
+        user = token_cache.get(key, revocations)
+        shared_cache = get_shared_cache()
+        if user is None and shared_cache is not None:
+            user = await shared_cache.aget(get_shared_cache_key(key))
+            if user is not None:
+                token_cache.set(key, user, revocations)
+
+        if user is None:
+            try:
+                token = await self.get_model().objects.select_related("user").aget(key=key)  # noqa
+            except self.get_model().DoesNotExist:  # noqa
+                raise AuthenticationFailed(_("Invalid token."))
+            if not token.user.is_active:
+                raise AuthenticationFailed(_("User inactive or deleted."))
+            user = token.user
+            token_cache.set(key, user, revocations)
+            if shared_cache is not None:
+                await shared_cache.aset(get_shared_cache_key(key), user, token_cache.ttl)
+            return user, token
+
+        return user, Token(key=key, user=user)
@@ -0,0 +1,32 @@
+"""SQLite database backend tuned for concurrent writers on a single node."""
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend taking two extra OPTIONS: "pragmas", a dict of PRAGMA statements run on every new connection
+    (journal_mode, synchronous, busy_timeout...), and "transaction_mode", used to begin transactions. With
+    "IMMEDIATE" a transaction takes the write lock when it starts, so concurrent writers wait for each other within
+    the busy timeout instead of failing with "database is locked" when a read lock can't be upgraded.
+    """
+
+    transaction_mode = None
+
+    def get_new_connection(self, conn_params):
+        """Opens the connection without the extra options and runs the pragmas."""
+        conn_params = dict(conn_params)
+        pragmas = conn_params.pop("pragmas", {})
+        self.transaction_mode = conn_params.pop("transaction_mode", None)
+
+        connection = super().get_new_connection(conn_params)
+        for name, value in pragmas.items():
+            connection.execute(f"PRAGMA {name} = {value}")
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        """Begins the transaction in the configured mode."""
+        if self.transaction_mode:
+            self.cursor().execute(f"BEGIN {self.transaction_mode}")
+        else:
+            super()._start_transaction_under_autocommit()
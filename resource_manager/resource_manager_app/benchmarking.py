@@ -0,0 +1,156 @@
+"""Benchmark helpers: throwaway databases, data generation and timing."""
+
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from django.db import connection
+from django.db.models import Q
+from .models import Technician, ResourceAssignment, BranchOffice, Resource
+
+
+class Timing(float):
+    """Median of the elapsed seconds of repeated runs, keeping their interquartile range as spread."""
+
+    def __new__(cls, median, spread=0.0):
+        timing = super().__new__(cls, median)
+        timing.spread = spread
+        return timing
+
+
+@contextmanager
+def benchmark_database():
+    """Runs the block against a freshly created test database that is destroyed afterwards."""
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def seed(branch_offices=10, technicians=1000, resources=50, assignments_per_technician=3, inactive_ratio=0.1,
+         batch_size=5000, random_seed=0):
+    """
+    Fills the database with the given number of rows using bulk inserts. Technician codes and ID numbers are
+    derived from their position, so seeded technicians can be looked up predictably.
+    """
+    generator = random.Random(random_seed)
+    assignments_per_technician = min(assignments_per_technician, resources)
+
+    BranchOffice.objects.bulk_create([  # noqa
+        BranchOffice(name=f"Branch {i}", address=f"Street {i}", nit=f"{900000000 + i}", phone=f"{3000000 + i}")
+        for i in range(branch_offices)
+    ], batch_size=batch_size)
+    Resource.objects.bulk_create([Resource(name=f"Resource {i}") for i in range(resources)],  # noqa
+                                 batch_size=batch_size)
+    branch_office_ids = list(BranchOffice.objects.values_list("pk", flat=True))  # noqa
+    resource_ids = list(Resource.objects.values_list("pk", flat=True))  # noqa
+
+    for start in range(0, technicians, batch_size):
+        batch = [
+            Technician(
+                name=f"Name{i}",
+                last_name=f"LastName{i}",
+                id_number=f"{1000000000 + i}",
+                code=technician_code(i),
+                description="Seeded technician",
+                base_salary=float(generator.randint(1000, 5000)),
+                active=generator.random() >= inactive_ratio,
+                branch_office_id=generator.choice(branch_office_ids),
+            )
+            for i in range(start, min(start + batch_size, technicians))
+        ]
+        assignments = []
+        for technician in Technician.objects.bulk_create(batch):  # noqa
+            for resource_id in generator.sample(resource_ids, assignments_per_technician):
+                quantity = generator.randint(1, 10)
+                technician.resource_quantity += quantity
+                assignments.append(ResourceAssignment(technician=technician, resource_id=resource_id,
+                                                      quantity=quantity, active=technician.active))
+        Technician.all_objects.bulk_update(batch, ["resource_quantity"], batch_size=batch_size)  # noqa
+        ResourceAssignment.objects.bulk_create(assignments, batch_size=batch_size)  # noqa
+
+
+def payroll_rows(technicians=1000000, branch_offices=50, random_seed=0):
+    """
+    Returns (branch_office_id, base_salary, resource_quantity) rows shaped like the seeded technicians, to benchmark
+    projections at sizes too large to seed.
+    """
+    generator = random.Random(random_seed)
+    return [(generator.randint(1, branch_offices), float(generator.randint(1000, 5000)), generator.randint(0, 30))
+            for _ in range(technicians)]
+
+
+def technician_code(number):
+    """Returns the code given to the seeded technician with the given number."""
+    return f"TEC{number:08d}"
+
+
+def summarize(timings):
+    """Returns the Timing of the elapsed seconds of repeated runs."""
+    if len(timings) < 2:
+        return Timing(statistics.median(timings))
+    first_quartile, _, third_quartile = statistics.quantiles(timings, n=4)
+    return Timing(statistics.median(timings), third_quartile - first_quartile)
+
+
+def measure(function, repeat=5):
+    """Runs the function repeat times and returns the median of the elapsed seconds, as a Timing."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def time_calls(calls):
+    """Runs every call once and returns the median of their elapsed seconds, as a Timing, for unrepeatable calls."""
+    timings = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def percentile(values, fraction):
+    """Returns the value below which the given fraction of the values falls."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def compare_results(baseline, current, threshold):
+    """
+    Compares two benchmark result dicts, mapping names to {"value", "unit"} and the "spread" of repeated timings, and
+    returns the regressions beyond the threshold (0.2 is 20%) as (name, baseline value, current value, relative
+    change). Throughputs ("/s" units) regress when they go down, everything else when it goes up. Changes within the
+    two runs' combined spread are noise rather than regressions, whatever their size. Benchmarks missing in either side
+    are skipped.
+    """
+    regressions = []
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]["value"]
+        if not old:
+            # Nothing to scale by, only a count appearing from zero (errors) is reported.
+            if result["value"] > 0 and not result["unit"].endswith("/s"):
+                regressions.append((name, old, result["value"], float("inf")))
+            continue
+        change = (result["value"] - old) / old
+        if result["unit"].endswith("/s"):
+            change = -change
+        noise = baseline[name].get("spread", 0.0) + result.get("spread", 0.0)
+        if change > threshold and abs(result["value"] - old) > noise:
+            regressions.append((name, old, result["value"], change))
+    return regressions
+
+
+def icontains_search(queryset, term, fields):
+    """Filters the queryset the way DRF's SearchFilter does, with icontains over the fields joined by OR."""
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f"{field}__icontains": term})
+    return queryset.filter(condition)
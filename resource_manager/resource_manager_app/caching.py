@@ -0,0 +1,115 @@
+"""API response caching."""
+
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def get_cache():
+    """Returns the cache configured in settings.API_CACHE_ALIAS."""
+    return caches[getattr(settings, "API_CACHE_ALIAS", "default")]
+
+
+def get_version_key(model):
+    """Returns the cache key holding the given model's version."""
+    return f"api-version:{model._meta.label_lower}"  # noqa
+
+
+def get_versions(models):
+    """
+    Returns the current version of every model. Missing versions (never set or evicted) start from the current time,
+    so entries cached under an evicted version can't be served again. Versions have to be shared by every process for
+    writes to invalidate their responses, which the check_shared_caches deployment check enforces.
+    """
+    cache = get_cache()
+    keys = [get_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(models):
+    """Increments the version of every model, which invalidates every response depending on them."""
+    cache = get_cache()
+    for model in models:
+        key = get_version_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate(*models):
+    """
+    Invalidates the responses depending on the given models right away and once more when the current transaction
+    commits, so a response read before the commit can't stay cached under the new version.
+    """
+    bump_versions(models)
+    transaction.on_commit(lambda: bump_versions(models))
+
+
+class CachedResponseMixin:
+    """
+    Caches list and retrieve responses. Keys include the full URL, the renderer and the versions of the models the
+    response depends on, and double as ETags so clients can revalidate with If-None-Match and get 304s.
+    """
+
+    cache_models = ()
+    cache_timeout = getattr(settings, "API_CACHE_TIMEOUT", 300)
+
+    def get_cache_models(self):
+        """Returns the models whose changes invalidate the response: the view's ones and the expanded relations."""
+        models = list(self.cache_models)
+        if hasattr(self, "get_expand"):
+            models.extend(self.expand_fields[name] for name in self.get_expand())  # noqa
+        return sorted(set(models), key=lambda model: model._meta.label_lower)  # noqa
+
+    def get_cache_key(self, request):
+        """Returns a digest of everything the response depends on."""
+        models = self.get_cache_models()
+        parts = [
+            request.build_absolute_uri(),
+            request.accepted_renderer.format,
+            *[f"{model._meta.label_lower}={version}" for model, version in zip(models, get_versions(models))],  # noqa
+        ]
+        return hashlib.sha1("\n".join(parts).encode()).hexdigest()
+
+    def get_etag(self, key, data):  # noqa
+        """Returns the ETag of the response cached under the key."""
+        return f'"{key}"'
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        """Answers with 304, the cached data or the handler's response, which is then cached."""
+        key = self.get_cache_key(request)
+        cache = get_cache()
+        data = cache.get(f"api-response:{key}")
+        if data is not None:
+            response = Response(data)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache.set(f"api-response:{key}", data, self.cache_timeout)
+
+        etag = self.get_etag(key, data)
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        response["ETag"] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """Cached list."""
+        return self.get_cached_response(super().list, request, *args, **kwargs)  # noqa
+
+    def retrieve(self, request, *args, **kwargs):
+        """Cached retrieve."""
+        return self.get_cached_response(super().retrieve, request, *args, **kwargs)  # noqa
@@ -0,0 +1,108 @@
+"""Change log and incremental sync feed."""
+
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Change, ChangeLogWatermark, Technician, ResourceAssignment, BranchOffice, Resource
+from .serializers import (TechnicianSerializer, ResourceAssignmentSerializer, BranchOfficeSerializer,
+                          ResourceDetailSerializer, get_row_serializer)
+
+SYNCED_MODELS = {
+    "technician": (Technician, TechnicianSerializer),
+    "resource_assignment": (ResourceAssignment, ResourceAssignmentSerializer),
+    "branch_office": (BranchOffice, BranchOfficeSerializer),
+    "resource": (Resource, ResourceDetailSerializer),
+}
+
+MODEL_NAMES = {model: name for name, (model, serializer_class) in SYNCED_MODELS.items()}
+
+
+class CursorExpired(Exception):
+    """Raised when the changes following a cursor were pruned from the log."""
+
+
+def record_changes(model, object_ids, action):
+    """Appends a change of every object to the log with a single INSERT."""
+    name = MODEL_NAMES[model]
+    Change.objects.bulk_create([Change(model=name, object_id=object_id, action=action)  # noqa
+                                for object_id in object_ids])
+
+
+def settled(entries):
+    """
+    Leaves out the entries younger than settings.CHANGE_FEED_DELAY seconds. IDs are taken before commit, so on
+    databases running concurrent writers an entry can become visible after one with a higher ID; the delay gives
+    those transactions time to commit before the feed moves past them.
+    """
+    delay = getattr(settings, "CHANGE_FEED_DELAY", 0)
+    if delay:
+        entries = entries.filter(changed_at__lte=timezone.now() - timedelta(seconds=delay))
+    return entries
+
+
+def get_cursor():
+    """Returns the ID of the last settled change, the cursor of a sync starting now."""
+    return settled(Change.objects.order_by("-id")).values_list("id", flat=True).first() or 0  # noqa
+
+
+def read_changes(since, limit, models=None):
+    """
+    Returns the changes after the cursor, reading up to limit log entries, as (changes, cursor, has_more). Changes
+    are coalesced by object: each changed object appears once, as its current row if it's still active or as a deleted
+    ID, so a sync costs one query per changed model whatever the number of log entries or the size of the tables.
+    Raises CursorExpired if entries after the cursor were pruned.
+    """
+    pruned_id = ChangeLogWatermark.objects.values_list("pruned_id", flat=True).first() or 0  # noqa
+    if since < pruned_id:
+        raise CursorExpired()
+
+    entries = settled(Change.objects.filter(id__gt=since))  # noqa
+    if models:
+        entries = entries.filter(model__in=models)
+    entries = list(entries.order_by("id").values_list("id", "model", "object_id", "action")[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    last_actions = defaultdict(dict)
+    for _, name, object_id, action in entries:
+        last_actions[name][object_id] = action
+
+    changes = {}
+    for name, actions in sorted(last_actions.items()):
+        model, serializer_class = SYNCED_MODELS[name]
+        row_serializer = get_row_serializer(serializer_class)
+        # Objects deleted after the last entry read are missing here, their deletion comes with a later batch.
+        rows = row_serializer.get_queryset(model.objects.filter(  # noqa
+            pk__in=[object_id for object_id, action in actions.items() if action != Change.DELETE]).order_by("pk"))
+        upserted = row_serializer.to_representation(rows)
+        # Archived objects are left out by the active managers and synced as deletions too.
+        found = {row["id"] for row in upserted}
+        changes[name] = {
+            "upserted": upserted,
+            "deleted": sorted(object_id for object_id in actions if object_id not in found),
+        }
+
+    cursor = entries[-1][0] if entries else since
+    return changes, cursor, has_more
+
+
+def prune_changes(days):
+    """
+    Deletes the log entries older than the given number of days, except the last one, which get_cursor() hands to new
+    syncs, and raises the watermark to the highest deleted ID so the cursors before it expire. Returns the number of
+    deleted entries.
+    """
+    with transaction.atomic():
+        last_id = Change.objects.order_by("-id").values_list("id", flat=True).first() or 0  # noqa
+        expired = Change.objects.filter(changed_at__lt=timezone.now() - timedelta(days=days), id__lt=last_id)  # noqa
+        pruned_id = expired.aggregate(pruned_id=Max("id"))["pruned_id"]
+        if pruned_id is None:
+            return 0
+        deleted, _ = expired.delete()
+        ChangeLogWatermark.objects.get_or_create(pk=1)  # noqa
+        ChangeLogWatermark.objects.filter(pk=1).update(pruned_id=Greatest("pruned_id", Value(pruned_id)))  # noqa
+    return deleted
@@ -0,0 +1,23 @@
+"""System checks."""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_caches(app_configs, **kwargs):  # noqa
+    """
+    Fails the deployment checks if the cache of the API responses' versions or the one of the token revocations is
+    local memory: a write would only invalidate the responses cached by its own process, and a revoked token would
+    only be rejected by the process revoking it.
+    """
+    aliases = {getattr(settings, "API_CACHE_ALIAS", "default"),
+               getattr(settings, "TOKEN_CACHE_ALIAS", None) or "default"}
+    return [
+        Error(f"The {alias!r} cache is local to each process.",
+              hint="Set CACHES to a backend shared between the processes, such as Redis, Memcached or the database.",
+              id="resource_manager_app.E001")
+        for alias in sorted(aliases) if isinstance(caches[alias], LocMemCache)
+    ]
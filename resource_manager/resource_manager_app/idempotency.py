@@ -0,0 +1,223 @@
+"""Idempotency-Key support for the write requests."""
+
+import asyncio
+import hashlib
+import tempfile
+import time
+import zlib
+from datetime import timedelta
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.urls import Resolver404, get_resolver
+from django.utils import timezone
+from rest_framework import status
+from .models import IdempotencyKey
+
+IDEMPOTENT_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.01
+MAX_POLL_INTERVAL = 0.25
+CHUNK_SIZE = 64 * 1024
+
+CLAIMED = object()
+
+
+def prune_idempotency_keys():
+    """Deletes the expired keys. Returns their number."""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()  # noqa
+    return deleted
+
+
+class IdempotencyMiddleware:
+    """
+    Runs POST, PUT, PATCH and DELETE requests carrying an Idempotency-Key header once per key and credentials. The
+    first request claims the key by inserting its row and stores its response there, retries get that response
+    replayed without running the write again, and retries arriving while the first request is still running wait for
+    it. Keys are scoped by the credentials of the request, or for anonymous ones by their session cookie or else their
+    address and user agent, so a key never replays another client's response. Works in sync and async mode, so async
+    views keep running natively under ASGI.
+
+    Responses are kept settings.IDEMPOTENCY_KEY_TTL seconds. Retries wait settings.IDEMPOTENCY_WAIT_TIMEOUT seconds at
+    most before getting a 409, and a key whose request ran for more than settings.IDEMPOTENCY_LOCK_TIMEOUT seconds
+    without storing its response is considered lost with its worker and taken over. Server errors and streaming
+    responses aren't stored: their key is released for the next retry.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.ttl = timedelta(seconds=getattr(settings, "IDEMPOTENCY_KEY_TTL", 86400))
+        self.lock_timeout = timedelta(seconds=getattr(settings, "IDEMPOTENCY_LOCK_TIMEOUT", 60))
+        self.wait_timeout = getattr(settings, "IDEMPOTENCY_WAIT_TIMEOUT", 10)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Handles a sync request."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not self.is_idempotent(request):
+            return self.get_response(request)
+        error = self.check_key(request)
+        if error is not None:
+            return error
+
+        key, fingerprint = self.get_hashes(request)
+        deadline = time.monotonic() + self.wait_timeout
+        delay = POLL_INTERVAL
+        while (result := self.acquire(key, fingerprint)) is None:
+            if time.monotonic() >= deadline:
+                return self.still_running(request)
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_POLL_INTERVAL)
+        if result is not CLAIMED:
+            return self.answer(request, result, fingerprint)
+
+        try:
+            response = self.get_response(request)
+        except Exception:
+            self.release(key)
+            raise
+        self.store(key, response)
+        return response
+
+    async def __acall__(self, request):
+        """Handles an async request."""
+        if not self.is_idempotent(request):
+            return await self.get_response(request)
+        error = self.check_key(request)
+        if error is not None:
+            return error
+
+        key, fingerprint = self.get_hashes(request)
+        deadline = time.monotonic() + self.wait_timeout
+        delay = POLL_INTERVAL
+        while (result := await sync_to_async(self.acquire)(key, fingerprint)) is None:
+            if time.monotonic() >= deadline:
+                return self.still_running(request)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_POLL_INTERVAL)
+        if result is not CLAIMED:
+            return self.answer(request, result, fingerprint)
+
+        try:
+            response = await self.get_response(request)
+        except Exception:
+            await sync_to_async(self.release)(key)
+            raise
+        await sync_to_async(self.store)(key, response)
+        return response
+
+    @staticmethod
+    def is_idempotent(request):
+        """Tells whether the request has a key to honour."""
+        return request.method in IDEMPOTENT_METHODS and "Idempotency-Key" in request.headers
+
+    @staticmethod
+    def check_key(request):
+        """Returns a 400 response if the key is empty or too long, None otherwise."""
+        key = request.headers["Idempotency-Key"]
+        if 0 < len(key) <= MAX_KEY_LENGTH:
+            return None
+        return JsonResponse({"detail": f"Idempotency-Key must have 1 to {MAX_KEY_LENGTH} characters."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+    @staticmethod
+    def get_scope(request):
+        """Returns what identifies the client sending the request, which its keys are scoped by."""
+        if "Authorization" in request.headers:
+            return request.headers["Authorization"]
+        session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if session_key:
+            return f"session:{session_key}"
+        return f"client:{request.META.get('REMOTE_ADDR', '')} {request.headers.get('User-Agent', '')}"
+
+    @staticmethod
+    def get_hashes(request):
+        """
+        Returns the hash identifying the key of the request's client, and the fingerprint of the request telling
+        retries from other requests reusing the key. Bodies over settings.DATA_UPLOAD_MAX_MEMORY_SIZE, which views
+        stream instead of loading, are hashed in chunks while spooled to a temporary file the view then reads.
+        """
+        scope = IdempotencyMiddleware.get_scope(request)
+        key = hashlib.sha256(f"{scope}\n{request.headers['Idempotency-Key']}".encode())
+        fingerprint = hashlib.sha256(f"{request.method} {request.get_full_path()}\n".encode())
+        try:
+            fingerprint.update(request.body)
+        except RequestDataTooBig:
+            spooled = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+            while chunk := request.read(CHUNK_SIZE):
+                fingerprint.update(chunk)
+                spooled.write(chunk)
+            spooled.seek(0)
+            request._stream = spooled  # noqa
+            request._read_started = False  # noqa
+        return key.hexdigest(), fingerprint.hexdigest()
+
+    def acquire(self, key, fingerprint):
+        """
+        Claims the key for the request, returning CLAIMED. Returns the key's row if it holds a response or another
+        request's fingerprint, or None while another request runs with it.
+        """
+        while True:
+            now = timezone.now()
+            try:
+                with transaction.atomic():
+                    IdempotencyKey.objects.create(key=key, fingerprint=fingerprint,  # noqa
+                                                  expires_at=now + self.lock_timeout)
+                return CLAIMED
+            except IntegrityError:
+                record = IdempotencyKey.objects.filter(key=key).first()  # noqa
+            if record is None:
+                # Released by its request meanwhile.
+                continue
+            if record.expires_at <= now:
+                IdempotencyKey.objects.filter(key=key, expires_at__lte=now).delete()  # noqa
+                continue
+            if record.status_code is None and record.fingerprint == fingerprint:
+                return None
+            return record
+
+    def store(self, key, response):
+        """Stores the response of the request holding the key, or releases the key if it can't be replayed."""
+        if response.streaming or response.status_code >= 500:
+            self.release(key)
+            return
+        IdempotencyKey.objects.filter(key=key).update(  # noqa
+            status_code=response.status_code, headers=dict(response.items()), body=zlib.compress(response.content),
+            expires_at=timezone.now() + self.ttl)
+
+    @staticmethod
+    def release(key):
+        """Deletes the key's row, so the next retry runs the request."""
+        IdempotencyKey.objects.filter(key=key).delete()  # noqa
+
+    def answer(self, request, record, fingerprint):
+        """Replays the stored response, or answers 422 if the key was used by another request."""
+        self.resolve(request)
+        if record.fingerprint != fingerprint:
+            return JsonResponse({"detail": "Idempotency-Key was already used for a different request."},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        response = HttpResponse(zlib.decompress(record.body), status=record.status_code, headers=record.headers)
+        response["Idempotent-Replayed"] = "true"
+        return response
+
+    def still_running(self, request):
+        """Returns the response to retries that waited too long for the request holding the key."""
+        self.resolve(request)
+        return JsonResponse({"detail": "A request with this Idempotency-Key is still running."},
+                            status=status.HTTP_409_CONFLICT, headers={"Retry-After": "1"})
+
+    @staticmethod
+    def resolve(request):
+        """Resolves the view of requests answered without reaching it, so the metrics count them under it."""
+        try:
+            request.resolver_match = get_resolver(getattr(request, "urlconf", None)).resolve(request.path_info)
+        except Resolver404:
+            pass
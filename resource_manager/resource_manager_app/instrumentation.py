@@ -0,0 +1,284 @@
+"""Per request instrumentation and Prometheus metrics."""
+
+import ipaddress
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger("resource_manager_app.slow_requests")
+
+current_request_metrics = ContextVar("current_request_metrics", default=None)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+class RequestMetrics:
+    """What a single request spent on SQL and serialization."""
+
+    def __init__(self, record_sql=False):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.queries = [] if record_sql else None
+
+
+def time_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every connection, adding the queries of instrumented requests to their metrics. The
+    metrics are found through a context variable, which sync_to_async carries to the threads running async views'
+    queries.
+    """
+    metrics = current_request_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        metrics.query_count += 1
+        metrics.db_time += duration
+        if metrics.queries is not None:
+            metrics.queries.append((duration, sql))
+
+
+def install_query_timer(connection):
+    """Adds time_query to the connection's execute wrappers."""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+@contextmanager
+def serialization_timer():
+    """Adds the time spent in the block to the current request's serializer time, once for nested serializers."""
+    metrics = current_request_metrics.get()
+    if metrics is None:
+        yield
+        return
+
+    metrics.serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_depth -= 1
+        if metrics.serializer_depth == 0:
+            metrics.serializer_time += time.perf_counter() - start
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets, in the Prometheus format."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Adds an observation."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        """Returns the bucket, sum and count lines."""
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{format_labels({**labels, 'le': bound})} {cumulative}")
+        lines.append(f"{name}_sum{format_labels(labels)} {self.sum}")
+        lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+        return lines
+
+
+class ViewMetrics:
+    """Aggregated metrics of a view and HTTP method."""
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.query_count = Histogram(QUERY_COUNT_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.statuses = {}
+
+
+class MetricsRegistry:
+    """Thread safe, per process store of the request metrics."""
+
+    prefix = "resource_manager"
+
+    def __init__(self):
+        self.views = {}
+        self.lock = threading.Lock()
+
+    def observe(self, view, method, status, latency, metrics, size):
+        """Records a finished request."""
+        with self.lock:
+            view_metrics = self.views.get((view, method))
+            if view_metrics is None:
+                view_metrics = self.views[view, method] = ViewMetrics()
+            view_metrics.latency.observe(latency)
+            view_metrics.query_count.observe(metrics.query_count)
+            if size is not None:
+                view_metrics.response_size.observe(size)
+            view_metrics.db_time += metrics.db_time
+            view_metrics.serializer_time += metrics.serializer_time
+            view_metrics.statuses[status] = view_metrics.statuses.get(status, 0) + 1
+
+    def clear(self):
+        """Forgets every metric."""
+        with self.lock:
+            self.views.clear()
+
+    def render(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        families = {
+            "http_requests_total": ("counter", "Requests by view, method and status code.", []),
+            "http_request_duration_seconds": ("histogram", "Request latency.", []),
+            "db_queries_per_request": ("histogram", "SQL queries run by a request.", []),
+            "db_query_duration_seconds_total": ("counter", "Time spent running SQL queries.", []),
+            "serializer_duration_seconds_total": ("counter", "Time spent in serializers.", []),
+            "http_response_size_bytes": ("histogram", "Size of the non streaming response bodies.", []),
+        }
+        with self.lock:
+            for (view, method), view_metrics in sorted(self.views.items()):
+                labels = {"view": view, "method": method}
+                for status, count in sorted(view_metrics.statuses.items()):
+                    families["http_requests_total"][2].append(
+                        f"{self.prefix}_http_requests_total{format_labels({**labels, 'status': status})} {count}")
+                families["http_request_duration_seconds"][2].extend(
+                    view_metrics.latency.samples(f"{self.prefix}_http_request_duration_seconds", labels))
+                families["db_queries_per_request"][2].extend(
+                    view_metrics.query_count.samples(f"{self.prefix}_db_queries_per_request", labels))
+                families["db_query_duration_seconds_total"][2].append(
+                    f"{self.prefix}_db_query_duration_seconds_total{format_labels(labels)} {view_metrics.db_time}")
+                families["serializer_duration_seconds_total"][2].append(
+                    f"{self.prefix}_serializer_duration_seconds_total{format_labels(labels)} "
+                    f"{view_metrics.serializer_time}")
+                families["http_response_size_bytes"][2].extend(
+                    view_metrics.response_size.samples(f"{self.prefix}_http_response_size_bytes", labels))
+
+        lines = []
+        for name, (kind, description, samples) in families.items():
+            lines.append(f"# HELP {self.prefix}_{name} {description}")
+            lines.append(f"# TYPE {self.prefix}_{name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def format_labels(labels):
+    """Returns the Prometheus label set for the dict."""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in labels.items()) + "}"
+
+
+def escape_label_value(value):
+    """Escapes backslashes, double quotes and line feeds as the Prometheus text format requires."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class InstrumentationMiddleware:
+    """
+    Records the latency, SQL query count and time, serializer time and response size of every request by view and
+    HTTP method. Requests slower than settings.SLOW_REQUEST_THRESHOLD seconds are logged along with their slowest
+    queries. Works in sync and async mode, so async views keep running natively under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_request_threshold = getattr(settings, "SLOW_REQUEST_THRESHOLD", None)
+        self.slow_request_queries = getattr(settings, "SLOW_REQUEST_LOGGED_QUERIES", 10)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Instruments a sync request."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics(record_sql=self.slow_request_threshold is not None)
+        token = current_request_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request_metrics.reset(token)
+        self.finish(request, response, metrics, start)
+        return response
+
+    async def __acall__(self, request):
+        """Instruments an async request."""
+        metrics = RequestMetrics(record_sql=self.slow_request_threshold is not None)
+        token = current_request_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request_metrics.reset(token)
+        self.finish(request, response, metrics, start)
+        return response
+
+    def finish(self, request, response, metrics, start):
+        """Records the metrics and logs the request if it's slow."""
+        latency = time.perf_counter() - start
+        resolver_match = getattr(request, "resolver_match", None)
+        view = resolver_match.view_name if resolver_match is not None else "unmatched"
+        size = None if response.streaming else len(response.content)
+        registry.observe(view, request.method, response.status_code, latency, metrics, size)
+
+        if self.slow_request_threshold is not None and latency >= self.slow_request_threshold:
+            slowest = sorted(metrics.queries, reverse=True)[:self.slow_request_queries]
+            logger.warning(
+                "Slow request %s %s (%s): %.3f s, %d queries in %.3f s, %.3f s serializing.%s",
+                request.method, request.get_full_path(), view, latency, metrics.query_count, metrics.db_time,
+                metrics.serializer_time, "".join(f"\n  {duration:.4f} s: {sql}" for duration, sql in slowest),
+            )
+
+
+@lru_cache(maxsize=None)
+def get_metrics_networks():
+    """
+    Returns the networks of settings.METRICS_ALLOWED_IPS, parsed once. Called when the app is ready, so a typo stops
+    the server at startup rather than failing every scrape.
+    """
+    networks = []
+    for network in getattr(settings, "METRICS_ALLOWED_IPS", ["127.0.0.1", "::1"]):
+        try:
+            networks.append(ipaddress.ip_network(network, strict=False))
+        except ValueError as error:
+            raise ImproperlyConfigured(f"METRICS_ALLOWED_IPS has an invalid address or network: {error}")
+    return networks
+
+
+def is_metrics_client(request):
+    """Tells whether the request comes from one of the addresses or networks of settings.METRICS_ALLOWED_IPS."""
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(address in network for network in get_metrics_networks())
+
+
+def metrics_view(request):  # noqa
+    """Exposes the metrics of this process in the Prometheus text format to the allowed addresses."""
+    if not is_metrics_client(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,226 @@
+"""Database backed background jobs."""
+
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+from multiprocessing import get_context
+from pathlib import Path
+import django
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger("resource_manager_app.jobs")
+
+DATABASE_RETRIES = 5
+DATABASE_RETRY_DELAY = 0.05
+
+handlers = {}
+
+
+class JobFailed(Exception):
+    """Raised by job handlers for errors that retrying can't fix, failing the job right away."""
+
+
+def job(name):
+    """Registers the decorated function as the handler of the named jobs. Handlers receive the Job instance."""
+    def register(function):
+        handlers[name] = function
+        return function
+    return register
+
+
+def enqueue(name, payload=None, user=None, max_attempts=None):
+    """Queues a job for the workers and returns it."""
+    if name not in handlers:
+        raise LookupError(f"No handler is registered for {name} jobs.")
+    return Job.objects.create(  # noqa
+        name=name, payload=payload or {}, user=user,
+        max_attempts=max_attempts or getattr(settings, "JOB_MAX_ATTEMPTS", 3),
+    )
+
+
+def get_job_file(job):  # noqa
+    """Returns the path of the file written by the job, or None if it wrote none."""
+    if not job.result or "file" not in job.result:
+        return None
+    return Path(settings.JOB_FILES_DIR) / job.result["file"]
+
+
+def retry_database_errors(function, *args, **kwargs):
+    """
+    Calls the function, trying again after a growing delay if the database fails, like on a lock timeout. Used for the
+    queries of the pool's jobs, which would otherwise be failed and run again, handler included, for a transient error.
+    """
+    delay = DATABASE_RETRY_DELAY
+    for _ in range(DATABASE_RETRIES):
+        try:
+            return function(*args, **kwargs)
+        except DatabaseError:
+            logger.warning("Job query failed, retrying in %.2f seconds.", delay, exc_info=True)
+            time.sleep(delay)
+            delay *= 2
+    return function(*args, **kwargs)
+
+
+def get_retry_delay(attempts):
+    """Returns the delay before retrying a job after its given number of attempts, doubling with each one."""
+    base = getattr(settings, "JOB_RETRY_BACKOFF", 5)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), getattr(settings, "JOB_RETRY_BACKOFF_MAX", 600)))
+
+
+def claim_job(worker):
+    """
+    Marks the oldest due job as running for the worker and returns it, or None if no job is due. The claim is a
+    conditional UPDATE, so workers racing for the same job can't both get it; the loser tries the next one.
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by("run_at", "id")  # noqa
+    for job_id in candidates.values_list("id", flat=True)[:10]:
+        claimed = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(  # noqa
+            status=Job.RUNNING, worker=worker, attempts=F("attempts") + 1, started_at=now, heartbeat_at=now)
+        if claimed:
+            return Job.objects.get(pk=job_id)  # noqa
+    return None
+
+
+def fail(job, error, retry=True):
+    """Queues the running job again after the retry delay, or marks it as failed after its last attempt."""
+    if retry and job.attempts < job.max_attempts:
+        job.status = Job.QUEUED
+        job.run_at = timezone.now() + get_retry_delay(job.attempts)
+        logger.warning("Job %s (%s) failed, attempt %d of %d.", job.pk, job.name, job.attempts, job.max_attempts)
+    else:
+        job.status = Job.FAILED
+        job.finished_at = timezone.now()
+        logger.error("Job %s (%s) failed after %d attempts.", job.pk, job.name, job.attempts)
+    job.error = error
+    job.worker = ""
+    retry_database_errors(job.save, update_fields=["status", "run_at", "finished_at", "error", "worker"])
+
+
+def run_job(job):
+    """Runs a claimed job's handler and stores its result, or its error for a retry."""
+    handler = handlers.get(job.name)
+    if handler is None:
+        fail(job, f"No handler is registered for {job.name} jobs.", retry=False)
+        return
+
+    try:
+        result = handler(job)
+    except JobFailed as error:
+        fail(job, str(error), retry=False)
+    except Exception:  # noqa
+        fail(job, traceback.format_exc())
+    else:
+        job.status = Job.SUCCEEDED
+        job.result = result
+        job.progress = 1.0
+        job.error = ""
+        job.finished_at = timezone.now()
+        retry_database_errors(job.save, update_fields=["status", "result", "progress", "error", "finished_at"])
+
+
+def execute_job(job_id):
+    """Runs the claimed job with the given ID, in a pool thread or process, as requests do with connections."""
+    close_old_connections()
+    try:
+        run_job(retry_database_errors(Job.objects.get, pk=job_id))  # noqa
+    finally:
+        close_old_connections()
+
+
+def requeue_abandoned_jobs():
+    """
+    Fails the running jobs without a heartbeat for settings.JOB_LEASE_TIMEOUT seconds, whose worker must have died,
+    so they are retried (or failed for good after their last attempt). Returns their number.
+    """
+    deadline = timezone.now() - timedelta(seconds=getattr(settings, "JOB_LEASE_TIMEOUT", 300))
+    abandoned = list(Job.objects.filter(status=Job.RUNNING, heartbeat_at__lt=deadline))  # noqa
+    for abandoned_job in abandoned:
+        fail(abandoned_job, f"Worker {abandoned_job.worker} stopped responding.")
+    return len(abandoned)
+
+
+class Worker:
+    """
+    Claims due jobs and runs them on a pool of threads or processes. Threads suit jobs waiting on the database,
+    processes the CPU bound ones (each process sets Django up and opens its own connections). The running jobs'
+    heartbeats are refreshed on every poll, so only jobs of dead workers are taken over. A poll failing on a database
+    error is logged and tried again on the next one, so the worker outlives database outages and lock timeouts.
+    """
+
+    def __init__(self, workers=4, pool="thread", poll_interval=1.0):
+        self.workers = workers
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+
+    def create_executor(self):
+        """Returns the thread or process pool."""
+        if self.pool == "process":
+            # Spawned processes don't inherit the parent's database connections.
+            return ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"), initializer=django.setup)
+        return ThreadPoolExecutor(self.workers, thread_name_prefix="job")
+
+    def run(self, once=False):
+        """Runs jobs until stop() is called or, with once, until no job is due. Returns the number of jobs run."""
+        running = {}
+        count = 0
+        with self.create_executor() as executor:
+            while not self.stopping.is_set():
+                try:
+                    requeue_abandoned_jobs()
+                    while len(running) < self.workers and not self.stopping.is_set():
+                        claimed = claim_job(self.name)
+                        if claimed is None:
+                            break
+                        running[executor.submit(execute_job, claimed.pk)] = claimed.pk
+                        count += 1
+
+                    if not running:
+                        if once:
+                            break
+                        self.stopping.wait(self.poll_interval)
+                        continue
+
+                    done, _ = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    self.finish(done, running)
+                    Job.objects.filter(pk__in=running.values(), status=Job.RUNNING).update(  # noqa
+                        heartbeat_at=timezone.now())
+                except DatabaseError:
+                    logger.exception("Worker %s poll failed, retrying on the next one.", self.name)
+                    self.stopping.wait(self.poll_interval)
+
+            while running:
+                try:
+                    self.finish(wait(running).done, running)
+                except DatabaseError:
+                    logger.exception("Worker %s couldn't store its jobs' failures, retrying.", self.name)
+                    time.sleep(self.poll_interval)
+        connection.close()
+        return count
+
+    @staticmethod
+    def finish(done, running):
+        """
+        Fails the jobs whose future raised, as the pool itself failed (like a process killed by the system), and
+        removes the done futures from running. A future stays there until its job is handled, so the next poll retries.
+        """
+        for future in done:
+            if future.exception() is not None:
+                fail(Job.objects.get(pk=running[future]),  # noqa
+                     "".join(traceback.format_exception(future.exception())))
+            del running[future]
+
+    def stop(self):
+        """Stops claiming jobs; the running ones are finished first."""
+        self.stopping.set()
@@ -0,0 +1,89 @@
+"""Token authentication benchmark."""
+
+import json
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from ...authentication import CachedTokenAuthentication, token_cache
+from ...benchmarking import benchmark_database, measure, seed
+from ...caching import get_cache
+from ...views import TechnicianViewSet, ResourceAssignmentViewSet
+
+
+class Command(BaseCommand):
+    """Compares the queries and latency per request of TokenAuthentication and CachedTokenAuthentication."""
+
+    help = "Seeds a test database and measures per request queries and latency with and without the token cache."
+
+    endpoints = {
+        "technician_retrieve": "/api/technician/{technician_id}/",
+        "resource_assignment_list": "/api/resource-assignment/?page_size=10",
+    }
+
+    def add_arguments(self, parser):
+        """Benchmark size and output options."""
+        parser.add_argument("--technicians", type=int, default=1000, help="Number of technicians to seed.")
+        parser.add_argument("--requests", type=int, default=200, help="Requests per run.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per endpoint, the median is reported.")
+        parser.add_argument("--json", dest="json_path", help="Also writes the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        """Runs the benchmark."""
+        results = []
+        with benchmark_database():
+            self.stdout.write(f"Seeding {options['technicians']} technicians...")
+            seed(technicians=options["technicians"], assignments_per_technician=1)
+            user = User.objects.create_user(username="benchmark", password="benchmark")
+            token = Token.objects.create(user=user)  # noqa
+            client = APIClient(SERVER_NAME="localhost")
+            client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+            technician_id = TechnicianViewSet.queryset.values_list("pk", flat=True).first()
+            for name, url in self.endpoints.items():
+                url = url.format(technician_id=technician_id)
+                for authentication_class in (TokenAuthentication, CachedTokenAuthentication):
+                    results.append({
+                        "endpoint": name,
+                        "authentication": authentication_class.__name__,
+                        **self.benchmark(client, url, authentication_class, options["requests"], options["repeat"]),
+                    })
+
+        for result in results:
+            self.stdout.write(f"{result['endpoint']} with {result['authentication']}: "
+                              f"{result['queries_per_request']} queries, {result['milliseconds']:.3f} ms per request")
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as file:
+                json.dump({"technicians": options["technicians"], "results": results}, file, indent=2)
+
+    @staticmethod
+    def benchmark(client, url, authentication_class, requests, repeat):
+        """
+        Returns the queries run by a warm request and the median latency per request using the given authentication.
+        The response cache is warmed first, so the authentication lookup is what's left on the request.
+        """
+        viewsets = (TechnicianViewSet, ResourceAssignmentViewSet)
+        old_classes = [viewset.authentication_classes for viewset in viewsets]
+        for viewset in viewsets:
+            viewset.authentication_classes = (authentication_class,)
+        get_cache().clear()
+        token_cache.clear()
+        try:
+            client.get(url)
+            queries = []
+            # Counted with a wrapper because the test client's request_started signal resets connection.queries.
+            with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+                client.get(url)
+
+            def run():
+                for _ in range(requests):
+                    client.get(url)
+
+            milliseconds = measure(run, repeat=repeat) * 1000 / requests
+        finally:
+            for viewset, classes in zip(viewsets, old_classes):
+                viewset.authentication_classes = classes
+        return {"queries_per_request": len(queries), "milliseconds": milliseconds}
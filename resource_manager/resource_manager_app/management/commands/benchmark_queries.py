@@ -0,0 +1,81 @@
+"""Query plan benchmark for the technician lookup paths."""
+
+import json
+from django.core.management.base import BaseCommand
+from ...benchmarking import benchmark_database, icontains_search, measure, seed, technician_code
+from ...models import Technician
+from ...pagination import KeysetPagination
+from ...views import TechnicianViewSet
+
+
+class Command(BaseCommand):
+    """Seeds a throwaway database and records EXPLAIN plans and timings for the technician lookup paths."""
+
+    help = "Seeds N technicians in a test database and records query plans and timings of the hot lookup paths."
+
+    def add_arguments(self, parser):
+        """Benchmark size and output options."""
+        parser.add_argument("--technicians", type=int, default=10000, help="Number of technicians to seed.")
+        parser.add_argument("--page-size", type=int, default=100, help="Rows fetched by the list paths.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per path, the median is reported.")
+        parser.add_argument("--json", dest="json_path", help="Also writes the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        """Runs the benchmark."""
+        with benchmark_database():
+            self.stdout.write(f"Seeding {options['technicians']} technicians...")
+            seed(technicians=options["technicians"], assignments_per_technician=1)
+            results = [
+                self.benchmark(name, path, options["repeat"])
+                for name, path in self.get_paths(options["technicians"], options["page_size"]).items()
+            ]
+
+        for result in results:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{result['path']}: {result['milliseconds']:.3f} ms"))
+            self.stdout.write(result["plan"])
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as file:
+                json.dump({"technicians": options["technicians"], "results": results}, file, indent=2)
+
+    @staticmethod
+    def get_paths(technicians, page_size):
+        """
+        Returns the list, search and retrieve paths of TechnicianViewSet as a function running the path's queries
+        and the querysets to explain.
+        """
+        ordering = KeysetPagination.get_ordering(Technician.objects.all(), TechnicianViewSet)  # noqa
+        middle = Technician.objects.order_by(*ordering)[technicians // 2]  # noqa
+        position = KeysetPagination.get_position(middle, [field.lstrip("-") for field in ordering])
+
+        querysets = {
+            "list_first_page": Technician.objects.order_by(*ordering)[:page_size],  # noqa
+            "list_active_only": Technician.objects.filter(  # noqa
+                active=True).order_by("creation_date", "id")[:page_size],
+            "list_by_branch_office": Technician.objects.filter(  # noqa
+                branch_office_id=middle.branch_office_id).order_by(*ordering)[:page_size],
+            "search": icontains_search(Technician.objects.all(), "Name42",  # noqa
+                                       TechnicianViewSet.search_fields).order_by(*ordering)[:page_size],
+            "retrieve_by_pk": Technician.objects.filter(pk=middle.pk),  # noqa
+            "retrieve_by_code": Technician.objects.filter(code=technician_code(technicians // 2)),  # noqa
+        }
+        paths = {name: (lambda queryset=queryset: list(queryset.all()), [queryset])
+                 for name, queryset in querysets.items()}
+
+        branches = KeysetPagination.keyset_branches(ordering, position)
+        paths["list_deep_page"] = (
+            lambda: KeysetPagination.fetch_page(Technician.objects.all(), ordering, position, page_size),  # noqa
+            [Technician.objects.filter(condition).order_by(*branch_ordering)[:page_size]  # noqa
+             for condition, branch_ordering in branches],
+        )
+        return paths
+
+    @staticmethod
+    def benchmark(name, path, repeat):
+        """Returns the plans and the median time of running the path."""
+        run, querysets = path
+        return {
+            "path": name,
+            "milliseconds": measure(run, repeat=repeat) * 1000,
+            "plan": "\n".join(queryset.explain() for queryset in querysets),
+        }
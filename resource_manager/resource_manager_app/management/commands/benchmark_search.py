@@ -0,0 +1,62 @@
+"""Technician search benchmark."""
+
+import json
+from django.core.management.base import BaseCommand, CommandError
+from ...benchmarking import benchmark_database, icontains_search, measure, seed
+from ...models import Technician
+from ...search import get_search_backend
+from ...views import TechnicianViewSet
+
+
+class Command(BaseCommand):
+    """Compares the search backend against the icontains filters on a seeded throwaway database."""
+
+    help = "Seeds N technicians in a test database and compares the search backend against icontains filters."
+
+    terms = {
+        "code_prefix": "TEC0004",
+        "id_number_prefix": "10000424",
+        "name": "Name4242",
+        "full_name": "Name4242 LastName4242",
+    }
+
+    def add_arguments(self, parser):
+        """Benchmark size and output options."""
+        parser.add_argument("--technicians", type=int, default=100000, help="Number of technicians to seed.")
+        parser.add_argument("--page-size", type=int, default=20, help="Rows fetched per search.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per search, the median is reported.")
+        parser.add_argument("--json", dest="json_path", help="Also writes the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        """Runs the benchmark."""
+        page_size = options["page_size"]
+        results = []
+        with benchmark_database():
+            backend = get_search_backend()
+            if backend is None:
+                raise CommandError("No search backend is available for this database.")
+
+            self.stdout.write(f"Seeding {options['technicians']} technicians...")
+            seed(technicians=options["technicians"], assignments_per_technician=1)
+            backend.rebuild()
+
+            ordering = Technician._meta.ordering  # noqa
+            for name, term in self.terms.items():
+                icontains = icontains_search(Technician.objects.all(), term,  # noqa
+                                             TechnicianViewSet.search_fields).order_by(*ordering)
+                results.append({
+                    "search": name,
+                    "term": term,
+                    "icontains_ms": measure(lambda: list(icontains[:page_size]), options["repeat"]) * 1000,
+                    "backend_ms": measure(lambda: list(backend.search(Technician.objects.all(), term)[:page_size]),  # noqa
+                                          options["repeat"]) * 1000,
+                })
+
+        for result in results:
+            self.stdout.write(f"{result['search']} ({result['term']}): icontains {result['icontains_ms']:.3f} ms, "
+                              f"{type(backend).__name__} {result['backend_ms']:.3f} ms")
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as file:
+                json.dump({"technicians": options["technicians"], "backend": type(backend).__name__,
+                           "results": results}, file, indent=2)
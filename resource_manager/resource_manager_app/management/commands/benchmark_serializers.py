@@ -0,0 +1,122 @@
+"""List serialization benchmark."""
+
+import json
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from ...benchmarking import benchmark_database, measure, seed
+from ...caching import CachedResponseMixin
+from ...renderers import FastJSONRenderer
+from ...serializers import TechnicianSerializer, ResourceAssignmentSerializer, get_row_serializer
+from ...views import TechnicianViewSet, ResourceAssignmentViewSet
+
+
+class Command(BaseCommand):
+    """
+    Compares the rows per second of list responses built by the model serializers (model instances, serializer
+    fields and the json module) and by the row serializers (values_list() rows, compiled converters and
+    FastJSONRenderer), stage by stage and through the API. Both paths must produce the same bytes.
+    """
+
+    help = "Seeds a test database and compares the serializer and row serializer list paths in rows per second."
+
+    models = {
+        "technician": (TechnicianViewSet, TechnicianSerializer),
+        "resource_assignment": (ResourceAssignmentViewSet, ResourceAssignmentSerializer),
+    }
+
+    def add_arguments(self, parser):
+        """Benchmark size and output options."""
+        parser.add_argument("--technicians", type=int, default=10000, help="Number of technicians to seed.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per measure, the median is reported.")
+        parser.add_argument("--json", dest="json_path", help="Also writes the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        """Runs the benchmark."""
+        results = []
+        cache_timeout = CachedResponseMixin.cache_timeout
+        CachedResponseMixin.cache_timeout = 0
+        try:
+            with benchmark_database(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                self.stdout.write(f"Seeding {options['technicians']} technicians...")
+                seed(technicians=options["technicians"], assignments_per_technician=1)
+                client = APIClient()
+                client.force_authenticate(User.objects.create_user(username="benchmark", password="benchmark"))
+
+                for name, (viewset, serializer_class) in self.models.items():
+                    results.extend(self.benchmark_stages(name, viewset.queryset, serializer_class, options["repeat"]))
+                    results.extend(self.benchmark_api(name, viewset, client, options["repeat"]))
+        finally:
+            CachedResponseMixin.cache_timeout = cache_timeout
+
+        for result in results:
+            self.stdout.write(f"{result['model']} {result['stage']} ({result['path']}): "
+                              f"{result['rows_per_second']:,.0f} rows/s")
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as file:
+                json.dump({"technicians": options["technicians"], "results": results}, file, indent=2)
+
+    @staticmethod
+    def benchmark_stages(name, queryset, serializer_class, repeat):
+        """Times fetching, serializing and encoding every row on both paths."""
+        queryset = queryset.order_by("pk")
+        row_serializer = get_row_serializer(serializer_class)
+        instances = list(queryset)
+        rows = list(row_serializer.get_queryset(queryset))
+        serialized = serializer_class(instances, many=True).data
+        row_data = row_serializer.to_representation(rows)
+
+        if JSONRenderer().render(serialized) != FastJSONRenderer().render(row_data):
+            raise CommandError(f"The {name} row serializer output differs from the serializer one.")
+
+        stages = {
+            "fetch": (lambda: list(queryset.all()), lambda: list(row_serializer.get_queryset(queryset))),
+            "serialize": (lambda: serializer_class(instances, many=True).data,
+                          lambda: row_serializer.to_representation(rows)),
+            "encode": (lambda: JSONRenderer().render(serialized), lambda: FastJSONRenderer().render(row_data)),
+            "total": (
+                lambda: JSONRenderer().render(serializer_class(list(queryset.all()), many=True).data),
+                lambda: FastJSONRenderer().render(row_serializer.to_representation(
+                    row_serializer.get_queryset(queryset))),
+            ),
+        }
+        results = []
+        for stage, (serializer_path, row_path) in stages.items():
+            for path, function in (("serializer", serializer_path), ("row_serializer", row_path)):
+                results.append({"model": name, "stage": stage, "path": path,
+                                "rows_per_second": len(rows) / measure(function, repeat)})
+        return results
+
+    @staticmethod
+    def benchmark_api(name, viewset, client, repeat):
+        """Times walking every page of the list endpoint at the maximum page size on both paths."""
+        url = f"/api/{name.replace('_', '-')}/?page_size=1000"
+
+        def walk():
+            contents = []
+            next_url = url
+            while next_url:
+                response = client.get(next_url)
+                contents.append(response.content)
+                next_url = json.loads(response.content)["next"]
+            return contents
+
+        results = []
+        pages = {}
+        for path, row_list in (("serializer", False), ("row_serializer", True)):
+            viewset.row_list = row_list
+            try:
+                pages[path] = walk()
+                elapsed = measure(walk, repeat)
+            finally:
+                viewset.row_list = True
+            rows = sum(len(json.loads(content)["results"]) for content in pages[path])
+            results.append({"model": name, "stage": "api", "path": path, "rows_per_second": rows / elapsed})
+
+        if pages["serializer"] != pages["row_serializer"]:
+            raise CommandError(f"The {name} row list responses differ from the serializer ones.")
+        return results
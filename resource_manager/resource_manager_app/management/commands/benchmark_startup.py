@@ -0,0 +1,125 @@
+"""Worker startup benchmark."""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SETUP_SCRIPT = """
+import django
+django.setup()
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from rest_framework.authtoken.models import Token
+from resource_manager_app.benchmarking import seed
+call_command("migrate", verbosity=0)
+seed(technicians=200)
+print(Token.objects.create(user=User.objects.create_user(username="benchmark", password="benchmark")).key)
+"""
+
+START_SCRIPT = """
+import importlib, json, sys, time
+from wsgiref.util import setup_testing_defaults
+start = time.perf_counter()
+module = importlib.import_module(sys.argv[1])
+timings = {"import": time.perf_counter() - start}
+path, _, query = sys.argv[2].partition("?")
+for name in ("first_request", "second_request"):
+    environ = {"PATH_INFO": path, "QUERY_STRING": query, "HTTP_AUTHORIZATION": "Token " + sys.argv[3]}
+    setup_testing_defaults(environ)
+    statuses = []
+    start = time.perf_counter()
+    response = module.application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b"".join(response)
+    response.close()
+    timings[name] = time.perf_counter() - start
+    if not statuses[0].startswith("200"):
+        sys.exit(f"{sys.argv[2]} returned {statuses[0]}")
+print(json.dumps({"timings": timings, "modules": len(sys.modules)}))
+"""
+
+
+class Command(BaseCommand):
+    """
+    Compares the cold start of WSGI entry points, each measured in fresh Python processes against a throwaway SQLite
+    database: the time to import the module (the application and its warm up included), to answer a first
+    authenticated API request and a second one, and the number of modules loaded. One more process per entry point
+    runs under -X importtime to report the packages taking the longest to import.
+    """
+
+    help = "Compares the import time and time to first request of WSGI entry points in fresh processes."
+
+    def add_arguments(self, parser):
+        """Entry points, request and output options."""
+        parser.add_argument("--entry-point", action="append", dest="entry_points",
+                            help="WSGI module to measure, resource_manager.wsgi and resource_manager.wsgi_api by "
+                                 "default. Can be repeated.")
+        parser.add_argument("--path", default="/api/technician/?page_size=20", help="Path of the requests.")
+        parser.add_argument("--repeat", type=int, default=5, help="Processes per entry point, medians are reported.")
+        parser.add_argument("--top", type=int, default=10, help="Number of slowest imports listed per entry point.")
+        parser.add_argument("--output", help="Writes the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        """Runs the benchmark."""
+        entry_points = options["entry_points"] or ["resource_manager.wsgi", "resource_manager.wsgi_api"]
+        results = {}
+        slowest_imports = {}
+        with tempfile.TemporaryDirectory() as directory:
+            env = {key: value for key, value in os.environ.items() if key != "DJANGO_SETTINGS_MODULE"}
+            env.update(DATABASE_PROFILE="sqlite-wal", DATABASE_NAME=str(Path(directory) / "startup.sqlite3"))
+            token = self.run_python(["-c", SETUP_SCRIPT],
+                                    {**env, "DJANGO_SETTINGS_MODULE": "resource_manager.settings"}).strip()
+
+            for entry_point in entry_points:
+                self.stdout.write(f"Starting {entry_point} {options['repeat']} times...")
+                runs = [json.loads(self.run_python(["-c", START_SCRIPT, entry_point, options["path"], token], env))
+                        for _ in range(options["repeat"])]
+                for name in runs[0]["timings"]:
+                    results[f"startup.{entry_point}.{name}"] = {
+                        "value": statistics.median(run["timings"][name] for run in runs) * 1000, "unit": "ms"}
+                results[f"startup.{entry_point}.modules"] = {"value": runs[0]["modules"], "unit": "modules"}
+                slowest_imports[entry_point] = self.get_slowest_imports(entry_point, env, options["top"])
+
+        for name, result in results.items():
+            self.stdout.write(f"{name}: {result['value']:.1f} {result['unit']}")
+        for entry_point, imports in slowest_imports.items():
+            self.stdout.write(f"Slowest packages to import for {entry_point} (-X importtime):")
+            for module, microseconds in imports:
+                self.stdout.write(f"  {module}: {microseconds / 1000:.1f} ms")
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump({"results": results, "slowest_imports": slowest_imports}, file, indent=2)
+
+    @staticmethod
+    def run_python(arguments, env):
+        """Runs a Python process from the project directory and returns its output."""
+        process = subprocess.run([sys.executable, *arguments], capture_output=True, text=True, env=env,
+                                 cwd=settings.BASE_DIR)
+        if process.returncode:
+            raise CommandError(f"{' '.join(arguments[:3])} failed:\n{process.stderr[-2000:]}")
+        return process.stdout
+
+    def get_slowest_imports(self, entry_point, env, top):
+        """
+        Imports the entry point under -X importtime and returns the top level packages taking the longest to import,
+        with the microseconds spent importing their modules, excluding the modules they import from other packages.
+        """
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {entry_point}"],
+                                 capture_output=True, text=True, env=env, cwd=settings.BASE_DIR)
+        if process.returncode:
+            raise CommandError(f"Importing {entry_point} failed:\n{process.stderr[-2000:]}")
+
+        imports = {}
+        for line in process.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            own, _, name = line[len("import time:"):].split("|")
+            package = name.strip().split(".")[0]
+            imports[package] = imports.get(package, 0) + int(own)
+        return sorted(imports.items(), key=lambda item: item[1], reverse=True)[:top]
@@ -0,0 +1,389 @@
+"""API benchmark suite."""
+
+import json
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+from ...benchmarking import (Timing, benchmark_database, compare_results, measure, payroll_rows, percentile, seed,
+                             technician_code, time_calls)
+from ...caching import CachedResponseMixin
+from ...models import Technician, ResourceAssignment, Resource
+from ...projections import load_payroll, project_payroll, to_columns
+from ...serializers import (TechnicianSerializer, ResourceAssignmentSerializer, BulkCreateTechnicianSerializer,
+                            get_row_validator)
+from ...utils import letter_number_only_validator
+from ...views import BulkCreateTechnicianApiView
+
+MIN_COMPARED_REPEAT = 5
+
+
+class CheckedClient(APIClient):
+    """Test client failing the run on error responses, so broken requests aren't benchmarked as fast ones."""
+
+    def request(self, **kwargs):
+        """Sends the request and checks its status code."""
+        response = super().request(**kwargs)
+        if response.status_code >= 400:
+            raise CommandError(f"{kwargs['REQUEST_METHOD']} {kwargs['PATH_INFO']} returned {response.status_code}: "
+                               f"{response.content[:500]!r}")
+        return response
+
+
+class Command(BaseCommand):
+    """
+    Reproducible benchmark suite. Seeds a throwaway database with a fixed random seed, then runs serializer and
+    validator micro-benchmarks, every API action through the test client and a concurrent scenario mixing reads and
+    assignment writes. Results go to JSON and can be compared against a previous run to catch regressions.
+    """
+
+    help = "Runs the API benchmark suite, optionally writing the results to JSON and comparing them with a baseline."
+
+    def add_arguments(self, parser):
+        """Data size, load, output and comparison options."""
+        parser.add_argument("--branch-offices", type=int, default=10, help="Number of branch offices to seed.")
+        parser.add_argument("--technicians", type=int, default=2000, help="Number of technicians to seed.")
+        parser.add_argument("--resources", type=int, default=50, help="Number of resources to seed.")
+        parser.add_argument("--assignments-per-technician", type=int, default=3,
+                            help="Number of assignments seeded per technician.")
+        parser.add_argument("--projection-technicians", type=int, default=1000000,
+                            help="Number of in memory technicians of the payroll projection benchmark.")
+        parser.add_argument("--repeat", type=int, default=20, help="Runs per benchmark, the median is reported.")
+        parser.add_argument("--threads", type=int, default=8, help="Clients of the concurrent scenario.")
+        parser.add_argument("--operations", type=int, default=50, help="Operations per client of the scenario.")
+        parser.add_argument("--write-ratio", type=float, default=0.2,
+                            help="Fraction of assignment writes in the concurrent scenario.")
+        parser.add_argument("--output", help="Writes the results to this JSON file.")
+        parser.add_argument("--compare", help="Compares the results with this JSON file from a previous run.")
+        parser.add_argument("--threshold", type=float, default=0.2,
+                            help="Relative change counted as a regression, 0.2 is 20%%. Timings changing less than the "
+                                 "interquartile ranges of both runs' repeats are counted as noise whatever the change.")
+
+    def handle(self, *args, **options):
+        """Runs the suite."""
+        if options["technicians"] < options["threads"] + options["repeat"] + 2:
+            raise CommandError("--technicians must exceed --threads plus --repeat plus 2.")
+        if options["compare"] and options["repeat"] < MIN_COMPARED_REPEAT:
+            raise CommandError(f"--compare needs --repeat {MIN_COMPARED_REPEAT} at least, fewer runs are too noisy to "
+                               f"tell regressions apart.")
+
+        results = {}
+        directory = tempfile.TemporaryDirectory()
+        # In memory SQLite shares its cache between threads, whose table locks fail instead of waiting, so the
+        # concurrent scenario needs a file database like production.
+        if connection.vendor == "sqlite" and not connection.settings_dict["TEST"]["NAME"]:
+            connection.settings_dict["TEST"]["NAME"] = str(Path(directory.name) / "benchmark.sqlite3")
+        # Every request has to reach the database, otherwise the actions would measure the response cache.
+        cache_timeout = CachedResponseMixin.cache_timeout
+        CachedResponseMixin.cache_timeout = 0
+        try:
+            with benchmark_database(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                self.stdout.write(f"Seeding {options['technicians']} technicians...")
+                seed(branch_offices=options["branch_offices"], technicians=options["technicians"],
+                     resources=options["resources"],
+                     assignments_per_technician=options["assignments_per_technician"])
+                client = CheckedClient()
+                client.force_authenticate(User.objects.create_user(username="benchmark", password="benchmark"))
+
+                self.record(results, self.benchmark_serializers(options["repeat"]))
+                self.record(results, self.benchmark_validator(options["repeat"]))
+                self.record(results, self.benchmark_projection(options["projection_technicians"], options["repeat"]))
+                self.record(results, self.benchmark_technician_actions(client, options["repeat"]))
+                self.record(results, self.benchmark_assignment_actions(client, options["repeat"]))
+                self.record(results, self.benchmark_concurrent(options["threads"], options["operations"],
+                                                               options["write_ratio"]))
+        finally:
+            CachedResponseMixin.cache_timeout = cache_timeout
+            directory.cleanup()
+
+        report = {"metadata": self.get_metadata(options), "results": results}
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(report, file, indent=2)
+
+        if options["compare"]:
+            self.compare(options["compare"], report, options["threshold"])
+
+    def record(self, results, new_results):
+        """Adds the results and prints them."""
+        for name, result in new_results.items():
+            results[name] = result
+            self.stdout.write(f"{name}: {result['value']:.3f} {result['unit']}")
+
+    @staticmethod
+    def get_metadata(options):
+        """Returns what the results depend on, so runs on different setups aren't mistaken for regressions."""
+        try:
+            commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                    cwd=settings.BASE_DIR).stdout.strip() or None
+        except OSError:
+            commit = None
+        return {
+            "commit": commit,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "data": {field: options[field] for field in ("branch_offices", "technicians", "resources",
+                                                         "assignments_per_technician", "projection_technicians")},
+            "load": {field: options[field] for field in ("repeat", "threads", "operations", "write_ratio")},
+        }
+
+    def compare(self, path, report, threshold):
+        """Prints the comparison with a previous run and fails if anything regressed beyond the threshold."""
+        with open(path) as file:
+            baseline = json.load(file)
+        if baseline["metadata"]["data"] != report["metadata"]["data"]:
+            self.stdout.write(self.style.WARNING("The baseline was seeded with different data sizes."))
+
+        regressions = compare_results(baseline["results"], report["results"], threshold)
+        for name, old, new, change in regressions:
+            self.stdout.write(self.style.ERROR(f"{name} regressed {change:.1%}: {old:.3f} -> {new:.3f}"))
+        if regressions:
+            raise CommandError(f"{len(regressions)} benchmarks regressed more than {threshold:.0%}.")
+        self.stdout.write(self.style.SUCCESS(f"No regressions beyond {threshold:.0%}."))
+
+    @staticmethod
+    def scale(seconds, factor, unit):
+        """Returns a result in the given unit, with the spread of the runs if they were repeated."""
+        if isinstance(seconds, Timing):
+            return {"value": seconds * factor, "spread": seconds.spread * factor, "unit": unit}
+        return {"value": seconds * factor, "unit": unit}
+
+    def milliseconds(self, seconds):
+        """Returns a result in milliseconds."""
+        return self.scale(seconds, 1000, "ms")
+
+    def microseconds_per_row(self, seconds, rows):
+        """Returns a result in microseconds per row."""
+        return self.scale(seconds, 1000000 / rows, "us/row")
+
+    def benchmark_serializers(self, repeat):
+        """Times serializing a page of technicians, with and without expansions, and of assignments."""
+        technicians = list(Technician.objects.order_by("pk")[:100])  # noqa
+        expanded = list(Technician.objects.order_by("pk").select_related("branch_office").prefetch_related(  # noqa
+            "resourceassignment_set__resource")[:100])
+        assignments = list(ResourceAssignment.objects.order_by("pk")[:100])  # noqa
+        context = {"expand": {"branch_office", "assignments", "resource"}}
+        return {
+            "serializer.technician.page_100": self.milliseconds(measure(
+                lambda: TechnicianSerializer(technicians, many=True).data, repeat)),
+            "serializer.technician.page_100_expanded": self.milliseconds(measure(
+                lambda: TechnicianSerializer(expanded, many=True, context=context).data, repeat)),
+            "serializer.resource_assignment.page_100": self.milliseconds(measure(
+                lambda: ResourceAssignmentSerializer(assignments, many=True).data, repeat)),
+        }
+
+    def benchmark_validator(self, repeat):
+        """
+        Times letter_number_only_validator on valid and invalid codes, and the per row cost of validating bulk
+        technician rows through the serializer and through its RowValidator, and of checking their uniqueness.
+        """
+        valid_codes = [f"TEC{i:08d}" for i in range(10000)]
+        invalid_codes = [f"TEC-{i:08d}!" for i in range(1000)]
+
+        def validate_invalid():
+            for code in invalid_codes:
+                try:
+                    letter_number_only_validator(code)
+                except django.core.exceptions.ValidationError:
+                    pass
+
+        branch_office_id = Technician.objects.values_list("branch_office_id", flat=True).first()  # noqa
+        resource_ids = list(Resource.objects.values_list("pk", flat=True)[:2])  # noqa
+        # Every other row reuses a seeded technician's code, so the uniqueness check finds conflicts.
+        rows = [{
+            "name": "Bench", "last_name": "Mark", "id_number": f"B{i}", "code": technician_code(i // 2 if i % 2 else i),
+            "description": "Benchmark", "base_salary": 1000.0, "branch_office": branch_office_id,
+            "assigned_resources": [{"id": resource_id, "quantity": 1} for resource_id in resource_ids],
+        } for i in range(1000)]
+        row_validator = get_row_validator(BulkCreateTechnicianSerializer)
+        valid_rows, _ = row_validator.validate(rows)
+        view = BulkCreateTechnicianApiView()
+
+        def validate_with_serializers():
+            for row in rows:
+                BulkCreateTechnicianSerializer(data=row).is_valid()
+
+        return {
+            "validator.letter_number_only.valid_10000": self.milliseconds(measure(
+                lambda: [letter_number_only_validator(code) for code in valid_codes], repeat)),
+            "validator.letter_number_only.invalid_1000": self.milliseconds(measure(validate_invalid, repeat)),
+            "validator.bulk_technician.serializer_per_row": self.microseconds_per_row(measure(
+                validate_with_serializers, repeat), len(rows)),
+            "validator.bulk_technician.row_validator_per_row": self.microseconds_per_row(measure(
+                lambda: row_validator.validate(rows), repeat), len(rows)),
+            "validator.bulk_technician.duplicates_per_row": self.microseconds_per_row(measure(
+                lambda: view.check_duplicates(dict(valid_rows), {}), repeat), len(rows)),
+        }
+
+    def benchmark_projection(self, technicians, repeat):
+        """Times loading the seeded technicians' payroll columns and projecting a scenario over in memory ones."""
+        columns = to_columns(payroll_rows(technicians))
+        scenario = {"raise_percent": 3.0, "branch_raises": {1: 10.0, 2: -5.0}, "unit_cost": 12.5,
+                    "percentiles": [25, 50, 75, 90, 99]}
+        return {
+            "projection.payroll.load_seeded": self.milliseconds(measure(load_payroll, repeat)),
+            f"projection.payroll.project_{technicians}": self.milliseconds(measure(
+                lambda: project_payroll(columns, **scenario), repeat)),
+        }
+
+    def benchmark_technician_actions(self, client, repeat):
+        """Times every technician endpoint."""
+        technician = Technician.objects.order_by("pk").first()  # noqa
+        body = client.get(f"/api/technician/{technician.pk}/").json()
+        body.pop("id")
+        doomed = list(Technician.objects.order_by("-pk").values_list("pk", flat=True)[:repeat])  # noqa
+        resource_id = Resource.objects.values_list("pk", flat=True).first()  # noqa
+
+        def new_technician(number):
+            return {
+                "name": "Bench", "last_name": "Mark", "id_number": f"B{number}", "code": f"BENCH{number}",
+                "description": "Benchmark", "base_salary": 1000.0, "branch_office": technician.branch_office_id,
+                "assigned_resources": [{"id": resource_id, "quantity": 1}],
+            }
+
+        bulk_rows = [[new_technician(f"{i}x{j}") for j in range(100)] for i in range(repeat)]
+        # Idempotency keys are scoped by the credentials, which the forced authentication doesn't send.
+        retry_headers = [{"HTTP_AUTHORIZATION": "Token benchmark", "HTTP_IDEMPOTENCY_KEY": f"benchmark-{i}"}
+                         for i in range(repeat)]
+        return {
+            "action.technician.list": self.milliseconds(measure(
+                lambda: client.get("/api/technician/?page_size=100"), repeat)),
+            "action.technician.list_search": self.milliseconds(measure(
+                lambda: client.get("/api/technician/?search=Name42&page_size=100"), repeat)),
+            "action.technician.list_expanded": self.milliseconds(measure(
+                lambda: client.get("/api/technician/?page_size=100&expand=branch_office,assignments,resource"),
+                repeat)),
+            "action.technician.retrieve": self.milliseconds(measure(
+                lambda: client.get(f"/api/technician/{technician.pk}/"), repeat)),
+            "action.technician.update": self.milliseconds(measure(
+                lambda: client.put(f"/api/technician/{technician.pk}/", body, format="json"), repeat)),
+            "action.technician.partial_update": self.milliseconds(measure(
+                lambda: client.patch(f"/api/technician/{technician.pk}/", {"description": "Patched"},
+                                     format="json"), repeat)),
+            "action.technician.export_csv": self.milliseconds(measure(
+                lambda: b"".join(client.get("/api/technician/export/?file_format=csv").streaming_content), repeat)),
+            "action.technician.create": self.milliseconds(time_calls(
+                [lambda i=i: client.post("/api/new-technician", new_technician(i), format="json")
+                 for i in range(repeat)])),
+            "action.technician.create_idempotent": self.milliseconds(time_calls(
+                [lambda i=i: client.post("/api/new-technician", new_technician(f"K{i}"), format="json",
+                                         **retry_headers[i]) for i in range(repeat)])),
+            "action.technician.create_replayed": self.milliseconds(time_calls(
+                [lambda i=i: client.post("/api/new-technician", new_technician(f"K{i}"), format="json",
+                                         **retry_headers[i]) for i in range(repeat)])),
+            "action.technician.bulk_create_100": self.milliseconds(time_calls(
+                [lambda rows=rows: client.post("/api/new-technician/bulk", rows, format="json")
+                 for rows in bulk_rows])),
+            "action.technician.destroy": self.milliseconds(time_calls(
+                [lambda pk=pk: client.delete(f"/api/technician/{pk}/") for pk in doomed])),
+        }
+
+    def benchmark_assignment_actions(self, client, repeat):
+        """Times every resource assignment endpoint and the reports."""
+        technician = Technician.objects.order_by("pk").first()  # noqa
+        assignment = technician.resourceassignment_set.first()
+        resources = Resource.objects.bulk_create([Resource(name=f"Benchmark {i}") for i in range(repeat * 11)])  # noqa
+        created = []
+
+        def create(resource):
+            response = client.post("/api/resource-assignment/", {
+                "technician": technician.pk, "resource": resource.pk, "quantity": 1}, format="json")
+            created.append(response.json()["id"])
+
+        results = {
+            "action.resource_assignment.list": self.milliseconds(measure(
+                lambda: client.get("/api/resource-assignment/?page_size=100"), repeat)),
+            "action.resource_assignment.list_expanded": self.milliseconds(measure(
+                lambda: client.get("/api/resource-assignment/?page_size=100&expand=technician,resource"), repeat)),
+            "action.resource_assignment.retrieve": self.milliseconds(measure(
+                lambda: client.get(f"/api/resource-assignment/{assignment.pk}/"), repeat)),
+            "action.resource_assignment.partial_update": self.milliseconds(measure(
+                lambda: client.patch(f"/api/resource-assignment/{assignment.pk}/", {"quantity": 2}, format="json"),
+                repeat)),
+            "action.resource_assignment.create": self.milliseconds(time_calls(
+                [lambda resource=resource: create(resource) for resource in resources[:repeat]])),
+            "action.resource_assignment.destroy": self.milliseconds(time_calls(
+                [lambda pk=pk: client.delete(f"/api/resource-assignment/{pk}/") for pk in list(created)])),
+            "action.resource_assignment.batch_create_10": self.milliseconds(time_calls([
+                lambda batch=resources[repeat + i * 10:repeat + (i + 1) * 10]: client.post(
+                    "/api/resource-assignment/batch",
+                    [{"op": "create", "technician": technician.pk, "resource": resource.pk} for resource in batch],
+                    format="json")
+                for i in range(repeat)
+            ])),
+            "action.report.branch_office.list": self.milliseconds(measure(
+                lambda: client.get("/api/report/branch-office/"), repeat)),
+            "action.report.branch_resource.list": self.milliseconds(measure(
+                lambda: client.get("/api/report/branch-resource/?page_size=100"), repeat)),
+        }
+        return results
+
+    def benchmark_concurrent(self, threads, operations, write_ratio):
+        """
+        Runs clients in threads, each doing reads (technician pages and details) and, with the given ratio, adding
+        and removing an assignment of its own technician. Returns the throughput and the latency percentiles.
+        """
+        user = User.objects.get(username="benchmark")
+        technicians = list(Technician.objects.order_by("pk").values_list("pk", flat=True)[1:threads + 1])  # noqa
+        assigned = set(ResourceAssignment.objects.filter(technician_id__in=technicians).values_list(  # noqa
+            "technician_id", "resource_id"))
+        resource_ids = list(Resource.objects.values_list("pk", flat=True))  # noqa
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker(number, technician_id):
+            generator = random.Random(number)
+            client = APIClient()
+            client.force_authenticate(user)
+            resource_id = next(pk for pk in resource_ids if (technician_id, pk) not in assigned)
+            own_latencies = []
+            own_errors = 0
+            for _ in range(operations):
+                start = time.perf_counter()
+                try:
+                    if generator.random() < write_ratio:
+                        response = client.post("/api/resource-assignment/", {
+                            "technician": technician_id, "resource": resource_id, "quantity": 1}, format="json")
+                        ok = response.status_code == 201
+                        if ok:
+                            ok = client.delete(f"/api/resource-assignment/{response.json()['id']}/").status_code == 204
+                    elif generator.random() < 0.5:
+                        ok = client.get("/api/technician/?page_size=20").status_code == 200
+                    else:
+                        ok = client.get(f"/api/technician/{generator.choice(technicians)}/").status_code == 200
+                except Exception:  # noqa
+                    ok = False
+                own_latencies.append(time.perf_counter() - start)
+                own_errors += not ok
+            connection.close()
+            with lock:
+                latencies.extend(own_latencies)
+                errors.append(own_errors)
+
+        workers = [threading.Thread(target=worker, args=(number, technician_id))
+                   for number, technician_id in enumerate(technicians)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        return {
+            "concurrent.mixed.throughput": {"value": len(latencies) / elapsed, "unit": "operations/s"},
+            "concurrent.mixed.p50": self.milliseconds(percentile(latencies, 0.5)),
+            "concurrent.mixed.p99": self.milliseconds(percentile(latencies, 0.99)),
+            "concurrent.mixed.errors": {"value": sum(errors), "unit": "errors"},
+        }
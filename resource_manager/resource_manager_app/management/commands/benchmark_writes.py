@@ -0,0 +1,134 @@
+"""Concurrent write benchmark of the database profiles."""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+from ...benchmarking import benchmark_database, seed
+from ...models import ResourceAssignment, Resource
+
+
+class Command(BaseCommand):
+    """
+    Runs concurrent assignment writes through the API against every database profile and reports the write
+    throughput and the rate of "database is locked" errors. Each profile runs in its own process, since the profile
+    is read from the environment when settings load. SQLite profiles use a throwaway file database so file locking
+    is part of the measure; PostgreSQL needs a reachable server configured with the DATABASE_* variables.
+    """
+
+    help = "Measures write throughput and lock errors of concurrent assignment writes for each database profile."
+
+    def add_arguments(self, parser):
+        """Load, profile and output options."""
+        parser.add_argument("--profiles", nargs="+", default=["sqlite", "sqlite-wal"],
+                            choices=sorted(settings.DATABASE_PROFILES), help="Database profiles to compare.")
+        parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16], help="Concurrent writers.")
+        parser.add_argument("--writes", type=int, default=50, help="Writes per thread.")
+        parser.add_argument("--json", dest="json_path", help="Also writes the results to this JSON file.")
+        parser.add_argument("--run-profile", action="store_true", help="Internal: runs the load in this process.")
+
+    def handle(self, *args, **options):
+        """Runs every profile in a child process, or the load itself with --run-profile."""
+        if options["run_profile"]:
+            self.stdout.write(json.dumps(self.run_profile(options["threads"], options["writes"])))
+            return
+
+        results = []
+        for profile in options["profiles"]:
+            for result in self.spawn(profile, options["threads"], options["writes"]):
+                results.append({"profile": profile, **result})
+                self.stdout.write(f"{profile} x{result['threads']}: {result['writes_per_second']:.1f} writes/s, "
+                                  f"{result['lock_error_rate']:.1%} lock errors, {result['other_errors']} other errors")
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as file:
+                json.dump({"writes_per_thread": options["writes"], "results": results}, file, indent=2)
+
+    @staticmethod
+    def spawn(profile, threads, writes):
+        """Runs the load for the profile in a child process and returns its results."""
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, "DATABASE_PROFILE": profile}
+            if profile.startswith("sqlite"):
+                env["DATABASE_TEST_NAME"] = str(Path(directory) / "benchmark.sqlite3")
+            process = subprocess.run(
+                [sys.executable, "-m", "django", "benchmark_writes", "--run-profile", "--writes", str(writes),
+                 "--threads", *map(str, threads)],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+        if process.returncode != 0:
+            raise CommandError(f"The {profile} profile failed:\n{process.stderr}")
+        return json.loads(process.stdout.strip().splitlines()[-1])
+
+    def run_profile(self, thread_counts, writes):
+        """Seeds a test database and runs the writers at every thread count."""
+        results = []
+        with benchmark_database(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            seed(technicians=max(thread_counts), resources=writes + 1, assignments_per_technician=1)
+            user = User.objects.create_user(username="benchmark", password="benchmark")
+            token = Token.objects.create(user=user).key  # noqa
+            resource_ids = list(Resource.objects.order_by("pk").values_list("pk", flat=True))  # noqa
+            # Seeded technicians keep their assignment, so the removals never leave them without resources.
+            free_resources = {
+                technician_id: [resource_id for resource_id in resource_ids if resource_id != assigned_id][:writes]
+                for technician_id, assigned_id in ResourceAssignment.objects.order_by(  # noqa
+                    "technician_id").values_list("technician_id", "resource_id")
+            }
+            for threads in thread_counts:
+                results.append(self.run_writers(threads, token, free_resources))
+        return results
+
+    @staticmethod
+    def run_writers(threads, token, free_resources):
+        """
+        Every thread adds and removes assignments of its own technician, so the writes only compete for the database
+        locks. Returns the successful writes per second and the errors.
+        """
+        counts = {"ok": 0, "locked": 0, "other": 0}
+        lock = threading.Lock()
+
+        def writer(technician_id):
+            client = Client(HTTP_AUTHORIZATION=f"Token {token}")
+            outcomes = {"ok": 0, "locked": 0, "other": 0}
+            for resource_id in free_resources[technician_id]:
+                try:
+                    response = client.post("/api/resource-assignment/", {
+                        "technician": technician_id, "resource": resource_id, "quantity": 1,
+                    }, content_type="application/json")
+                    if response.status_code == 201:
+                        outcomes["ok"] += 1
+                        response = client.delete(f"/api/resource-assignment/{response.json()['id']}/")
+                    outcomes["ok" if response.status_code in (201, 204) else "other"] += 1
+                except OperationalError as exception:
+                    outcomes["locked" if "locked" in str(exception) else "other"] += 1
+            connection.close()
+            with lock:
+                for key, value in outcomes.items():
+                    counts[key] += value
+
+        workers = [threading.Thread(target=writer, args=(technician_id,))
+                   for technician_id in list(free_resources)[:threads]]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        attempts = sum(counts.values())
+        return {
+            "threads": threads,
+            "writes_per_second": counts["ok"] / elapsed,
+            "lock_error_rate": counts["locked"] / attempts if attempts else 0.0,
+            "other_errors": counts["other"],
+        }
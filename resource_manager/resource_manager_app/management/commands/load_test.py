@@ -0,0 +1,129 @@
+"""Sync vs async load test."""
+
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from rest_framework.authtoken.models import Token
+from ...benchmarking import benchmark_database, seed
+from ...caching import CachedResponseMixin
+from ...models import Technician
+
+MODES = ("wsgi-sync", "asgi-sync", "asgi-async")
+
+
+class Command(BaseCommand):
+    """
+    Compares requests per second and latency percentiles of the sync views served through the WSGI handler, the sync
+    views served through the ASGI handler and the async views served through the ASGI handler, at rising concurrency.
+    Requests go straight to Django's handlers in process, so the numbers leave the web server out.
+    """
+
+    help = "Seeds a test database and load tests the sync and async technician and assignment endpoints."
+
+    endpoints = {
+        "technician_retrieve": "technician/{technician_id}/",
+        "technician_list": "technician/?page_size=20",
+        "resource_assignment_list": "resource-assignment/?page_size=20",
+    }
+
+    def add_arguments(self, parser):
+        """Load and output options."""
+        parser.add_argument("--technicians", type=int, default=1000, help="Number of technicians to seed.")
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64],
+                            help="Concurrent clients of every run.")
+        parser.add_argument("--requests", type=int, default=500, help="Requests per run.")
+        parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES), help="Modes to compare.")
+        parser.add_argument("--json", dest="json_path", help="Also writes the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        """Runs the load test."""
+        if options["requests"] < 1 or min(options["concurrency"]) < 1:
+            raise CommandError("--requests and --concurrency must be positive.")
+
+        results = []
+        # Every request has to reach the database, otherwise the comparison would measure the response cache.
+        cache_timeout = CachedResponseMixin.cache_timeout
+        CachedResponseMixin.cache_timeout = 0
+        try:
+            with benchmark_database(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                self.stdout.write(f"Seeding {options['technicians']} technicians...")
+                seed(technicians=options["technicians"], assignments_per_technician=1)
+                user = User.objects.create_user(username="load-test", password="load-test")
+                headers = {"AUTHORIZATION": f"Token {Token.objects.create(user=user).key}"}  # noqa
+                technician_id = Technician.objects.values_list("pk", flat=True).first()  # noqa
+
+                for name, path in self.endpoints.items():
+                    path = path.format(technician_id=technician_id)
+                    for mode in options["modes"]:
+                        for concurrency in options["concurrency"]:
+                            result = self.run(mode, path, headers, concurrency, options["requests"])
+                            results.append({"endpoint": name, "mode": mode, "concurrency": concurrency, **result})
+                            self.stdout.write(
+                                f"{name} {mode} x{concurrency}: {result['requests_per_second']:.1f} req/s, "
+                                f"p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, "
+                                f"{result['errors']} errors")
+        finally:
+            CachedResponseMixin.cache_timeout = cache_timeout
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as file:
+                json.dump({"technicians": options["technicians"], "results": results}, file, indent=2)
+
+    def run(self, mode, path, headers, concurrency, requests):
+        """Sends the requests split between the concurrent clients and summarizes the latencies."""
+        shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+        start = time.perf_counter()
+        if mode == "wsgi-sync":
+            outcomes = self.run_threads(f"/api/{path}", headers, shares)
+        else:
+            url = f"/api/{path}" if mode == "asgi-sync" else f"/api/async/{path}"
+            outcomes = asyncio.run(self.run_tasks(url, headers, shares))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency for latency, ok in outcomes)
+        return {
+            "requests_per_second": len(outcomes) / elapsed,
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+            "errors": sum(not ok for latency, ok in outcomes),
+        }
+
+    @staticmethod
+    def run_threads(url, headers, shares):
+        """Sends the requests through the WSGI handler from one thread per client."""
+        extra = {f"HTTP_{name}": value for name, value in headers.items()}
+
+        def client_loop(count):
+            client = Client()
+            outcomes = []
+            for _ in range(count):
+                start = time.perf_counter()
+                response = client.get(url, **extra)
+                outcomes.append((time.perf_counter() - start, response.status_code == 200))
+            return outcomes
+
+        with ThreadPoolExecutor(max_workers=len(shares)) as executor:
+            return [outcome for outcomes in executor.map(client_loop, shares) for outcome in outcomes]
+
+    @staticmethod
+    async def run_tasks(url, headers, shares):
+        """Sends the requests through the ASGI handler from one task per client."""
+        extra = {name.lower(): value for name, value in headers.items()}
+
+        async def client_loop(count):
+            client = AsyncClient()
+            outcomes = []
+            for _ in range(count):
+                start = time.perf_counter()
+                response = await client.get(url, **extra)
+                outcomes.append((time.perf_counter() - start, response.status_code == 200))
+            return outcomes
+
+        results = await asyncio.gather(*[client_loop(count) for count in shares])
+        return [outcome for outcomes in results for outcome in outcomes]
@@ -0,0 +1,64 @@
+"""Payroll and resource cost projection."""
+
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from ...projections import get_numpy, load_payroll, project_payroll
+from ...serializers import PayrollProjectionSerializer
+
+
+class Command(BaseCommand):
+    """
+    Projects the payroll and resource costs per branch office like GET /api/report/payroll-projection, printing a
+    table and the time spent loading the technicians and computing the projection.
+    """
+
+    help = "Projects the active technicians' payroll and resource costs per branch office under a raise scenario."
+
+    def add_arguments(self, parser):
+        """Scenario and output options."""
+        parser.add_argument("--raise-percent", default="0", help="Raise applied to every branch office.")
+        parser.add_argument("--branch-raise", action="append", default=[], metavar="ID:PERCENT",
+                            help="Raise of a branch office, overriding --raise-percent. Can be repeated.")
+        parser.add_argument("--unit-cost", default="0", help="Cost of an assigned resource unit.")
+        parser.add_argument("--percentile", action="append", default=[],
+                            help="Percentile of the projected salaries to report, 50 and 90 by default. "
+                                 "Can be repeated.")
+        parser.add_argument("--branch-office", action="append", default=[],
+                            help="Limits the projection to a branch office. Can be repeated.")
+        parser.add_argument("--json", dest="json_path", help="Also writes the projection to this JSON file.")
+
+    def handle(self, *args, **options):
+        """Runs the projection."""
+        serializer = PayrollProjectionSerializer(data={
+            "raise_percent": options["raise_percent"],
+            "branch_raises": ",".join(options["branch_raise"]),
+            "unit_cost": options["unit_cost"],
+            "percentiles": ",".join(options["percentile"] or ["50", "90"]),
+            "branch_offices": ",".join(options["branch_office"]),
+        })
+        if not serializer.is_valid():
+            raise CommandError(json.dumps(serializer.errors))
+        params = serializer.validated_data
+
+        start = time.perf_counter()
+        columns = load_payroll(params["branch_offices"])
+        loaded = time.perf_counter()
+        projection = project_payroll(columns, params["raise_percent"], params["branch_raises"], params["unit_cost"],
+                                     params["percentiles"])
+        projected = time.perf_counter()
+
+        for row in [*projection["branch_offices"], {"branch_office": "total", **projection["totals"]}]:
+            salary_percentiles = " ".join(f"p{percentile}={value}"
+                                          for percentile, value in row["salary_percentiles"].items())
+            self.stdout.write(f"{row['branch_office']}: {row['technicians']} technicians, payroll {row['payroll']} -> "
+                              f"{row['projected_payroll']}, {row['resource_units']} units costing "
+                              f"{row['resource_cost']}, projected cost {row['projected_cost']} "
+                              f"({row['cost_per_unit']} per unit), {salary_percentiles}")
+        self.stdout.write(f"Loaded {projection['totals']['technicians']} technicians in {loaded - start:.3f}s, "
+                          f"projected in {projected - loaded:.3f}s "
+                          f"({'NumPy' if get_numpy() is not None else 'pure Python'}).")
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as file:
+                json.dump(projection, file, indent=2)
@@ -0,0 +1,21 @@
+"""Prunes the change log."""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ...changes import prune_changes
+
+
+class Command(BaseCommand):
+    """Deletes old change log entries. Clients whose cursor points before them have to download everything again."""
+
+    help = "Deletes the change log entries older than the retention period."
+
+    def add_arguments(self, parser):
+        """Retention option."""
+        parser.add_argument("--days", type=int, default=getattr(settings, "CHANGE_LOG_RETENTION_DAYS", 30),
+                            help="Days of changes to keep.")
+
+    def handle(self, *args, **options):
+        """Prunes the log."""
+        deleted = prune_changes(options["days"])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} change log entries deleted."))
@@ -0,0 +1,15 @@
+"""Prunes the idempotency keys."""
+
+from django.core.management.base import BaseCommand
+from ...idempotency import prune_idempotency_keys
+
+
+class Command(BaseCommand):
+    """Deletes the expired idempotency keys, which requests ignore but which would otherwise stay in the table."""
+
+    help = "Deletes the idempotency keys whose stored response or lock expired."
+
+    def handle(self, *args, **options):
+        """Prunes the keys."""
+        deleted = prune_idempotency_keys()
+        self.stdout.write(self.style.SUCCESS(f"{deleted} idempotency keys deleted."))
@@ -0,0 +1,20 @@
+"""Rebuilds the technician search index."""
+
+from django.core.management.base import BaseCommand
+from ...search import get_search_backend
+
+
+class Command(BaseCommand):
+    """Refills the search index from the technicians table."""
+
+    help = "Rebuilds the technician search index from the technicians table."
+
+    def handle(self, *args, **options):
+        """Rebuilds the index of the configured search backend."""
+        backend = get_search_backend()
+        if backend is None:
+            self.stdout.write("No search backend available, searches use icontains filters.")
+            return
+
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt with {type(backend).__name__}."))
@@ -0,0 +1,15 @@
+"""Rebuilds the reporting summary tables."""
+
+from django.core.management.base import BaseCommand
+from ...summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    """Recomputes the summary tables from scratch."""
+
+    help = "Rebuilds the branch office and branch resource summary tables from the technicians and assignments."
+
+    def handle(self, *args, **options):
+        """Rebuilds the summaries."""
+        rebuild_summaries()
+        self.stdout.write(self.style.SUCCESS("Summaries rebuilt."))
@@ -0,0 +1,38 @@
+"""Background job worker."""
+
+import signal
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ...jobs import Worker
+
+
+class Command(BaseCommand):
+    """
+    Runs the queued background jobs on a local pool of threads or processes until interrupted. Any number of workers
+    can share the database; SIGINT and SIGTERM stop claiming jobs and wait for the running ones.
+    """
+
+    help = "Runs the queued background jobs."
+
+    def add_arguments(self, parser):
+        """Pool options."""
+        parser.add_argument("--workers", type=int, default=getattr(settings, "JOB_WORKERS", 4),
+                            help="Jobs run at the same time.")
+        parser.add_argument("--pool", choices=("thread", "process"), default="thread",
+                            help="Run the jobs on threads or, for CPU bound jobs, on processes.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between checks for new jobs.")
+        parser.add_argument("--once", action="store_true", help="Exit once no job is due instead of waiting.")
+
+    def handle(self, *args, **options):
+        """Runs the worker."""
+        worker = Worker(options["workers"], options["pool"], options["poll_interval"])
+        handlers = {signal_number: signal.signal(signal_number, lambda *_: worker.stop())
+                    for signal_number in (signal.SIGINT, signal.SIGTERM)}
+
+        self.stdout.write(f"Worker {worker.name} running {options['workers']} {options['pool']} workers.")
+        try:
+            count = worker.run(once=options["once"])
+        finally:
+            for signal_number, handler in handlers.items():
+                signal.signal(signal_number, handler)
+        self.stdout.write(self.style.SUCCESS(f"{count} jobs run."))
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.5 on 2026-10-18 16:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("resource_manager_app", "0004_alter_technician_code_alter_technician_id_number"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="technician",
+            index=models.Index(fields=["-active", "creation_date", "id"], name="technician_ordering_idx"),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.5 on 2026-10-18 16:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("resource_manager_app", "0005_technician_ordering_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="technician",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["creation_date", "id"],
+                name="technician_active_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="technician",
+            index=models.Index(
+                fields=["branch_office", "-active", "creation_date"],
+                name="technician_branch_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.1.5 on 2026-10-18 17:20
+
+from django.db import migrations
+
+SEARCH_TABLE = "resource_manager_app_technician_search"
+SEARCH_FIELDS = ("name", "last_name", "id_number", "code")
+
+
+def sqlite_has_fts5(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return "ENABLE_FTS5" in {row[0] for row in cursor.fetchall()}
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    fields = ", ".join(SEARCH_FIELDS)
+    if vendor == "sqlite" and sqlite_has_fts5(schema_editor):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+            f"USING fts5({fields}, tokenize='unicode61', prefix='2 3 4')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, {fields}) "
+            f"SELECT id, {fields} FROM resource_manager_app_technician"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for field in SEARCH_FIELDS:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS technician_{field}_trgm_idx "
+                f"ON resource_manager_app_technician USING gin ({field} gin_trgm_ops)"
+            )
+        for field in ("id_number", "code"):
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS technician_{field}_upper_trgm_idx "
+                f"ON resource_manager_app_technician USING gin (UPPER({field}) gin_trgm_ops)"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+    elif vendor == "postgresql":
+        for field in SEARCH_FIELDS:
+            schema_editor.execute(f"DROP INDEX IF EXISTS technician_{field}_trgm_idx")
+        for field in ("id_number", "code"):
+            schema_editor.execute(f"DROP INDEX IF EXISTS technician_{field}_upper_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("resource_manager_app", "0006_technician_lookup_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 4.1.5 on 2026-10-18 17:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_summaries(apps, schema_editor):
+    Technician = apps.get_model("resource_manager_app", "Technician")
+    ResourceAssignment = apps.get_model("resource_manager_app", "ResourceAssignment")
+    BranchOfficeSummary = apps.get_model("resource_manager_app", "BranchOfficeSummary")
+    BranchResourceSummary = apps.get_model(
+        "resource_manager_app", "BranchResourceSummary"
+    )
+
+    BranchOfficeSummary.objects.bulk_create(
+        [
+            BranchOfficeSummary(
+                branch_office_id=row["branch_office"],
+                technician_count=row["technician_count"],
+                total_base_salary=row["total_base_salary"],
+            )
+            for row in Technician.objects.order_by()
+            .values("branch_office")
+            .annotate(
+                technician_count=models.Count("id"),
+                total_base_salary=models.Sum("base_salary"),
+            )
+        ]
+    )
+    BranchResourceSummary.objects.bulk_create(
+        [
+            BranchResourceSummary(
+                branch_office_id=row["technician__branch_office"],
+                resource_id=row["resource"],
+                assignment_count=row["assignment_count"],
+                quantity=row["quantity"],
+            )
+            for row in ResourceAssignment.objects.order_by()
+            .values("technician__branch_office", "resource")
+            .annotate(
+                assignment_count=models.Count("id"), quantity=models.Sum("quantity")
+            )
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("resource_manager_app", "0007_technician_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BranchOfficeSummary",
+            fields=[
+                (
+                    "branch_office",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="resource_manager_app.branchoffice",
+                    ),
+                ),
+                ("technician_count", models.IntegerField(default=0)),
+                ("total_base_salary", models.FloatField(default=0.0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="BranchResourceSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("assignment_count", models.IntegerField(default=0)),
+                ("quantity", models.IntegerField(default=0)),
+                (
+                    "branch_office",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="resource_manager_app.branchoffice",
+                    ),
+                ),
+                (
+                    "resource",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="resource_manager_app.resource",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("branch_office", "resource")},
+            },
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
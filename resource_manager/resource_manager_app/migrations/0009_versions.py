@@ -0,0 +1,23 @@
+# Generated by Django 4.1.5 on 2026-10-18 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("resource_manager_app", "0008_summaries"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="resourceassignment",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name="technician",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.1.5 on 2026-10-18 17:43
+
+from django.db import migrations, models
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("resource_manager_app", "0011_jobs"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="branchoffice",
+            options={"default_manager_name": "all_objects"},
+        ),
+        migrations.AlterModelOptions(
+            name="resource",
+            options={"default_manager_name": "all_objects"},
+        ),
+        migrations.AlterModelOptions(
+            name="resourceassignment",
+            options={"default_manager_name": "all_objects"},
+        ),
+        migrations.AlterModelOptions(
+            name="technician",
+            options={
+                "default_manager_name": "all_objects",
+                "ordering": ["creation_date"],
+            },
+        ),
+        migrations.AlterModelManagers(
+            name="branchoffice",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name="resource",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name="resourceassignment",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name="technician",
+            managers=[
+                ("all_objects", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name="technician",
+            name="technician_ordering_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="technician",
+            name="technician_branch_idx",
+        ),
+        migrations.AddField(
+            model_name="resourceassignment",
+            name="active",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddIndex(
+            model_name="resourceassignment",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["id"],
+                name="assignment_active_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="technician",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["branch_office", "creation_date", "id"],
+                name="technician_branch_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.1.5 on 2026-10-18 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("resource_manager_app", "0012_archiving"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="resource",
+            name="available_stock",
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="resource",
+            name="total_stock",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="resource",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["available_stock", "id"],
+                name="resource_availability_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="resource",
+            constraint=models.CheckConstraint(
+                check=models.Q(("available_stock__gte", 0)),
+                name="resource_available_stock_gte_0",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="resource",
+            constraint=models.CheckConstraint(
+                check=models.Q(("available_stock__lte", models.F("total_stock"))),
+                name="resource_available_stock_lte_total",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="resource",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    models.Q(
+                        ("available_stock__isnull", True), ("total_stock__isnull", True)
+                    ),
+                    models.Q(
+                        ("available_stock__isnull", False),
+                        ("total_stock__isnull", False),
+                    ),
+                    _connector="OR",
+                ),
+                name="resource_stock_tracked",
+            ),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.1.5 on 2026-10-18 18:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+SEARCH_TABLE = "resource_manager_app_technician_search"
+
+
+def configure_ranking(apps, schema_editor):
+    # Searches order by the FTS table's rank column, which the weights of the code and ID number are given to.
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite" and SEARCH_TABLE in connection.introspection.table_names():
+        schema_editor.execute(
+            f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25(1.0, 1.0, 10.0, 10.0)')"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("resource_manager_app", "0014_idempotency_keys"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TechnicianSearchEntry",
+            fields=[
+                (
+                    "technician",
+                    models.OneToOneField(
+                        db_column="rowid",
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_entry",
+                        serialize=False,
+                        to="resource_manager_app.technician",
+                    ),
+                ),
+                (
+                    "match",
+                    models.TextField(
+                        db_column="resource_manager_app_technician_search"
+                    ),
+                ),
+                ("rank", models.FloatField()),
+            ],
+            options={
+                "db_table": "resource_manager_app_technician_search",
+                "managed": False,
+            },
+        ),
+        migrations.RunPython(configure_ranking, migrations.RunPython.noop),
+    ]
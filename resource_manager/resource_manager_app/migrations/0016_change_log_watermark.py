@@ -0,0 +1,38 @@
+# Generated by Django 4.1.5 on 2026-10-18 18:57
+
+from django.db import migrations, models
+
+
+def seed_watermark(apps, schema_editor):
+    # Logs pruned before the watermark existed only have their oldest entry telling where the pruning stopped.
+    Change = apps.get_model("resource_manager_app", "Change")
+    ChangeLogWatermark = apps.get_model("resource_manager_app", "ChangeLogWatermark")
+    oldest = Change.objects.order_by("id").values_list("id", flat=True).first()
+    if oldest is not None and oldest > 1:
+        ChangeLogWatermark.objects.create(pk=1, pruned_id=oldest - 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("resource_manager_app", "0015_technician_search_entry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeLogWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("pruned_id", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_watermark, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,52 @@
 """API models."""
 
+from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.db.models import F, Q
+from django.utils import timezone
 from .utils import letter_number_only_validator
 
 
+class StaleVersionError(Exception):
+    """Raised when saving an instance whose row was changed or deleted since the instance was read."""
+
+
+class VersionedModel(models.Model):
+    """
+    Model with a version incremented by every save. Saves of existing rows match the version the instance was read
+    with in the UPDATE statement itself, so a row changed in the meantime is never overwritten: StaleVersionError is
+    raised instead.
+    """
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        """Adds the version to the UPDATE's conditions and increments it."""
+        version_field = self._meta.get_field("version")  # noqa
+        values = [(field, model, value) for field, model, value in values if field is not version_field]
+        values.append((version_field, None, F("version") + 1))
+        updated = super()._do_update(base_qs.filter(version=self.version), using, pk_val, values,  # noqa
+                                     update_fields, forced_update)
+        if updated:
+            self.version += 1
+            return True
+        # Only conflicts pay for this query, rows that don't exist are left for save() to insert.
+        if base_qs.filter(pk=pk_val).exists():
+            raise StaleVersionError(f"{self._meta.label} {pk_val} was changed since version {self.version}.")  # noqa
+        return False
+
+
+class ActiveManager(models.Manager):
+    """Manager of the active rows only. Archived rows stay reachable through the models' all_objects manager."""
+
+    def get_queryset(self):
+        """Leaves the archived rows out."""
+        return super().get_queryset().filter(active=True)
+
+
 class BranchOffice(models.Model):
     """Branch office database model."""
     name = models.CharField(max_length=255)
@@ -15,12 +57,18 @@ class BranchOffice(models.Model):
     creation_date = models.DateField(auto_now_add=True)
     active = models.BooleanField(default=True)
 
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
     def __str__(self):
         """String representation for our model's entities."""
         return self.name
 
+    class Meta:
+        default_manager_name = "all_objects"
+
 
-class Technician(models.Model):
+class Technician(VersionedModel):
     """Technician database model."""
     name = models.CharField(max_length=255)
     last_name = models.CharField(max_length=255)
@@ -33,32 +81,89 @@ class Technician(models.Model):
     base_salary = models.FloatField(default=0.0, validators=[MinValueValidator(0.0)])
     branch_office = models.ForeignKey(BranchOffice, on_delete=models.PROTECT)
 
+    objects = ActiveManager()
+    all_objects = models.Manager()
+
     def __str__(self):
         """String representation for our model's entities."""
         return f"{self.name} {self.last_name}"
 
     class Meta:
-        ordering = ["-active", "creation_date"]
+        ordering = ["creation_date"]
+        default_manager_name = "all_objects"
+        indexes = [
+            # Active rows are served from partial indexes, which archived rows never enter.
+            models.Index(fields=["creation_date", "id"], condition=Q(active=True), name="technician_active_idx"),
+            models.Index(fields=["branch_office", "creation_date", "id"], condition=Q(active=True),
+                         name="technician_branch_idx"),
+        ]
+
+
+class TechnicianSearchEntry(models.Model):
+    """
+    Row of the SQLite FTS5 table indexing the technicians for search, created by migration 0007 where FTS5 is
+    available and maintained by resource_manager_app.search. Not managed by Django, it lets technician queries join
+    the index: filtering the hidden column named after the table with "=" runs a full-text match, and rank is then the
+    match's score under the table's ranking function.
+    """
+    technician = models.OneToOneField(Technician, primary_key=True, db_column="rowid", db_constraint=False,
+                                      on_delete=models.DO_NOTHING, related_name="search_entry")
+    match = models.TextField(db_column="resource_manager_app_technician_search")
+    rank = models.FloatField()
+
+    def __str__(self):
+        """String representation for our model's entities."""
+        return f"{self.technician_id}"
+
+    class Meta:
+        managed = False
+        db_table = "resource_manager_app_technician_search"
 
 
 class Resource(models.Model):
-    """Resource database model."""
+    """
+    Resource database model. Resources with a total stock track the units not assigned yet in available_stock, which
+    the assignment writes reserve and release with conditional UPDATEs; both are None for untracked resources.
+    """
     name = models.CharField(max_length=255)
     description = models.TextField(null=True, blank=True)
     creation_date = models.DateField(auto_now_add=True)
     active = models.BooleanField(default=True)
+    total_stock = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    available_stock = models.IntegerField(null=True, blank=True, editable=False)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         """String representation for our model's entities."""
         return self.name
 
+    class Meta:
+        default_manager_name = "all_objects"
+        indexes = [
+            models.Index(fields=["available_stock", "id"], condition=Q(active=True), name="resource_availability_idx"),
+        ]
+        constraints = [
+            models.CheckConstraint(check=Q(available_stock__gte=0), name="resource_available_stock_gte_0"),
+            models.CheckConstraint(check=Q(available_stock__lte=F("total_stock")),
+                                   name="resource_available_stock_lte_total"),
+            models.CheckConstraint(check=Q(total_stock__isnull=True, available_stock__isnull=True)
+                                   | Q(total_stock__isnull=False, available_stock__isnull=False),
+                                   name="resource_stock_tracked"),
+        ]
+
 
-class ResourceAssignment(models.Model):
+class ResourceAssignment(VersionedModel):
     """ResourceAssignment database model."""
     assignment_date = models.DateField(auto_now_add=True)
     quantity = models.SmallIntegerField(default=1, validators=[MinValueValidator(1), MaxValueValidator(10)])
     technician = models.ForeignKey(Technician, on_delete=models.CASCADE)
     resource = models.ForeignKey(Resource, on_delete=models.PROTECT)
+    active = models.BooleanField(default=True)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         """String representation for our model's entities."""
@@ -66,3 +171,139 @@ class ResourceAssignment(models.Model):
 
     class Meta:
         unique_together = ("technician", "resource")
+        default_manager_name = "all_objects"
+        indexes = [
+            models.Index(fields=["id"], condition=Q(active=True), name="assignment_active_idx"),
+        ]
+
+
+class BranchOfficeSummary(models.Model):
+    """Per branch office technician totals, kept up to date incrementally by the write endpoints."""
+    branch_office = models.OneToOneField(BranchOffice, on_delete=models.CASCADE, primary_key=True,
+                                         related_name="summary")
+    technician_count = models.IntegerField(default=0)
+    total_base_salary = models.FloatField(default=0.0)
+
+    def __str__(self):
+        """String representation for our model's entities."""
+        return f"{self.branch_office}: {self.technician_count} - {self.total_base_salary}"
+
+
+class BranchResourceSummary(models.Model):
+    """Per branch office and resource assignment totals, kept up to date incrementally by the write endpoints."""
+    branch_office = models.ForeignKey(BranchOffice, on_delete=models.CASCADE)
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE)
+    assignment_count = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+
+    def __str__(self):
+        """String representation for our model's entities."""
+        return f"{self.branch_office} - {self.resource}: {self.quantity}"
+
+    class Meta:
+        unique_together = ("branch_office", "resource")
+
+
+class Change(models.Model):
+    """
+    Append only log of the creates, updates and deletes of the synced models, written in the same transaction as the
+    change. The ID is the change feed's cursor.
+    """
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+
+    id = models.BigAutoField(primary_key=True)  # noqa
+    model = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=6, choices=[(CREATE, "Create"), (UPDATE, "Update"), (DELETE, "Delete")])
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """String representation for our model's entities."""
+        return f"{self.id}: {self.action} {self.model} {self.object_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["model", "id"], name="change_model_idx"),
+            models.Index(fields=["changed_at"], name="change_changed_at_idx"),
+        ]
+
+
+class ChangeLogWatermark(models.Model):
+    """
+    Single row holding the highest change ID deleted by prune_changes. Cursors before it have expired, while IDs
+    missing after it are only gaps, like the ones of rolled back transactions.
+    """
+    pruned_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        """String representation for our model's entities."""
+        return f"{self.pruned_id}"
+
+
+class Job(models.Model):
+    """
+    Background job run by the run_jobs worker command. Workers claim queued jobs whose run_at has passed with a
+    conditional UPDATE, so any number of them can share the table without a broker; failed attempts are queued again
+    with an exponential backoff until max_attempts is reached.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    name = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=9, default=QUEUED, choices=[
+        (QUEUED, "Queued"), (RUNNING, "Running"), (SUCCEEDED, "Succeeded"), (FAILED, "Failed")])
+    progress = models.FloatField(default=0.0)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    worker = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        """String representation for our model's entities."""
+        return f"{self.id}: {self.name} ({self.status})"
+
+    def set_progress(self, done, total):
+        """Stores the completed fraction of the job, which also tells the workers it's still alive."""
+        self.progress = min(done / total, 1.0) if total else 1.0
+        Job.objects.filter(pk=self.pk).update(progress=self.progress, heartbeat_at=timezone.now())  # noqa
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_at"], name="job_status_run_at_idx"),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response stored for an Idempotency-Key by resource_manager_app.idempotency.IdempotencyMiddleware. The row is
+    inserted when a request claims the key, without a status code until its response is stored, zlib compressed. Keys
+    and fingerprints are SHA-256 hex digests, so neither credentials nor bodies are kept. Expired rows are ignored and
+    deleted by prune_idempotency_keys.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    headers = models.JSONField(default=dict)
+    body = models.BinaryField(default=b"")
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        """String representation for our model's entities."""
+        return f"{self.key}: {self.status_code}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["expires_at"], name="idempotency_expires_at_idx"),
+        ]
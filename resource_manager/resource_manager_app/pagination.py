@@ -0,0 +1,249 @@
+"""API pagination."""
+
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination, _positive_int  # noqa
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that encodes every ordering field of the last row in the cursor. Pages are fetched with keyset
+    range conditions instead of an offset, so deep pages cost the same as the first one.
+    """
+
+    cursor_query_param = "cursor"
+    page_size = api_settings.PAGE_SIZE or 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self):
+        self.base_url = None
+        self.page = []
+        self.next_position = None
+        self.previous_position = None
+
+    def get_page_size(self, request):
+        """Returns the requested page size capped to the maximum, or the default one."""
+        try:
+            return _positive_int(request.query_params[self.page_size_query_param], strict=True,
+                                 cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    @staticmethod
+    def get_ordering(queryset, view):
+        """
+        Returns the queryset's explicit ordering (set by filters such as search ranking), the view's or the model's
+        default one, with the primary key as the last tie-breaker.
+        """
+        ordering = list(queryset.query.order_by or getattr(view, "ordering", None)
+                        or queryset.model._meta.ordering)  # noqa
+        if not any(field.lstrip("-") in ("id", "pk") for field in ordering):
+            ordering.append("id")
+        return ordering
+
+    @staticmethod
+    def keyset_branches(ordering, position):
+        """
+        Splits the rows after the position into disjoint ranges, returned in page order as (condition, ordering)
+        pairs. Each range fixes a prefix of the ordering with equalities and seeks on the next field, so every one of
+        them is a single index range scan instead of an OR the database would have to scan from the start.
+        """
+        branches = []
+        for depth in range(len(ordering) - 1, -1, -1):
+            equal = {field.lstrip("-"): value for field, value in zip(ordering[:depth], position[:depth])}
+            field = ordering[depth]
+            lookup = "lt" if field.startswith("-") else "gt"
+            branches.append((Q(**equal, **{f"{field.lstrip('-')}__{lookup}": position[depth]}), ordering[depth:]))
+        return branches
+
+    @classmethod
+    def fetch_page(cls, queryset, ordering, position, limit):
+        """Returns up to limit rows following the position in the given ordering, or the first ones without one."""
+        if position is None:
+            return list(queryset.order_by(*ordering)[:limit])
+
+        results = []
+        for condition, branch_ordering in cls.keyset_branches(ordering, position):
+            results.extend(queryset.filter(condition).order_by(*branch_ordering)[:limit - len(results)])
+            if len(results) >= limit:
+                break
+        return results
+
+    def encode_cursor(self, position, reverse):
+        """Returns the URL pointing to the page after (or before, if reverse) the given position."""
+        data = json.dumps({"p": position, "r": reverse}, cls=DjangoJSONEncoder, separators=(",", ":"))
+        cursor = urlsafe_b64encode(data.encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    @staticmethod
+    def get_ordering_field(queryset, name):
+        """Returns the model field or annotation output field the queryset is ordered by, or None if it's neither."""
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        try:
+            return queryset.model._meta.pk if name == "pk" else queryset.model._meta.get_field(name)  # noqa
+        except FieldDoesNotExist:
+            return None
+
+    def decode_cursor(self, request, queryset, ordering):
+        """
+        Returns the position and direction encoded in the request's cursor, or None for the first page. The position's
+        values are converted by the ordering fields, so a tampered cursor is a 404 rather than a failing query.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode("ascii")).decode("ascii"))
+            position = list(data["p"])
+            if len(position) != len(ordering):
+                raise ValueError("The position doesn't match the ordering.")
+            for index, name in enumerate(ordering):
+                field = self.get_ordering_field(queryset, name.lstrip("-"))
+                if field is not None:
+                    position[index] = field.to_python(position[index])
+            return position, bool(data["r"])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @classmethod
+    async def afetch_page(cls, queryset, ordering, position, limit):
+        """Async version of fetch_page()."""
+        if position is None:
+            return [row async for row in queryset.order_by(*ordering)[:limit]]
+
+        results = []
+        for condition, branch_ordering in cls.keyset_branches(ordering, position):
+            branch = queryset.filter(condition).order_by(*branch_ordering)[:limit - len(results)]
+            results.extend([row async for row in branch])
+            if len(results) >= limit:
+                break
+        return results
+
+    def start_page(self, queryset, request, view):
+        """Reads the request and returns the page size, the ordering to fetch the page with and the position."""
+        page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+
+        ordering = self.get_ordering(queryset, view)
+        cursor = self.decode_cursor(request, queryset, ordering)
+        position, reverse = cursor if cursor is not None else (None, False)
+
+        if reverse:
+            ordering = [field[1:] if field.startswith("-") else f"-{field}" for field in ordering]
+        return page_size, ordering, position, reverse
+
+    def finish_page(self, results, page_size, ordering, position, reverse):
+        """Keeps the page out of the fetched rows and the positions of the links to its neighbours."""
+        fields = [field.lstrip("-") for field in ordering]
+        has_more = len(results) > page_size
+        self.page = results[:page_size]
+        if reverse:
+            self.page.reverse()
+
+        has_next = has_more if not reverse else True
+        has_previous = has_more if reverse else position is not None
+        self.next_position = self.get_position(self.page[-1], fields) if has_next and self.page else None
+        self.previous_position = self.get_position(self.page[0], fields) if has_previous and self.page else None
+        return self.page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Returns the page after (or before) the cursor's position."""
+        page_size, ordering, position, reverse = self.start_page(queryset, request, view)
+        results = self.fetch_page(queryset, ordering, position, page_size + 1)
+        return self.finish_page(results, page_size, ordering, position, reverse)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async version of paginate_queryset()."""
+        page_size, ordering, position, reverse = self.start_page(queryset, request, view)
+        results = await self.afetch_page(queryset, ordering, position, page_size + 1)
+        return self.finish_page(results, page_size, ordering, position, reverse)
+
+    @staticmethod
+    def get_position(instance, fields):
+        """Returns the values of the ordering fields for the given row."""
+        return [getattr(instance, field) for field in fields]
+
+    def get_next_link(self):
+        """Returns the URL to the next page."""
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, False)
+
+    def get_previous_link(self):
+        """Returns the URL to the previous page."""
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, True)
+
+    def get_paginated_response(self, data):
+        """Wraps the page with the links to its neighbours."""
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+
+class OffsetPagination(LimitOffsetPagination):
+    """Limit/offset pagination with the same page size limits as the keyset pagination."""
+
+    default_limit = KeysetPagination.page_size
+    max_limit = KeysetPagination.max_page_size
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async version of paginate_queryset(), counting with acount()."""
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.count = await queryset.acount()
+        self.offset = self.get_offset(request)
+        if self.count == 0 or self.offset > self.count:
+            return []
+        return [row async for row in queryset[self.offset:self.offset + self.limit]]
+
+
+class ApiPagination(BasePagination):
+    """
+    Keyset pagination by default. Clients such as the admin UI can opt in to limit/offset pagination with
+    ?pagination=offset.
+    """
+
+    pagination_query_param = "pagination"
+    default_class = KeysetPagination
+    offset_class = OffsetPagination
+
+    def __init__(self):
+        self.implementation = None
+
+    def choose_implementation(self, request):
+        """Instantiates the pagination requested by the client."""
+        use_offset = request.query_params.get(self.pagination_query_param) == "offset"
+        self.implementation = self.offset_class() if use_offset else self.default_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Delegates to the pagination requested by the client."""
+        self.choose_implementation(request)
+        return self.implementation.paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async version of paginate_queryset()."""
+        self.choose_implementation(request)
+        return await self.implementation.apaginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        """Delegates to the chosen pagination."""
+        return self.implementation.get_paginated_response(data)
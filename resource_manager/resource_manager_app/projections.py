@@ -0,0 +1,196 @@
+"""Payroll and resource cost projections."""
+
+import math
+from collections import defaultdict
+from functools import cache
+from .models import Technician
+
+COLUMNS = (("branch_office", "i8"), ("base_salary", "f8"), ("resource_quantity", "i8"))
+
+
+@cache
+def get_numpy():
+    """Returns the numpy module, or None if it isn't installed. Imported on first use, out of the workers' startup."""
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover
+        return None
+    return numpy
+
+
+def to_columns(rows):
+    """
+    Turns (branch_office_id, base_salary, resource_quantity) rows into a dict of columns: NumPy arrays when NumPy is
+    installed, lists otherwise.
+    """
+    rows = list(rows)
+    numpy = get_numpy()
+    if numpy is not None:
+        table = numpy.array(rows, dtype=list(COLUMNS))
+        return {name: numpy.ascontiguousarray(table[name]) for name, _ in COLUMNS}
+    values = list(zip(*rows)) or [(), (), ()]
+    return {name: list(column) for (name, _), column in zip(COLUMNS, values)}
+
+
+def load_payroll(branch_offices=None):
+    """Loads the active technicians' columns with a single values_list query, optionally of some branch offices."""
+    technicians = Technician.objects.order_by()  # noqa
+    if branch_offices:
+        technicians = technicians.filter(branch_office_id__in=branch_offices)
+    return to_columns(technicians.values_list(*(name for name, _ in COLUMNS)))
+
+
+def project_payroll(columns, raise_percent=0.0, branch_raises=None, unit_cost=0.0, percentiles=(50, 90)):
+    """
+    Projects the payroll of the loaded technicians after a raise of raise_percent, or of branch_raises[id] for the
+    branch offices listed there, and the cost of their assigned resources at unit_cost per unit. Returns the totals
+    and the per branch office figures: technicians, current and projected payroll, assigned units, resource cost,
+    projected cost (payroll plus resources), cost per assigned unit and the given percentiles of projected salaries.
+    With NumPy every figure is computed by vectorized group by operations over the columns; without it, in a loop.
+    """
+    branch_raises = branch_raises or {}
+    compute = compute_arrays if get_numpy() is not None else compute_lists
+    groups, total = compute(columns, raise_percent, branch_raises, percentiles)
+    return {
+        "totals": format_group(total, unit_cost, percentiles),
+        "branch_offices": [{"branch_office": branch_office_id, **format_group(group, unit_cost, percentiles)}
+                           for branch_office_id, group in groups],
+    }
+
+
+def format_group(group, unit_cost, percentiles):
+    """Returns a group's figures, rounded to cents."""
+    technicians, payroll, projected_payroll, units, salary_percentiles = group
+    resource_cost = units * unit_cost
+    projected_cost = projected_payroll + resource_cost
+    return {
+        "technicians": technicians,
+        "payroll": round(payroll, 2),
+        "projected_payroll": round(projected_payroll, 2),
+        "resource_units": units,
+        "resource_cost": round(resource_cost, 2),
+        "projected_cost": round(projected_cost, 2),
+        "cost_per_unit": round(projected_cost / units, 2) if units else None,
+        "salary_percentiles": {format_percentile(percentile): round(value, 2) if value is not None else None
+                               for percentile, value in zip(percentiles, salary_percentiles)},
+    }
+
+
+def format_percentile(percentile):
+    """Returns the key of a percentile, 50 for 50.0 but 99.9 for 99.9."""
+    return f"{percentile:g}"
+
+
+def compute_arrays(columns, raise_percent, branch_raises, percentiles):
+    """
+    Computes the groups' figures over NumPy arrays: branch offices are factorized into group numbers, sums are
+    bincounts and percentiles are read, for every group at once, from the salaries sorted by group.
+    """
+    numpy = get_numpy()
+    branch_offices = columns["branch_office"]
+    salaries = columns["base_salary"]
+    units = columns["resource_quantity"]
+    if not len(branch_offices):
+        return [], (0, 0.0, 0.0, 0, [None] * len(percentiles))
+
+    # IDs spanning no more values than there are rows are factorized in linear time by a lookup table over their
+    # range, several times faster than numpy.unique()'s sort. Sparse ones, which would make the table as large as the
+    # highest ID, are left to numpy.unique().
+    lowest = int(branch_offices.min())
+    span = int(branch_offices.max()) - lowest + 1
+    if span <= len(branch_offices):
+        offsets = branch_offices - lowest
+        counts = numpy.bincount(offsets, minlength=span)
+        present = numpy.flatnonzero(counts)
+        branch_office_ids = present + lowest
+        counts = counts[present]
+        lookup = numpy.zeros(span, dtype=numpy.intp)
+        lookup[present] = numpy.arange(len(present))
+        groups = lookup[offsets]
+    else:
+        branch_office_ids, groups, counts = numpy.unique(branch_offices, return_inverse=True, return_counts=True)
+
+    factors = numpy.full(len(branch_office_ids), 1 + raise_percent / 100)
+    for branch_office_id, percent in branch_raises.items():
+        position = numpy.searchsorted(branch_office_ids, branch_office_id)
+        if position < len(branch_office_ids) and branch_office_ids[position] == branch_office_id:
+            factors[position] = 1 + percent / 100
+    projected = salaries * factors[groups]
+
+    payrolls = numpy.bincount(groups, weights=salaries, minlength=len(branch_office_ids))
+    projected_payrolls = numpy.bincount(groups, weights=projected, minlength=len(branch_office_ids))
+    group_units = numpy.bincount(groups, weights=units, minlength=len(branch_office_ids))
+
+    # Sorting by salary then stable sorting by group orders the salaries within each group; the stable sort of small
+    # integers is a radix sort, several times faster than numpy.lexsort().
+    order = numpy.argsort(projected)
+    group_type = numpy.uint16 if len(branch_office_ids) <= numpy.iinfo(numpy.uint16).max else numpy.intp
+    order = order[numpy.argsort(groups[order].astype(group_type), kind="stable")]
+    ordered = projected[order]
+    starts = numpy.cumsum(counts) - counts
+    group_percentiles = [interpolate_arrays(ordered, starts, counts, percentile) for percentile in percentiles]
+    total_percentiles = numpy.percentile(projected, list(percentiles)).tolist() if percentiles else []
+
+    groups = [
+        (branch_office_id, (count, payroll, projected_payroll, int(group_unit),
+                            [values[index] for values in group_percentiles]))
+        for index, (branch_office_id, count, payroll, projected_payroll, group_unit) in enumerate(zip(
+            branch_office_ids.tolist(), counts.tolist(), payrolls.tolist(), projected_payrolls.tolist(),
+            group_units.tolist()))
+    ]
+    total = (len(salaries), float(salaries.sum()), float(projected.sum()), int(units.sum()), total_percentiles)
+    return groups, total
+
+
+def interpolate_arrays(ordered, starts, counts, percentile):
+    """
+    Returns the percentile of every group of the sorted values starting at starts, interpolating linearly between
+    the closest ranks like numpy.percentile does.
+    """
+    numpy = get_numpy()
+    positions = starts + (counts - 1) * (percentile / 100)
+    lower = numpy.floor(positions).astype(int)
+    upper = numpy.minimum(lower + 1, starts + counts - 1)
+    values = ordered[lower] + (ordered[upper] - ordered[lower]) * (positions - lower)
+    return values.tolist()
+
+
+def compute_lists(columns, raise_percent, branch_raises, percentiles):
+    """Computes the groups' figures over lists, the same way compute_arrays() does."""
+    default_factor = 1 + raise_percent / 100
+    factors = {branch_office_id: 1 + percent / 100 for branch_office_id, percent in branch_raises.items()}
+    totals = defaultdict(lambda: [0, 0.0, 0.0, 0])
+    salaries = defaultdict(list)
+    for branch_office_id, salary, units in zip(columns["branch_office"], columns["base_salary"],
+                                               columns["resource_quantity"]):
+        projected = salary * factors.get(branch_office_id, default_factor)
+        group = totals[branch_office_id]
+        group[0] += 1
+        group[1] += salary
+        group[2] += projected
+        group[3] += units
+        salaries[branch_office_id].append(projected)
+
+    groups = []
+    for branch_office_id in sorted(totals):
+        ordered = sorted(salaries[branch_office_id])
+        groups.append((branch_office_id, (*totals[branch_office_id],
+                                          [interpolate_list(ordered, percentile) for percentile in percentiles])))
+
+    every_salary = sorted(salary for group_salaries in salaries.values() for salary in group_salaries)
+    total = (
+        len(every_salary), sum(group[1] for group in totals.values()), sum(every_salary),
+        sum(group[3] for group in totals.values()),
+        [interpolate_list(every_salary, percentile) for percentile in percentiles],
+    )
+    return groups, total
+
+
+def interpolate_list(ordered, percentile):
+    """Returns the percentile of the sorted values, None if there are none."""
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * (percentile / 100)
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
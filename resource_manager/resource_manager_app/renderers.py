@@ -0,0 +1,50 @@
+"""API renderers."""
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class ExactFloat(float):
+    """Float that orjson refuses to encode, used for the values it would format differently from repr()."""
+
+
+def exact_float(value):
+    """
+    Returns the value as a float, as an ExactFloat if it's out of the range where orjson and repr() agree: orjson
+    writes 1e16 as 1e16 and 1e-05 as 0.00001 where the json module writes 1e+16 and 1e-05, and NaN and infinities as
+    null where the json module fails.
+    """
+    value = float(value)
+    if value == 0 or 1e-4 <= abs(value) < 1e16:
+        return value
+    return ExactFloat(value)
+
+
+def reject(value):
+    """orjson default hook refusing every type it doesn't encode natively, so the json module takes over."""
+    raise TypeError
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson when it's installed, producing the same bytes as JSONRenderer. Floats have to
+    go through exact_float() first, as the row serializers do; anything else orjson can't encode exactly (types it
+    doesn't know, non-string keys, pretty printing, ASCII only output) falls back to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Encodes with orjson, or with the json module when the output could differ."""
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            content = orjson.dumps(data, default=reject)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer, which keeps the output a strict JavaScript subset.
+        return content.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
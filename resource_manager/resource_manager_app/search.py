@@ -0,0 +1,147 @@
+"""Technician search backends."""
+
+import re
+from functools import lru_cache
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils.module_loading import import_string
+from rest_framework.filters import SearchFilter
+from .models import Technician
+
+SEARCH_FIELDS = ("name", "last_name", "id_number", "code",)
+
+
+class BaseSearchBackend:
+    """
+    Searches technicians through an index. search() returns the matches annotated with a search_rank and ordered by
+    it, so the keyset pagination keeps the ranking across pages.
+    """
+
+    def search(self, queryset, term):
+        """Returns the technicians in the queryset matching the term, best matches first."""
+        raise NotImplementedError
+
+    def index(self, technicians):
+        """Adds or refreshes the given technicians in the index."""
+
+    def remove(self, technician_ids):
+        """Removes the given technicians from the index."""
+
+    def rebuild(self):
+        """Rebuilds the whole index from the technicians table."""
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """
+    Searches an FTS5 virtual table that uses the technician ID as rowid, joined through TechnicianSearchEntry. Every
+    word of the term is matched as a prefix, and results are ranked with bm25 giving more weight to the code and the
+    ID number.
+    """
+
+    table = "resource_manager_app_technician_search"
+    weights = (1.0, 1.0, 10.0, 10.0)
+
+    @staticmethod
+    def build_match_expression(term):
+        """Returns an FTS5 query matching every word of the term as a prefix."""
+        words = re.findall(r"\w+", term)
+        return " ".join(f'"{word}"*' for word in words)
+
+    def search(self, queryset, term):
+        """
+        Joins the FTS table's matches to the queryset and keeps their rank as search_rank. SQLite runs the match
+        first and looks the technicians up by ID, and as it's a single query the queryset's filters (active rows, the
+        view's) and the paginator's limit apply to every match.
+        """
+        expression = self.build_match_expression(term)
+        if not expression:
+            return queryset.none()
+        # FTS5 takes "rank = ?" constraints as a ranking function to use, so the pagination's conditions go through an
+        # expression SQLite evaluates itself.
+        return queryset.filter(search_entry__match=expression).annotate(
+            search_rank=F("search_entry__rank") + 0.0).order_by("search_rank", "id")
+
+    def index(self, technicians):
+        """Replaces the rows of the given technicians in the FTS table."""
+        rows = [[technician.pk, *[getattr(technician, field) for field in SEARCH_FIELDS]] for technician in technicians]
+        if rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (rowid, {', '.join(SEARCH_FIELDS)}) "
+                    f"VALUES (%s, {', '.join(['%s'] * len(SEARCH_FIELDS))})",
+                    rows,
+                )
+
+    def remove(self, technician_ids):
+        """Deletes the rows of the given technicians from the FTS table."""
+        technician_ids = list(technician_ids)
+        if technician_ids:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({', '.join(['%s'] * len(technician_ids))})",
+                               technician_ids)
+
+    def rebuild(self):
+        """Refills the FTS table from the technicians table and sets its ranking function to the weighted bm25."""
+        fields = ", ".join(SEARCH_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}, rank) "
+                           f"VALUES ('rank', 'bm25({', '.join(map(str, self.weights))})')")
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(f"INSERT INTO {self.table} (rowid, {fields}) "
+                           f"SELECT id, {fields} FROM {Technician._meta.db_table}")  # noqa
+
+
+class PostgreSQLTrigramSearchBackend(BaseSearchBackend):
+    """
+    Searches with pg_trgm, served by the trigram GIN indexes. Prefix matches on the code and the ID number rank first,
+    then the rest by trigram similarity. Needs "django.contrib.postgres" in INSTALLED_APPS.
+    """
+
+    def search(self, queryset, term):
+        """Annotates the prefix match and the similarity, and orders by them."""
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        prefix = Q(code__istartswith=term) | Q(id_number__istartswith=term)
+        similar = Q()
+        for field in SEARCH_FIELDS:
+            similar |= Q(**{f"{field}__trigram_similar": term})
+
+        return queryset.filter(prefix | similar).annotate(
+            search_rank=Case(When(prefix, then=Value(0)), default=Value(1), output_field=IntegerField()),
+            search_similarity=Greatest(*[TrigramSimilarity(field, term) for field in SEARCH_FIELDS]),
+        ).order_by("search_rank", "-search_similarity", "id")
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    """
+    Returns the backend set in settings.TECHNICIAN_SEARCH_BACKEND, or the best one for the database in use.
+    None means no index is available and searches fall back to icontains filters, as on PostgreSQL without
+    django.contrib.postgres, which registers the trigram lookups.
+    """
+    backend_path = getattr(settings, "TECHNICIAN_SEARCH_BACKEND", "auto")
+    if backend_path is None:
+        return None
+    if backend_path != "auto":
+        return import_string(backend_path)()
+
+    if connection.vendor == "postgresql" and apps.is_installed("django.contrib.postgres"):
+        return PostgreSQLTrigramSearchBackend()
+    if connection.vendor == "sqlite" and SQLiteFTSSearchBackend.table in connection.introspection.table_names():
+        return SQLiteFTSSearchBackend()
+    return None
+
+
+class TechnicianSearchFilter(SearchFilter):
+    """SearchFilter that goes through the search backend when one is available."""
+
+    def filter_queryset(self, request, queryset, view):
+        """Searches through the backend, or with the default icontains filters if there's none."""
+        backend = get_search_backend()
+        terms = self.get_search_terms(request)
+        if backend is None or not terms:
+            return super().filter_queryset(request, queryset, view)
+        return backend.search(queryset, " ".join(terms))
@@ -1,8 +1,23 @@
 """API serializers."""
 
-from rest_framework.serializers import (ModelSerializer, Serializer, CharField, FloatField, ListField, IntegerField,
-                                        PrimaryKeyRelatedField)
-from .models import Technician, ResourceAssignment, BranchOffice, Resource
+import math
+from datetime import date
+from django.core.exceptions import ImproperlyConfigured, ValidationError as DjangoValidationError
+from django.core.validators import (MaxLengthValidator, MaxValueValidator, MinLengthValidator, MinValueValidator,
+                                    ProhibitNullCharactersValidator)
+from rest_framework import ISO_8601
+from rest_framework.fields import empty
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.serializers import (ModelSerializer, ListSerializer, Serializer, BaseSerializer, BooleanField,
+                                        CharField, ChoiceField, DateField, FloatField, ListField, IntegerField,
+                                        PrimaryKeyRelatedField, ReadOnlyField, ValidationError)
+from rest_framework.settings import api_settings
+from rest_framework.validators import ProhibitSurrogateCharactersValidator
+from .instrumentation import serialization_timer
+from .models import (Technician, ResourceAssignment, BranchOffice, Resource, BranchOfficeSummary,
+                     BranchResourceSummary, Job)
+from .renderers import exact_float
+from .utils import letter_number_only_validator
 
 
 class ResourceSerializer(Serializer):  # noqa
@@ -24,13 +39,384 @@ class CreateTechnicianSerializer(Serializer):  # noqa
     assigned_resources = ListField(child=ResourceSerializer(), allow_empty=False)
 
 
-class TechnicianSerializer(ModelSerializer):
+class BulkResourceSerializer(Serializer):  # noqa
+    """Serializer to input a resource ID and quantity without looking the resource up."""
+    id = IntegerField(min_value=1)  # noqa
+    quantity = IntegerField(min_value=1, max_value=10)
+
+
+class BulkCreateTechnicianSerializer(Serializer):  # noqa
+    """
+    Serializer for a single row of a bulk technician creation. Branch offices and resources are only validated as
+    IDs here, the view checks their existence for the whole batch at once.
+    """
+
+    name = CharField(max_length=255)
+    last_name = CharField(max_length=255)
+    id_number = CharField(max_length=255)
+    code = CharField(max_length=255, validators=[letter_number_only_validator])
+    description = CharField()
+    base_salary = FloatField(min_value=0)
+    branch_office = IntegerField(min_value=1)
+    assigned_resources = ListField(child=BulkResourceSerializer(), allow_empty=False)
+
+    def validate_assigned_resources(self, value):  # noqa
+        """Rejects resources assigned more than once to the same technician."""
+        resource_ids = [item["id"] for item in value]
+        if len(resource_ids) != len(set(resource_ids)):
+            raise ValidationError("A resource can only be assigned once per technician.")
+        return value
+
+
+class BatchAssignmentOperationSerializer(Serializer):  # noqa
+    """
+    Serializer for a single operation of a resource assignment batch. Technicians, resources and assignments are only
+    validated as IDs here, the view loads them for the whole batch at once.
+    """
+
+    required_fields = {
+        "create": ("technician", "resource"),
+        "update": ("id",),
+        "delete": ("id",),
+    }
+
+    op = ChoiceField(choices=("create", "update", "delete"))
+    id = IntegerField(min_value=1, required=False)  # noqa
+    technician = IntegerField(min_value=1, required=False)
+    resource = IntegerField(min_value=1, required=False)
+    quantity = IntegerField(min_value=1, max_value=10, required=False)
+
+    def validate(self, attrs):
+        """Checks the fields each kind of operation needs."""
+        errors = {field: ["This field is required."] for field in self.required_fields[attrs["op"]]
+                  if field not in attrs}
+        if attrs["op"] == "create" and "id" in attrs:
+            errors["id"] = ["New assignments can't have an ID."]
+        if attrs["op"] == "delete":
+            errors.update({field: ["Delete operations only take an ID."]
+                           for field in ("technician", "resource", "quantity") if field in attrs})
+        if errors:
+            raise ValidationError(errors)
+        return attrs
+
+
+class TimedSerializerMixin:
+    """Reports the time spent building the serializer's data to the request instrumentation."""
+
+    @property
+    def data(self):
+        """Times the serialization."""
+        with serialization_timer():
+            return super().data  # noqa
+
+
+class TimedListSerializer(TimedSerializerMixin, ListSerializer):
+    """ListSerializer reporting its serialization time, set as list_serializer_class of the timed serializers."""
+
+
+class RowSerializer:
+    """
+    Read only counterpart of a model serializer working on values_list() rows instead of model instances. Each field
+    is compiled once into the column it's read from and a converter producing what its to_representation() would,
+    so list responses skip the model instances and the per row field machinery and stay identical.
+    """
+
+    converters_by_field = {
+        CharField: str,
+        IntegerField: int,
+        FloatField: exact_float,
+        BooleanField: bool,
+        ReadOnlyField: None,
+    }
+
+    def __init__(self, serializer_class):
+        self.names = []
+        self.columns = []
+        self.converters = []
+        for name, field in serializer_class(context={}).fields.items():
+            if field.write_only:
+                continue
+            if field.source == "*" or isinstance(field, (BaseSerializer, ListField, ManyRelatedField)) or (
+                    isinstance(field, RelatedField) and not isinstance(field, PrimaryKeyRelatedField)):
+                raise ImproperlyConfigured(f"{serializer_class.__name__}.{name} can't be read from a column.")
+            self.names.append(name)
+            self.columns.append(field.source.replace(".", "__"))
+            self.converters.append(self.get_converter(field))
+
+    @classmethod
+    def get_converter(cls, field):
+        """Returns the function converting the field's column values, or None if they're used as they are."""
+        if isinstance(field, PrimaryKeyRelatedField) and field.pk_field is None:
+            return None
+        if isinstance(field, DateField):
+            output_format = getattr(field, "format", api_settings.DATE_FORMAT)
+            if output_format is None:
+                return None
+            if output_format.lower() == ISO_8601:
+                return date.isoformat
+        return cls.converters_by_field.get(type(field), field.to_representation)
+
+    def get_queryset(self, queryset, extra_columns=()):
+        """
+        Returns the queryset's rows as named tuples of the columns, followed by the extra ones (such as the ordering
+        fields a cursor is built from) the serializer doesn't output.
+        """
+        extra_columns = [column for column in extra_columns if column not in self.columns]
+        return queryset.values_list(*self.columns, *extra_columns, named=True)
+
+    def to_representation(self, rows):
+        """Returns the rows as dicts, None values are kept as they are like serializers do."""
+        with serialization_timer():
+            fields = list(zip(self.names, self.converters))
+            return [
+                {name: value if convert is None or value is None else convert(value)
+                 for (name, convert), value in zip(fields, row)}
+                for row in rows
+            ]
+
+
+row_serializers = {}
+
+
+def get_row_serializer(serializer_class):
+    """Returns the RowSerializer of the serializer class, compiled on first use."""
+    row_serializer = row_serializers.get(serializer_class)
+    if row_serializer is None:
+        row_serializer = row_serializers[serializer_class] = RowSerializer(serializer_class)
+    return row_serializer
+
+
+class Unchecked(Exception):
+    """Raised by the compiled checks of a RowValidator for the values only the serializer can validate."""
+
+
+class RowValidator:
+    """
+    Write counterpart of RowSerializer validating plain rows, such as the items of a bulk request, against a
+    serializer. Each field is compiled once into a type check and the field's own validators, and the serializer's
+    validate_<field>() and validate() methods run as usual, so well formed rows skip the per row serializer and field
+    machinery. Anything a field would convert or reject (a missing key, a wrong type, an untrimmed string, a failing
+    validator) sends the row through the serializer itself, so invalid rows get the very same errors.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.check = self.compile_serializer(serializer_class())
+
+    def compile_serializer(self, serializer):
+        """Returns the check of a serializer's data dict."""
+        if serializer.validators:
+            raise ImproperlyConfigured(f"{type(serializer).__name__} validators need the serializer to run.")
+        fields = []
+        for name, field in serializer.fields.items():
+            if field.read_only:
+                continue
+            if field.source == "*" or "." in field.source:
+                raise ImproperlyConfigured(f"{type(serializer).__name__}.{name} has a nested source.")
+            fields.append((name, field.source, field.required or field.default is not empty, field.allow_null,
+                           self.compile_field(field), getattr(serializer, f"validate_{name}", None)))
+
+        def check(data):
+            if type(data) is not dict:
+                raise Unchecked()
+            attrs = {}
+            for name, source, required, allow_null, check_field, validate_field in fields:
+                value = data.get(name, empty)
+                if value is empty:
+                    if required:
+                        raise Unchecked()
+                    continue
+                if value is None:
+                    if not allow_null:
+                        raise Unchecked()
+                else:
+                    value = check_field(value)
+                attrs[source] = value if validate_field is None else validate_field(value)
+            return serializer.validate(attrs)
+
+        return check
+
+    def compile_field(self, field):
+        """Returns the check of a field's value, returning the value as the field's to_internal_value() would."""
+        convert = self.compile_conversion(field)
+        tests = []
+        validators = []
+        for validator in field.validators:
+            test = self.compile_validator(validator)
+            if test is not None:
+                tests.append(test)
+            else:
+                validators.append((validator, getattr(validator, "requires_context", False)))
+        if not tests and not validators:
+            return convert
+
+        def check(value):
+            value = convert(value)
+            for test in tests:
+                if not test(value):
+                    raise Unchecked()
+            for validator, requires_context in validators:
+                if requires_context:
+                    validator(value, field)
+                else:
+                    validator(value)
+            return value
+
+        return check
+
+    @staticmethod
+    def compile_validator(validator):
+        """
+        Returns a test passed by the values the validator accepts, for the validators fields add for their own
+        arguments, whose calls cost more than the checks themselves. Returns None for the other validators.
+        """
+        validator_type = type(validator)
+        limit = getattr(validator, "limit_value", None)
+        if callable(limit):
+            return None
+        if validator_type is MaxLengthValidator:
+            return lambda value: len(value) <= limit
+        if validator_type is MinLengthValidator:
+            return lambda value: len(value) >= limit
+        if validator_type is MaxValueValidator:
+            return lambda value: value <= limit
+        if validator_type is MinValueValidator:
+            return lambda value: value >= limit
+        if validator_type is ProhibitNullCharactersValidator:
+            return lambda value: "\x00" not in value
+        if validator_type is ProhibitSurrogateCharactersValidator:
+            # Surrogates are outside ASCII, only other strings need the validator's scan.
+            return lambda value: value.isascii() or validator(value) is None
+        return None
+
+    def compile_conversion(self, field):
+        """Returns the type check of a field's value, raising Unchecked for the values it would convert or reject."""
+        field_type = type(field)
+        if field_type is CharField:
+            trim_whitespace = field.trim_whitespace
+
+            # Blank strings skip the field's validators, so the serializer handles them.
+            def check_string(value):
+                if type(value) is not str or not value or trim_whitespace and value != value.strip():
+                    raise Unchecked()
+                return value
+            return check_string
+
+        if field_type is IntegerField:
+            def check_integer(value):
+                if type(value) is not int:
+                    raise Unchecked()
+                return value
+            return check_integer
+
+        if field_type is FloatField:
+            def check_float(value):
+                if type(value) is not float and type(value) is not int or not math.isfinite(value):
+                    raise Unchecked()
+                return float(value)
+            return check_float
+
+        if field_type is ChoiceField:
+            choices = {key: value for key, value in field.choice_strings_to_values.items() if key}
+
+            def check_choice(value):
+                if type(value) is not str or value not in choices:
+                    raise Unchecked()
+                return choices[value]
+            return check_choice
+
+        if field_type is ListField:
+            allow_empty, check_child = field.allow_empty, self.compile_field(field.child)
+
+            def check_list(value):
+                if type(value) is not list or not (value or allow_empty):
+                    raise Unchecked()
+                return [check_child(item) for item in value]
+            return check_list
+
+        if isinstance(field, Serializer):
+            return self.compile_serializer(field)
+        raise ImproperlyConfigured(f"{field_type.__name__} fields can't be compiled into a RowValidator.")
+
+    def validate(self, rows):
+        """Validates the rows and returns the validated data and the errors of the invalid ones, by row index."""
+        valid_rows = {}
+        errors = {}
+        for index, row in enumerate(rows):
+            try:
+                valid_rows[index] = self.check(row)
+                continue
+            except (Unchecked, ValidationError, DjangoValidationError):
+                pass
+            serializer = self.serializer_class(data=row)
+            if serializer.is_valid():
+                valid_rows[index] = serializer.validated_data
+            else:
+                errors[index] = serializer.errors
+        return valid_rows, errors
+
+
+row_validators = {}
+
+
+def get_row_validator(serializer_class):
+    """Returns the RowValidator of the serializer class, compiled on first use."""
+    row_validator = row_validators.get(serializer_class)
+    if row_validator is None:
+        row_validator = row_validators[serializer_class] = RowValidator(serializer_class)
+    return row_validator
+
+
+class ExpandableFieldsMixin:
+    """
+    Replaces fields with nested read only serializers when their name is in the context's expand set. Nested
+    serializers share the root's context, so expansions also apply to them.
+    """
+
+    expandable_fields = {}
+
+    def get_fields(self):
+        """Swaps in the nested serializers for the expanded fields."""
+        fields = super().get_fields()  # noqa
+        expand = self.context.get("expand", ())  # noqa
+        for name, build_field in self.expandable_fields.items():
+            if name in expand:
+                fields[name] = build_field()
+        return fields
+
+
+class BranchOfficeSerializer(ModelSerializer):
+    """BranchOffice read serializer used for nested representations."""
+
+    class Meta:
+        model = BranchOffice
+        fields = ("id", "name", "description", "address", "nit", "phone", "creation_date", "active",)
+        read_only_fields = fields
+
+
+class ResourceDetailSerializer(ModelSerializer):
+    """Resource read serializer used for nested representations."""
+
+    class Meta:
+        model = Resource
+        fields = ("id", "name", "description", "creation_date", "active",)
+        read_only_fields = fields
+
+
+class TechnicianSerializer(TimedSerializerMixin, ExpandableFieldsMixin, ModelSerializer):
     """Technician serializer."""
 
+    expandable_fields = {
+        "branch_office": lambda: BranchOfficeSerializer(read_only=True),
+        "assignments": lambda: ResourceAssignmentSerializer(source="resourceassignment_set", many=True,
+                                                            read_only=True),
+    }
+
     class Meta:
         model = Technician
+        list_serializer_class = TimedListSerializer
         fields = ("id", "name", "last_name", "id_number", "code", "description", "resource_quantity", "creation_date",
-                  "active", "base_salary", "branch_office",)
+                  "active", "base_salary", "branch_office", "version",)
         extra_kwargs = {
             "id": {
                 "read_only": True,
@@ -41,17 +427,142 @@ class TechnicianSerializer(ModelSerializer):
             "resource_quantity": {
                 "read_only": True,
             },
+            "branch_office": {
+                "queryset": BranchOffice.objects.all(),  # noqa
+            },
         }
 
 
-class ResourceAssignmentSerializer(ModelSerializer):
+class ResourceAssignmentSerializer(TimedSerializerMixin, ExpandableFieldsMixin, ModelSerializer):
     """ResourceAssignment serializer."""
 
+    expandable_fields = {
+        "technician": lambda: TechnicianSerializer(read_only=True),
+        "resource": lambda: ResourceDetailSerializer(read_only=True),
+    }
+
     class Meta:
         model = ResourceAssignment
-        fields = ("id", "assignment_date", "quantity", "technician", "resource",)
+        list_serializer_class = TimedListSerializer
+        fields = ("id", "assignment_date", "quantity", "technician", "resource", "active", "version",)
         extra_kwargs = {
             "id": {
                 "read_only": True,
             },
+            "technician": {
+                "queryset": Technician.objects.all(),  # noqa
+            },
+            "resource": {
+                "queryset": Resource.objects.all(),  # noqa
+            },
+            # Assignments are archived and restored along with their technician.
+            "active": {
+                "read_only": True,
+            },
         }
+
+
+class BranchOfficeSummarySerializer(TimedSerializerMixin, ModelSerializer):
+    """BranchOfficeSummary read serializer."""
+
+    branch_office_name = CharField(source="branch_office.name", read_only=True)
+
+    class Meta:
+        model = BranchOfficeSummary
+        list_serializer_class = TimedListSerializer
+        fields = ("branch_office", "branch_office_name", "technician_count", "total_base_salary",)
+        read_only_fields = fields
+
+
+class BranchResourceSummarySerializer(TimedSerializerMixin, ModelSerializer):
+    """BranchResourceSummary read serializer."""
+
+    branch_office_name = CharField(source="branch_office.name", read_only=True)
+    resource_name = CharField(source="resource.name", read_only=True)
+
+    class Meta:
+        model = BranchResourceSummary
+        list_serializer_class = TimedListSerializer
+        fields = ("branch_office", "branch_office_name", "resource", "resource_name", "assignment_count", "quantity",)
+        read_only_fields = fields
+
+
+class ResourceStockSerializer(Serializer):  # noqa
+    """Serializer to input a resource's total stock, null to stop tracking it."""
+    total_stock = IntegerField(min_value=0, allow_null=True)
+
+
+class PayrollProjectionSerializer(Serializer):  # noqa
+    """
+    Serializer for the payroll projection query params. branch_raises maps branch office IDs to their raise as
+    comma separated ID:percent pairs, percentiles and branch_offices are comma separated lists.
+    """
+
+    raise_percent = FloatField(default=0.0, min_value=-100)
+    branch_raises = CharField(default="", allow_blank=True)
+    unit_cost = FloatField(default=0.0, min_value=0)
+    percentiles = CharField(default="50,90", allow_blank=True)
+    branch_offices = CharField(default="", allow_blank=True)
+
+    max_items = 100
+
+    def split(self, value, message):
+        """Returns the comma separated items of the value, rejecting lists longer than max_items."""
+        items = [item.strip() for item in value.split(",") if item.strip()]
+        if len(items) > self.max_items:
+            raise ValidationError(f"{message} Up to {self.max_items} items.")
+        return items
+
+    def validate_raise_percent(self, value):  # noqa
+        """Rejects NaN and infinities, which FloatField lets through."""
+        if not math.isfinite(value):
+            raise ValidationError("A valid number is required.")
+        return value
+
+    def validate_unit_cost(self, value):
+        """Rejects NaN and infinities, which FloatField lets through."""
+        return self.validate_raise_percent(value)
+
+    def validate_branch_raises(self, value):
+        """Parses the ID:percent pairs."""
+        message = "Expected comma separated branch office ID:percent pairs, like 3:10,4:2.5."
+        raises = {}
+        for item in self.split(value, message):
+            branch_office_id, _, percent = item.partition(":")
+            try:
+                percent = float(percent)
+            except ValueError:
+                raise ValidationError(message)
+            if not branch_office_id.isdigit() or not math.isfinite(percent) or percent < -100:
+                raise ValidationError(message)
+            raises[int(branch_office_id)] = percent
+        return raises
+
+    def validate_percentiles(self, value):
+        """Parses the percentiles, between 0 and 100."""
+        message = "Expected comma separated percentiles between 0 and 100."
+        try:
+            percentiles = [float(item) for item in self.split(value, message)]
+        except ValueError:
+            raise ValidationError(message)
+        if not all(0 <= percentile <= 100 for percentile in percentiles):
+            raise ValidationError(message)
+        return percentiles
+
+    def validate_branch_offices(self, value):
+        """Parses the branch office IDs."""
+        message = "Expected comma separated branch office IDs."
+        items = self.split(value, message)
+        if not all(item.isdigit() for item in items):
+            raise ValidationError(message)
+        return [int(item) for item in items]
+
+
+class JobSerializer(ModelSerializer):
+    """Job read serializer."""
+
+    class Meta:
+        model = Job
+        fields = ("id", "name", "status", "progress", "result", "error", "attempts", "max_attempts", "created_at",
+                  "run_at", "started_at", "finished_at",)
+        read_only_fields = fields
@@ -0,0 +1,80 @@
+"""API signal receivers."""
+
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .authentication import forget_token
+from .caching import invalidate
+from .changes import record_changes
+from .instrumentation import install_query_timer
+from .models import Technician, ResourceAssignment, BranchOffice, Resource, Change
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Technician)
+def index_technician(sender, instance, **kwargs):  # noqa
+    """Keeps the search index in sync with saved technicians."""
+    backend = get_search_backend()
+    if backend is not None:
+        backend.index([instance])
+
+
+@receiver(post_delete, sender=Technician)
+def remove_technician(sender, instance, **kwargs):  # noqa
+    """Removes deleted technicians from the search index."""
+    backend = get_search_backend()
+    if backend is not None:
+        backend.remove([instance.pk])
+
+
+@receiver(post_save, sender=Technician)
+@receiver(post_delete, sender=Technician)
+@receiver(post_save, sender=ResourceAssignment)
+@receiver(post_delete, sender=ResourceAssignment)
+@receiver(post_save, sender=BranchOffice)
+@receiver(post_delete, sender=BranchOffice)
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+def invalidate_cached_responses(sender, **kwargs):  # noqa
+    """Invalidates the cached responses depending on the changed model."""
+    invalidate(sender)
+
+
+@receiver(post_save, sender=Technician)
+@receiver(post_save, sender=ResourceAssignment)
+@receiver(post_save, sender=BranchOffice)
+@receiver(post_save, sender=Resource)
+def log_saved(sender, instance, created, **kwargs):  # noqa
+    """Appends the save to the change log, in the transaction of the save."""
+    record_changes(sender, [instance.pk], Change.CREATE if created else Change.UPDATE)
+
+
+@receiver(post_delete, sender=Technician)
+@receiver(post_delete, sender=ResourceAssignment)
+@receiver(post_delete, sender=BranchOffice)
+@receiver(post_delete, sender=Resource)
+def log_deleted(sender, instance, **kwargs):  # noqa
+    """Appends the deletion, cascaded ones included, to the change log, in the transaction of the deletion."""
+    record_changes(sender, [instance.pk], Change.DELETE)
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):  # noqa
+    """Removes deleted (or rotated) tokens from the authentication caches."""
+    forget_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def forget_user_tokens(sender, instance, created, **kwargs):  # noqa
+    """Removes the tokens of changed users, who might have been deactivated, from the authentication caches."""
+    if not created:
+        for key in Token.objects.filter(user=instance).values_list("key", flat=True):  # noqa
+            forget_token(key)
+
+
+@receiver(connection_created)
+def time_connection_queries(sender, connection, **kwargs):  # noqa
+    """Lets the instrumentation middleware time the queries of every new connection."""
+    install_query_timer(connection)
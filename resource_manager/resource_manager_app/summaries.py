@@ -0,0 +1,115 @@
+"""Incremental maintenance of the reporting summary tables."""
+
+from collections import defaultdict
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from .models import BranchOfficeSummary, BranchResourceSummary, ResourceAssignment, Technician
+
+
+def add_to_summary(model, keys, deltas):
+    """
+    Adds the deltas to the summary row identified by the keys with a single UPDATE, creating the row if it doesn't
+    exist yet. Deltas that are all 0 don't touch the database.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**keys).update(**updates) == 0:
+        try:
+            with transaction.atomic():
+                model.objects.create(**keys, **deltas)
+        except IntegrityError:
+            # Another request created the row in the meantime.
+            model.objects.filter(**keys).update(**updates)
+
+
+def update_branch_office_summary(branch_office_id, technicians=0, base_salary=0.0):
+    """Adds technicians and base salary to a branch office's totals."""
+    add_to_summary(BranchOfficeSummary, {"branch_office_id": branch_office_id},
+                   {"technician_count": technicians, "total_base_salary": base_salary})
+
+
+def update_branch_resource_summary(branch_office_id, resource_id, assignments=0, quantity=0):
+    """Adds assignments and units to a branch office's totals for a resource."""
+    add_to_summary(BranchResourceSummary, {"branch_office_id": branch_office_id, "resource_id": resource_id},
+                   {"assignment_count": assignments, "quantity": quantity})
+
+
+def record_technicians(technicians, sign=1):
+    """Adds (or removes, with sign=-1) the given technicians to the branch office totals."""
+    totals = defaultdict(lambda: [0, 0.0])
+    for technician in technicians:
+        totals[technician.branch_office_id][0] += sign
+        totals[technician.branch_office_id][1] += sign * technician.base_salary
+
+    for branch_office_id, (count, base_salary) in totals.items():
+        update_branch_office_summary(branch_office_id, count, base_salary)
+
+
+def record_assignments(assignments, sign=1):
+    """Adds (or removes, with sign=-1) the given (branch_office_id, resource_id, quantity) to the resource totals."""
+    totals = defaultdict(lambda: [0, 0])
+    for branch_office_id, resource_id, quantity in assignments:
+        totals[branch_office_id, resource_id][0] += sign
+        totals[branch_office_id, resource_id][1] += sign * quantity
+
+    for (branch_office_id, resource_id), (count, quantity) in totals.items():
+        update_branch_resource_summary(branch_office_id, resource_id, count, quantity)
+
+
+def record_assignment_changes(removed, added):
+    """
+    Removes and adds the given (branch_office_id, resource_id, quantity) to the resource totals with a locking read and
+    bulk writes, so batches cost the same number of queries whatever their size. Must run inside a transaction.
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for sign, assignments in ((-1, removed), (1, added)):
+        for branch_office_id, resource_id, quantity in assignments:
+            totals[branch_office_id, resource_id][0] += sign
+            totals[branch_office_id, resource_id][1] += sign * quantity
+    totals = {key: total for key, total in totals.items() if any(total)}
+    if not totals:
+        return
+
+    summaries = {
+        (summary.branch_office_id, summary.resource_id): summary
+        for summary in BranchResourceSummary.objects.select_for_update().order_by("pk").filter(  # noqa
+            branch_office_id__in={branch_office_id for branch_office_id, _ in totals},
+            resource_id__in={resource_id for _, resource_id in totals},
+        )
+    }
+    new_summaries = []
+    for key, (count, quantity) in totals.items():
+        summary = summaries.get(key)
+        if summary is None:
+            new_summaries.append(BranchResourceSummary(branch_office_id=key[0], resource_id=key[1],
+                                                       assignment_count=count, quantity=quantity))
+        else:
+            summary.assignment_count += count
+            summary.quantity += quantity
+
+    BranchResourceSummary.objects.bulk_update([summaries[key] for key in totals if key in summaries],  # noqa
+                                              ["assignment_count", "quantity"])
+    BranchResourceSummary.objects.bulk_create(new_summaries)  # noqa
+
+
+@transaction.atomic
+def rebuild_summaries():
+    """Recomputes every summary row from the technicians and assignments tables."""
+    BranchOfficeSummary.objects.all().delete()  # noqa
+    BranchResourceSummary.objects.all().delete()  # noqa
+
+    BranchOfficeSummary.objects.bulk_create([  # noqa
+        BranchOfficeSummary(branch_office_id=row["branch_office"], technician_count=row["technician_count"],
+                            total_base_salary=row["total_base_salary"])
+        for row in Technician.objects.order_by().values("branch_office").annotate(  # noqa
+            technician_count=Count("id"), total_base_salary=Sum("base_salary"))
+    ])
+    BranchResourceSummary.objects.bulk_create([  # noqa
+        BranchResourceSummary(branch_office_id=row["technician__branch_office"], resource_id=row["resource"],
+                              assignment_count=row["assignment_count"], quantity=row["quantity"])
+        for row in ResourceAssignment.objects.order_by().values("technician__branch_office", "resource").annotate(  # noqa
+            assignment_count=Count("id"), quantity=Sum("quantity"))
+    ])
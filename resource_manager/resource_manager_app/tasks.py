@@ -0,0 +1,68 @@
+"""Background job handlers."""
+
+import os
+from pathlib import Path
+from urllib.parse import urlencode
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpRequest, QueryDict
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from .jobs import job
+from .models import BranchOfficeSummary, BranchResourceSummary
+from .summaries import rebuild_summaries as rebuild
+from .views import BulkCreateTechnicianApiView, TechnicianViewSet, ResourceAssignmentViewSet
+
+export_viewsets = {
+    "technician": TechnicianViewSet,
+    "resourceassignment": ResourceAssignmentViewSet,
+}
+
+
+@job("bulk_create_technicians")
+def bulk_create_technicians(current_job):
+    """Imports the rows like the bulk endpoint does, returning its report and status code."""
+    try:
+        data, status_code = BulkCreateTechnicianApiView().import_rows(current_job.payload["rows"], current_job)
+    except ValidationError as error:
+        data, status_code = error.detail, error.status_code
+    return {"status_code": status_code, "data": data}
+
+
+@job("export")
+def export(current_job):
+    """
+    Writes the export of the viewset's rows filtered by the original request's query params to a file in
+    settings.JOB_FILES_DIR, renamed into place once complete so a retried job never serves a partial file.
+    """
+    model = current_job.payload["model"]
+    http_request = HttpRequest()
+    http_request.method = "GET"
+    http_request.GET = QueryDict(urlencode(current_job.payload["query_params"], doseq=True))
+    view = export_viewsets[model](request=Request(http_request), format_kwarg=None, action="export", basename=model,
+                                  args=(), kwargs={})
+    file_format = http_request.GET.get("file_format", "csv")
+    queryset = view.filter_queryset(view.get_queryset())
+    total = queryset.count()
+
+    directory = Path(settings.JOB_FILES_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    file = f"{current_job.pk}.{file_format}"
+    with open(directory / f"{file}.part", "w", newline="") as output:
+        for line_number, line in enumerate(view.export_lines(queryset, file_format), start=1):
+            output.write(line)
+            if line_number % view.export_chunk_size == 0:
+                current_job.set_progress(line_number, total + 1)
+    os.replace(directory / f"{file}.part", directory / file)
+
+    return {"file": file, "filename": f"{model}.{file_format}", "content_type": view.export_formats[file_format],
+            "rows": total}
+
+
+@job("rebuild_summaries")
+def rebuild_summaries(current_job):  # noqa
+    """Recomputes the summary tables in a single transaction, so the reports never show them half built."""
+    with transaction.atomic():
+        rebuild()
+    return {"branch_offices": BranchOfficeSummary.objects.count(),  # noqa
+            "branch_resources": BranchResourceSummary.objects.count()}  # noqa
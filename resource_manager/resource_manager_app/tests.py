@@ -1,3 +1,2014 @@
-from django.test import TestCase
+"""API tests."""
 
-# Create your tests here.
+import io
+import json
+import os
+import random
+import runpy
+import tempfile
+import threading
+import zlib
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from importlib.util import find_spec
+from itertools import chain, repeat
+from pathlib import Path
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, ValidationError as DjangoValidationError
+from django.contrib.auth.models import User
+from django.db import connection, connections, transaction, OperationalError
+from django.core.management import CommandError, call_command
+from django.db.models import Sum
+from django.test import AsyncClient, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
+from rest_framework.authtoken.models import Token
+from resource_manager import settings_api
+from .authentication import TokenCache, token_cache
+from . import projections
+from .benchmarking import compare_results, summarize
+from .backends.sqlite3.base import DatabaseWrapper as SQLiteWALDatabaseWrapper
+from .caching import get_cache
+from .checks import check_shared_caches
+from .changes import prune_changes
+from .idempotency import IdempotencyMiddleware
+from .instrumentation import get_metrics_networks, registry
+from .jobs import JobFailed, claim_job, handlers, enqueue, requeue_abandoned_jobs, run_job
+from .models import (Technician, ResourceAssignment, BranchOffice, Resource, BranchOfficeSummary,
+                     BranchResourceSummary, Change, IdempotencyKey, Job, StaleVersionError)
+from .renderers import FastJSONRenderer
+from .search import PostgreSQLTrigramSearchBackend, SQLiteFTSSearchBackend, get_search_backend
+from .serializers import (BatchAssignmentOperationSerializer, BulkCreateTechnicianSerializer, RowValidator,
+                          TechnicianSerializer, get_row_validator, row_serializers)
+from .summaries import rebuild_summaries
+from .utils import letter_number_only_validator
+from .views import BulkCreateTechnicianApiView, TechnicianViewSet, ResourceAssignmentViewSet
+from .warmup import warm_up
+
+
+class BulkCreateTechnicianTests(APITestCase):
+    """Tests for the bulk technician onboarding endpoint."""
+
+    url = "/api/new-technician/bulk"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        cls.resources = [Resource.objects.create(name=f"Resource {i}") for i in range(3)]  # noqa
+
+    def build_row(self, number, **overrides):
+        """Returns a valid bulk row for the given number."""
+        row = {
+            "name": f"Name{number}",
+            "last_name": f"LastName{number}",
+            "id_number": f"ID{number}",
+            "code": f"CODE{number}",
+            "description": "Technician",
+            "base_salary": 1000.0,
+            "branch_office": self.branch_office.pk,
+            "assigned_resources": [{"id": self.resources[0].pk, "quantity": 2},
+                                   {"id": self.resources[1].pk, "quantity": 3}],
+        }
+        row.update(overrides)
+        return row
+
+    def test_creates_all_rows(self):
+        rows = [self.build_row(i) for i in range(20)]
+        response = self.client.post(self.url, rows, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 20)
+        self.assertEqual(Technician.objects.count(), 20)  # noqa
+        self.assertEqual(ResourceAssignment.objects.count(), 40)  # noqa
+        technician = Technician.objects.get(pk=response.data["results"][0]["id"])  # noqa
+        self.assertEqual(technician.resource_quantity, 5)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.client.post(self.url, [self.build_row(i) for i in range(2)], format="json")
+        with CaptureQueriesContext(connection) as small_batch:
+            self.client.post(self.url, [self.build_row(i) for i in range(2, 7)], format="json")
+        with CaptureQueriesContext(connection) as large_batch:
+            self.client.post(self.url, [self.build_row(i) for i in range(7, 57)], format="json")
+        self.assertEqual(len(small_batch.captured_queries), len(large_batch.captured_queries))
+
+    def test_reports_invalid_rows_and_creates_the_rest(self):
+        Technician.objects.create(name="Old", last_name="Old", id_number="ID0", code="OLD",  # noqa
+                                  branch_office=self.branch_office)
+        rows = [
+            self.build_row(0),
+            self.build_row(1),
+            self.build_row(2, code="CODE1"),
+            self.build_row(3, branch_office=999),
+            self.build_row(4, code="bad-code"),
+            self.build_row(5),
+        ]
+        response = self.client.post(self.url, rows, format="json")
+
+        self.assertEqual(response.status_code, 207)
+        statuses = [result["status"] for result in response.data["results"]]
+        self.assertEqual(statuses, ["failed", "failed", "failed", "failed", "failed", "created"])
+        self.assertIn("id_number", response.data["results"][0]["errors"])
+        self.assertIn("code", response.data["results"][1]["errors"])
+        self.assertIn("branch_office", response.data["results"][3]["errors"])
+        self.assertIn("code", response.data["results"][4]["errors"])
+        self.assertEqual(Technician.objects.count(), 2)  # noqa
+
+    def test_uniqueness_is_checked_with_one_query(self):
+        Technician.objects.create(name="Old", last_name="Old", id_number="ID0", code="CODE9",  # noqa
+                                  branch_office=self.branch_office)
+        valid_rows, errors = get_row_validator(BulkCreateTechnicianSerializer).validate([
+            self.build_row(0, code="CODE1"), self.build_row(1), self.build_row(2, id_number="ID3"),
+            self.build_row(3), self.build_row(9),
+        ])
+        with self.assertNumQueries(1):
+            BulkCreateTechnicianApiView().check_duplicates(valid_rows, errors)
+        # The first row is rejected for its id_number, so the second one's code isn't a duplicate anymore.
+        self.assertEqual(list(valid_rows), [1])
+        self.assertEqual(list(errors[0]), ["id_number"])
+        self.assertEqual(list(errors[4]), ["code"])
+
+    def test_accepts_ndjson(self):
+        body = "\n".join(json.dumps(self.build_row(i)) for i in range(3))
+        response = self.client.post(self.url, body, content_type="application/x-ndjson")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Technician.objects.count(), 3)  # noqa
+
+
+class RowValidatorTests(SimpleTestCase):
+    """Tests for the compiled row validators and letter_number_only_validator."""
+
+    row = {"name": "Name", "last_name": "Last", "id_number": "ID1", "code": "CODE1", "description": "Technician",
+           "base_salary": 1000.0, "branch_office": 1, "assigned_resources": [{"id": 1, "quantity": 2}]}
+    operation = {"op": "create", "technician": 1, "resource": 2, "quantity": 3}
+    values = ["", " ", " padded", "CODE-1", "Ñandú", "x" * 256, "nul\x00", "\ud800", 1, 1.5, -1, 0, 11, True, None,
+              "2", float("nan"), [], {}, "delete", [{"id": 1, "quantity": 1}, {"id": 1, "quantity": 2}],
+              [{"id": "1", "quantity": 1}], [{"id": 1}], [{"id": 1, "quantity": 11}]]
+
+    def assert_same_results(self, serializer_class, rows):
+        """Checks the row validator accepts and rejects the rows exactly like the serializer."""
+        valid_rows, errors = get_row_validator(serializer_class).validate(rows)
+        for index, row in enumerate(rows):
+            serializer = serializer_class(data=row)
+            if serializer.is_valid():
+                self.assertEqual(valid_rows[index], serializer.validated_data, row)
+            else:
+                self.assertEqual(errors[index], serializer.errors, row)
+
+    def test_rows_are_validated_like_the_serializer(self):
+        for serializer_class, row in ((BulkCreateTechnicianSerializer, self.row),
+                                      (BatchAssignmentOperationSerializer, self.operation)):
+            rows = [row, [row], {**row, "extra": 1}]
+            for field in [*row, "id"]:
+                rows.append({key: value for key, value in row.items() if key != field})
+                rows.extend({**row, field: value} for value in self.values)
+            self.assert_same_results(serializer_class, rows)
+
+    def test_unsupported_serializers_are_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            RowValidator(TechnicianSerializer)
+
+    def test_letter_number_only_validator(self):
+        for value in ("", "CODE1", "abcXYZ0123456789"):
+            letter_number_only_validator(value)
+        for value, rejected in (("TEC-1!", "-!"), ("Ñandú 2", "Ñú "), ("٣", "٣"), ("a\nb", "\n")):
+            with self.assertRaises(DjangoValidationError) as context:
+                letter_number_only_validator(value)
+            self.assertEqual(context.exception.params, {"values": rejected})
+
+
+class BatchResourceAssignmentTests(APITestCase):
+    """Tests for the batch resource assignment endpoint."""
+
+    url = "/api/resource-assignment/batch"
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username="batch", password="batch"))
+        self.branch_offices = [
+            BranchOffice.objects.create(name=f"Branch {i}", address="Street", nit="1", phone="1")  # noqa
+            for i in range(2)
+        ]
+        self.resources = [Resource.objects.create(name=f"Resource {i}") for i in range(30)]  # noqa
+        self.technicians = [
+            Technician.objects.create(name="Name", last_name="Last", id_number=f"ID{i}", code=f"CODE{i}",  # noqa
+                                      branch_office=self.branch_offices[i], resource_quantity=0)
+            for i in range(2)
+        ]
+        self.assignments = [self.assign(self.technicians[0], resource, 2) for resource in self.resources[:25]]
+        self.assignments.append(self.assign(self.technicians[1], self.resources[0], 1))
+        rebuild_summaries()
+
+    @staticmethod
+    def assign(technician, resource, quantity):
+        """Creates an assignment keeping the technician's quantity."""
+        technician.resource_quantity += quantity
+        technician.save()
+        return ResourceAssignment.objects.create(technician=technician, resource=resource,  # noqa
+                                                 quantity=quantity)
+
+    def quantities(self):
+        """Returns the technicians' resource quantities."""
+        return [Technician.objects.get(pk=technician.pk).resource_quantity for technician in self.technicians]  # noqa
+
+    def test_moves_a_crew_in_one_batch(self):
+        first, second = self.technicians
+        response = self.client.post(self.url, [
+            {"op": "update", "id": self.assignments[1].pk, "technician": second.pk},
+            {"op": "update", "id": self.assignments[2].pk, "technician": second.pk, "quantity": 5},
+            {"op": "create", "technician": first.pk, "resource": self.resources[1].pk, "quantity": 4},
+            {"op": "delete", "id": self.assignments[3].pk},
+        ], format="json")
+
+        self.assertEqual(response.status_code, 200)
+        created_id = response.data["results"][2]["id"]
+        self.assertEqual(ResourceAssignment.objects.get(pk=created_id).quantity, 4)  # noqa
+        self.assertEqual(self.quantities(), [50 - 2 - 2 + 4 - 2, 1 + 2 + 5])
+        incremental = SummaryTests.snapshot()
+        rebuild_summaries()
+        self.assertEqual(incremental, SummaryTests.snapshot())
+
+    def test_final_state_is_checked_and_nothing_is_written_on_errors(self):
+        first, second = self.technicians
+        response = self.client.post(self.url, [
+            {"op": "delete", "id": self.assignments[-1].pk},
+            {"op": "create", "technician": first.pk, "resource": self.resources[0].pk},
+            {"op": "create", "technician": first.pk, "resource": self.resources[29].pk},
+        ], format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()["technicians"]), [str(second.pk)])
+        self.assertEqual(list(response.json()["operations"][1]), ["resource"])
+        self.assertEqual(self.quantities(), [50, 1])
+        self.assertEqual(ResourceAssignment.objects.count(), 26)  # noqa
+
+        response = self.client.post(self.url, [
+            {"op": "delete", "id": self.assignments[-1].pk},
+            {"op": "create", "technician": second.pk, "resource": self.resources[29].pk},
+        ], format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), [50, 1])
+
+    def test_invalid_operations(self):
+        response = self.client.post(self.url, [
+            {"op": "update"},
+            {"op": "create", "technician": self.technicians[0].pk, "resource": 999},
+            {"op": "delete", "id": 999},
+        ], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["operations"][1:], [{}, {}])
+
+        response = self.client.post(self.url, [
+            {"op": "create", "technician": self.technicians[0].pk, "resource": 999},
+            {"op": "delete", "id": 999},
+        ], format="json")
+        self.assertEqual([list(errors) for errors in response.json()["operations"]], [["resource"], ["id"]])
+
+    def test_query_count_does_not_grow_with_operations(self):
+        def move(assignments, technician):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, [{"op": "update", "id": assignment.pk,
+                                                        "technician": technician.pk}
+                                                       for assignment in assignments], format="json")
+            self.assertEqual(response.status_code, 200)
+            return len(queries.captured_queries)
+
+        self.assertEqual(move(self.assignments[1:3], self.technicians[1]),
+                         move(self.assignments[3:23], self.technicians[1]))
+
+
+class ExpandTests(APITestCase):
+    """Tests for the ?expand= eager loading on the technician and assignment listings."""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username="expand", password="expand"))
+        self.branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        self.resources = [Resource.objects.create(name=f"Resource {i}") for i in range(3)]  # noqa
+        self.technician_count = 0
+
+    def add_technicians(self, count):
+        """Creates technicians with an assignment for every resource."""
+        for _ in range(count):
+            self.technician_count += 1
+            technician = Technician.objects.create(  # noqa
+                name="Name", last_name="Last", id_number=f"ID{self.technician_count}",
+                code=f"CODE{self.technician_count}", branch_office=self.branch_office, resource_quantity=3)
+            for resource in self.resources:
+                ResourceAssignment.objects.create(technician=technician, resource=resource)  # noqa
+
+    def test_technician_expansion(self):
+        self.add_technicians(1)
+        response = self.client.get("/api/technician/?expand=branch_office,assignments,resource")
+
+        technician = response.data["results"][0]
+        self.assertEqual(technician["branch_office"]["name"], "Main")
+        self.assertEqual(len(technician["assignments"]), 3)
+        self.assertEqual(technician["assignments"][0]["resource"]["name"], "Resource 0")
+
+    def test_technician_query_count_is_flat(self):
+        url = "/api/technician/?expand=branch_office,assignments,resource"
+        self.add_technicians(2)
+        with self.assertNumQueries(2):
+            self.client.get(url)
+        self.add_technicians(20)
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data["results"]), 22)
+
+    def test_assignment_query_count_is_flat(self):
+        url = "/api/resource-assignment/?expand=technician,branch_office,resource"
+        self.add_technicians(2)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        self.add_technicians(20)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data["results"][0]["technician"]["branch_office"]["name"], "Main")
+        self.assertEqual(response.data["results"][0]["resource"]["name"], "Resource 0")
+
+    def test_invalid_expansion(self):
+        response = self.client.get("/api/technician/?expand=salary")
+        self.assertEqual(response.status_code, 400)
+
+
+class PaginationTests(APITestCase):
+    """Tests for the keyset and offset pagination of the list endpoints."""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username="pages", password="pages"))
+        branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        Technician.objects.bulk_create([  # noqa
+            Technician(name="Name", last_name="Last", id_number=f"ID{i}", code=f"CODE{i}", active=i % 3 != 0,
+                       branch_office=branch_office)
+            for i in range(25)
+        ])
+        self.expected = list(Technician.all_objects.order_by("creation_date", "id")  # noqa
+                             .values_list("id", flat=True))
+
+    def test_walks_all_pages_forwards_and_backwards(self):
+        pages = []
+        url = "/api/technician/?page_size=7&include_inactive=true"
+        while url:
+            response = self.client.get(url)
+            pages.append([technician["id"] for technician in response.data["results"]])
+            url = response.data["next"]
+
+        self.assertEqual([len(page) for page in pages], [7, 7, 7, 4])
+        self.assertEqual([pk for page in pages for pk in page], self.expected)
+
+        response = self.client.get(self.client.get("/api/technician/?page_size=7&include_inactive=true").data["next"])
+        response = self.client.get(self.client.get(response.data["next"]).data["previous"])
+        self.assertEqual([technician["id"] for technician in response.data["results"]], pages[1])
+
+    def test_deep_pages_use_at_most_one_query_per_ordering_field(self):
+        url = "/api/technician/?page_size=5&include_inactive=true"
+        for _ in range(4):
+            url = self.client.get(url).data["next"]
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        self.assertLessEqual(len(context.captured_queries), 2)
+
+    def test_offset_pagination_opt_in(self):
+        response = self.client.get("/api/technician/?pagination=offset&limit=5&offset=20&include_inactive=true")
+
+        self.assertEqual(response.data["count"], 25)
+        self.assertEqual([technician["id"] for technician in response.data["results"]], self.expected[20:])
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/technician/?cursor=invalid")
+        self.assertEqual(response.status_code, 404)
+
+        # Cursors are opaque to clients, but nothing stops them from sending tampered ones.
+        for position in (["notadate", 1], ["2020-01-01", "x"], [{"a": 1}, 1], ["2020-01-01"]):
+            cursor = urlsafe_b64encode(json.dumps({"p": position, "r": False}).encode()).decode()
+            response = self.client.get(f"/api/technician/?cursor={cursor}")
+            self.assertEqual(response.status_code, 404, position)
+
+
+class RowListTests(APITestCase):
+    """Tests for the values_list() based list responses."""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username="rows", password="rows"))
+        branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        resource = Resource.objects.create(name="Drill")  # noqa
+        salaries = [0.0, 1500.5, 1e20, 1e-05, 2.5e-07, 123456789.125]
+        descriptions = [None, "Line\u2028break", "Ünïcödé \"quoted\"", "", "Plain", None]
+        technicians = Technician.objects.bulk_create([  # noqa
+            Technician(name=f"Name{i}", last_name="Last", id_number=f"ID{i}", code=f"CODE{i}", active=i % 2 == 0,
+                       base_salary=salary, description=description, resource_quantity=1, branch_office=branch_office)
+            for i, (salary, description) in enumerate(zip(salaries, descriptions))
+        ])
+        ResourceAssignment.objects.bulk_create([  # noqa
+            ResourceAssignment(technician=technician, resource=resource) for technician in technicians
+        ])
+
+    def get_both(self, url):
+        """Returns the response content with and without the row list."""
+        contents = []
+        for row_list in (True, False):
+            get_cache().clear()
+            TechnicianViewSet.row_list = ResourceAssignmentViewSet.row_list = row_list
+            try:
+                contents.append(self.client.get(url).content)
+            finally:
+                TechnicianViewSet.row_list = ResourceAssignmentViewSet.row_list = True
+        return contents
+
+    def test_responses_match_the_serializers(self):
+        urls = [
+            "/api/technician/?page_size=4&include_inactive=true",
+            json.loads(self.get_both("/api/technician/?page_size=4&include_inactive=true")[0])["next"],
+            "/api/technician/?search=Name1",
+            "/api/technician/?pagination=offset&limit=3&offset=2",
+            "/api/resource-assignment/?page_size=4",
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                rows, serialized = self.get_both(url)
+                self.assertEqual(rows, serialized)
+
+    def test_uses_the_fast_renderer_unless_expanded(self):
+        response = self.client.get("/api/technician/")
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+
+        response = self.client.get("/api/technician/?expand=branch_office")
+        self.assertNotIsInstance(response.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(response.data["results"][0]["branch_office"]["name"], "Main")
+
+
+class ExportTests(APITestCase):
+    """Tests for the streaming CSV and NDJSON exports."""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username="export", password="export"))
+        branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        resource = Resource.objects.create(name="Drill")  # noqa
+        for i in range(3):
+            technician = Technician.objects.create(  # noqa
+                name=f"Name{i}", last_name="Last", id_number=f"ID{i}", code=f"CODE{i}", base_salary=1000.0 + i,
+                branch_office=branch_office, resource_quantity=2)
+            ResourceAssignment.objects.create(technician=technician, resource=resource, quantity=2)  # noqa
+
+    def test_technician_csv_export(self):
+        response = self.client.get("/api/technician/export/?file_format=csv")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].endswith("base_salary,branch_office,branch_office_name"))
+        self.assertTrue(lines[1].endswith(f"1000.0,{BranchOffice.objects.get().pk},Main"))  # noqa
+
+    def test_assignment_ndjson_export(self):
+        response = self.client.get("/api/resource-assignment/export/?file_format=ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]["resource_name"], "Drill")
+        self.assertEqual(rows[0]["technician_code"], "CODE0")
+
+    def test_invalid_format(self):
+        response = self.client.get("/api/technician/export/?file_format=xml")
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchTests(APITestCase):
+    """Tests for the indexed technician search."""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username="search", password="search"))
+        self.branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        for i, (name, code) in enumerate([("Ana", "AB100"), ("Andres", "XY200"), ("Bruno", "AN300")]):
+            Technician.objects.create(name=name, last_name="Perez", id_number=f"55{i}", code=code,  # noqa
+                                      branch_office=self.branch_office)
+
+    def search(self, term):
+        """Returns the codes of the technicians found with the term, in order."""
+        response = self.client.get("/api/technician/", {"search": term})
+        return [technician["code"] for technician in response.data["results"]]
+
+    def test_uses_the_fts_backend(self):
+        self.assertIsInstance(get_search_backend(), SQLiteFTSSearchBackend)
+
+    def test_prefix_matches_ranked_by_field_weight(self):
+        self.assertEqual(self.search("AN")[0], "AN300")
+        self.assertEqual(set(self.search("AN")), {"AB100", "XY200", "AN300"})
+        self.assertEqual(self.search("55"), ["AB100", "XY200", "AN300"])
+        self.assertEqual(self.search("andres perez"), ["XY200"])
+
+    def test_index_follows_updates_deletes_and_bulk_creates(self):
+        technician = Technician.objects.get(code="XY200")  # noqa
+        technician.code = "ZZ999"
+        technician.save()
+        self.assertEqual(self.search("XY"), [])
+        self.assertEqual(self.search("ZZ9"), ["ZZ999"])
+
+        technician.delete()
+        self.assertEqual(self.search("ZZ9"), [])
+
+        Technician.objects.filter(code="AB100").delete()  # noqa
+        self.assertEqual(self.search("AB"), [])
+
+        resource = Resource.objects.create(name="Drill")  # noqa
+        self.client.post("/api/new-technician/bulk", [{
+            "name": "Carla", "last_name": "Gomez", "id_number": "777", "code": "CG777", "description": "New",
+            "base_salary": 1.0, "branch_office": self.branch_office.pk,
+            "assigned_resources": [{"id": resource.pk, "quantity": 1}],
+        }], format="json")
+        self.assertEqual(self.search("carl"), ["CG777"])
+
+    def test_ranking_is_kept_across_pages(self):
+        for i in range(5):
+            Technician.objects.create(name="Anibal", last_name="Diaz", id_number=f"66{i}", code=f"Q{i}",  # noqa
+                                      branch_office=self.branch_office)
+        expected = self.search("an")
+        codes = []
+        url = "/api/technician/?search=an&page_size=2"
+        while url:
+            response = self.client.get(url)
+            codes += [technician["code"] for technician in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(codes, expected)
+
+    def test_every_active_match_is_reachable(self):
+        technicians = Technician.objects.bulk_create([  # noqa
+            Technician(name="Zoe", last_name="Diaz", id_number=f"77{i}", code=f"Z{i}", branch_office=self.branch_office,
+                       active=i >= 20)
+            for i in range(620)
+        ])
+        get_search_backend().index(technicians)
+        codes = []
+        url = "/api/technician/?search=zoe&page_size=250"
+        while url:
+            response = self.client.get(url)
+            codes += [technician["code"] for technician in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(sorted(codes), sorted(f"Z{i}" for i in range(20, 620)))
+
+    def test_postgresql_profile_installs_the_trigram_lookups(self):
+        with mock.patch.dict(os.environ, {"DATABASE_PROFILE": "postgresql"}):
+            profile = runpy.run_path(str(settings.BASE_DIR / "resource_manager" / "settings.py"))
+        self.assertIn("django.contrib.postgres", profile["INSTALLED_APPS"])
+
+        # Without the app, the lookups don't exist and searches fall back to icontains.
+        get_search_backend.cache_clear()
+        self.addCleanup(get_search_backend.cache_clear)
+        with mock.patch.object(connections["default"], "vendor", "postgresql"):
+            self.assertIsNone(get_search_backend())
+
+    @skipUnless(find_spec("psycopg2"), "psycopg2 is not installed.")
+    def test_trigram_lookups_resolve_with_the_postgres_app(self):
+        with self.modify_settings(INSTALLED_APPS={"append": "django.contrib.postgres"}):
+            queryset = PostgreSQLTrigramSearchBackend().search(Technician.objects.all(), "ana")  # noqa
+        self.assertIn("search_similarity", queryset.query.annotations)
+
+
+class SummaryTests(APITestCase):
+    """Tests for the incrementally maintained reporting summaries."""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username="report", password="report"))
+        self.branch_offices = [
+            BranchOffice.objects.create(name=f"Branch {i}", address="Street", nit="1", phone="1")  # noqa
+            for i in range(2)
+        ]
+        self.resources = [Resource.objects.create(name=f"Resource {i}") for i in range(3)]  # noqa
+
+    @staticmethod
+    def snapshot():
+        """Returns the content of the summary tables."""
+        return (
+            sorted(BranchOfficeSummary.objects.values_list("branch_office", "technician_count",  # noqa
+                                                           "total_base_salary")),
+            sorted(BranchResourceSummary.objects.exclude(assignment_count=0).values_list(  # noqa
+                "branch_office", "resource", "assignment_count", "quantity")),
+        )
+
+    def assert_matches_rebuild(self):
+        """Checks the incremental summaries equal the ones rebuilt from scratch."""
+        incremental = self.snapshot()
+        rebuild_summaries()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_write_endpoints_keep_the_summaries_up_to_date(self):
+        self.client.post("/api/new-technician", {
+            "name": "Ana", "last_name": "Perez", "id_number": "1", "code": "A1", "description": "New",
+            "base_salary": 1500.0, "branch_office": self.branch_offices[0].pk,
+            "assigned_resources": [{"id": self.resources[0].pk, "quantity": 2},
+                                   {"id": self.resources[1].pk, "quantity": 1}],
+        }, format="json")
+        self.client.post("/api/new-technician/bulk", [{
+            "name": "Luis", "last_name": "Diaz", "id_number": str(i + 2), "code": f"L{i}", "description": "New",
+            "base_salary": 1000.0, "branch_office": self.branch_offices[i % 2].pk,
+            "assigned_resources": [{"id": self.resources[i % 3].pk, "quantity": 3}],
+        } for i in range(4)], format="json")
+        self.assert_matches_rebuild()
+
+        first, second = Technician.objects.order_by("id")[:2]  # noqa
+        response = self.client.post("/api/resource-assignment/", {
+            "technician": first.pk, "resource": self.resources[2].pk, "quantity": 4}, format="json")
+        self.client.put(f"/api/resource-assignment/{response.data['id']}/", {
+            "technician": second.pk, "resource": self.resources[2].pk, "quantity": 5}, format="json")
+        self.client.patch(f"/api/resource-assignment/{response.data['id']}/", {"quantity": 6}, format="json")
+        self.assert_matches_rebuild()
+
+        self.client.delete(f"/api/resource-assignment/{response.data['id']}/")
+        self.client.patch(f"/api/technician/{first.pk}/", {"base_salary": 2000.0}, format="json")
+        self.client.patch(f"/api/technician/{second.pk}/", {"branch_office": self.branch_offices[1].pk},
+                          format="json")
+        self.assert_matches_rebuild()
+
+        self.client.delete(f"/api/technician/{first.pk}/")
+        self.assert_matches_rebuild()
+
+    def test_report_endpoints(self):
+        self.client.post("/api/new-technician/bulk", [{
+            "name": "Luis", "last_name": "Diaz", "id_number": str(i), "code": f"L{i}", "description": "New",
+            "base_salary": 1000.0, "branch_office": self.branch_offices[0].pk,
+            "assigned_resources": [{"id": self.resources[0].pk, "quantity": 3}],
+        } for i in range(3)], format="json")
+
+        response = self.client.get("/api/report/branch-office/")
+        self.assertEqual(response.data["results"], [{
+            "branch_office": self.branch_offices[0].pk, "branch_office_name": "Branch 0",
+            "technician_count": 3, "total_base_salary": 3000.0,
+        }])
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/report/branch-resource/",
+                                       {"branch_office": self.branch_offices[0].pk})
+        self.assertEqual(response.data["results"][0]["resource_name"], "Resource 0")
+        self.assertEqual(response.data["results"][0]["quantity"], 9)
+
+
+class PayrollProjectionTests(APITestCase):
+    """Tests for the payroll projection report."""
+
+    url = "/api/report/payroll-projection"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="finance", password="finance")
+        cls.branch_offices = [BranchOffice.objects.create(name=f"Branch {i}", address="Street", nit=f"{i}",  # noqa
+                                                          phone=f"{i}") for i in range(2)]
+        salaries = ((0, 1000.0, 2), (0, 2000.0, 4), (0, 3000.0, 0), (1, 4000.0, 6))
+        for number, (branch_office, base_salary, resource_quantity) in enumerate(salaries):
+            Technician.objects.create(name="Name", last_name="Last", id_number=f"ID{number}",  # noqa
+                                      code=f"CODE{number}", base_salary=base_salary,
+                                      resource_quantity=resource_quantity,
+                                      branch_office=cls.branch_offices[branch_office])
+        Technician.objects.create(name="Name", last_name="Last", id_number="ARCHIVED", code="ARCHIVED",  # noqa
+                                  base_salary=9000.0, active=False, branch_office=cls.branch_offices[1])
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_projection(self):
+        first, second = self.branch_offices
+        with self.assertNumQueries(1):
+            response = self.client.get(f"{self.url}?raise_percent=10&branch_raises={second.pk}:-50&unit_cost=100"
+                                       f"&percentiles=50,75")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["branch_offices"], [
+            {"branch_office": first.pk, "technicians": 3, "payroll": 6000.0, "projected_payroll": 6600.0,
+             "resource_units": 6, "resource_cost": 600.0, "projected_cost": 7200.0, "cost_per_unit": 1200.0,
+             "salary_percentiles": {"50": 2200.0, "75": 2750.0}},
+            {"branch_office": second.pk, "technicians": 1, "payroll": 4000.0, "projected_payroll": 2000.0,
+             "resource_units": 6, "resource_cost": 600.0, "projected_cost": 2600.0, "cost_per_unit": 433.33,
+             "salary_percentiles": {"50": 2000.0, "75": 2000.0}},
+        ])
+        self.assertEqual(response.data["totals"], {
+            "technicians": 4, "payroll": 10000.0, "projected_payroll": 8600.0, "resource_units": 12,
+            "resource_cost": 1200.0, "projected_cost": 9800.0, "cost_per_unit": 816.67,
+            "salary_percentiles": {"50": 2100.0, "75": 2475.0},
+        })
+
+    def test_pure_python_projection_matches_numpy(self):
+        url = f"{self.url}?raise_percent=3.5&branch_raises={self.branch_offices[0].pk}:7&unit_cost=2.5" \
+              f"&percentiles=0,10,33.3,50,99.9,100"
+        expected = self.client.get(url).data
+        with mock.patch.object(projections, "get_numpy", lambda: None):
+            self.assertEqual(self.client.get(url).data, expected)
+            self.assertEqual(self.client.get(f"{self.url}?branch_offices=999").data["totals"]["technicians"], 0)
+
+    def test_large_and_sparse_branch_office_ids(self):
+        # Sparse IDs would size a lookup table by the highest one, far along IDs by their range.
+        for ids in ((1, 10 ** 15), (10 ** 12, 10 ** 12 + 1)):
+            rows = [(ids[0], 1000.0, 1), (ids[1], 2000.0, 2), (ids[0], 3000.0, 3)]
+            projection = projections.project_payroll(projections.to_columns(rows), branch_raises={ids[1]: 10},
+                                                     percentiles=(50,))
+            self.assertEqual([(row["branch_office"], row["projected_payroll"])
+                              for row in projection["branch_offices"]], [(ids[0], 4000.0), (ids[1], 2200.0)])
+            with mock.patch.object(projections, "get_numpy", lambda: None):
+                self.assertEqual(projections.project_payroll(projections.to_columns(rows), branch_raises={ids[1]: 10},
+                                                             percentiles=(50,)), projection)
+
+    def test_branch_office_filter_and_empty_projection(self):
+        response = self.client.get(f"{self.url}?branch_offices={self.branch_offices[1].pk}&percentiles=")
+        self.assertEqual([row["branch_office"] for row in response.data["branch_offices"]],
+                         [self.branch_offices[1].pk])
+        self.assertEqual(response.data["totals"]["salary_percentiles"], {})
+
+        response = self.client.get(f"{self.url}?branch_offices=999")
+        self.assertEqual(response.data["branch_offices"], [])
+        self.assertEqual(response.data["totals"]["salary_percentiles"], {"50": None, "90": None})
+        self.assertIsNone(response.data["totals"]["cost_per_unit"])
+
+    def test_invalid_params(self):
+        for query in ("raise_percent=-101", "raise_percent=nan", "unit_cost=-1", "unit_cost=inf",
+                      "branch_raises=1:x", "branch_raises=x:1", "percentiles=101", "branch_offices=1,a"):
+            response = self.client.get(f"{self.url}?{query}")
+            self.assertEqual(response.status_code, 400, query)
+
+    def test_command(self):
+        output = io.StringIO()
+        call_command("project_payroll", raise_percent="10", percentile=["50"], stdout=output)
+        self.assertIn("total: 4 technicians, payroll 10000.0 -> 11000.0", output.getvalue())
+
+
+class ArchiveTests(APITestCase):
+    """Tests for the active managers, the soft deletes and ?include_inactive=."""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.force_authenticate(User.objects.create_user(username="archive", password="archive"))
+        self.branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        self.resources = [Resource.objects.create(name=f"Resource {i}") for i in range(2)]  # noqa
+        self.technicians = [
+            Technician.objects.create(name="Name", last_name="Last", id_number=f"ID{i}", code=f"CODE{i}",  # noqa
+                                      branch_office=self.branch_office, resource_quantity=3, base_salary=100.0)
+            for i in range(3)
+        ]
+        for technician in self.technicians:
+            for quantity, resource in enumerate(self.resources, start=1):
+                ResourceAssignment.objects.create(technician=technician, resource=resource,  # noqa
+                                                  quantity=quantity)
+        rebuild_summaries()
+
+    def list_ids(self, url):
+        """Returns the IDs of the list response."""
+        return [row["id"] for row in self.client.get(url).data["results"]]
+
+    def test_archived_rows_are_hidden_unless_included(self):
+        archived = self.technicians[0]
+        Technician.objects.filter(pk=archived.pk).update(active=False)  # noqa
+
+        self.assertEqual(Technician.objects.count(), 2)  # noqa
+        self.assertEqual(Technician.all_objects.count(), 3)  # noqa
+        self.assertNotIn(archived.pk, self.list_ids("/api/technician/"))
+        self.assertEqual(self.client.get(f"/api/technician/{archived.pk}/").status_code, 404)
+        self.assertIn(archived.pk, self.list_ids("/api/technician/?include_inactive=true"))
+        self.assertFalse(self.client.get(f"/api/technician/{archived.pk}/?include_inactive=1").data["active"])
+        self.assertEqual(self.client.get("/api/technician/?include_inactive=maybe").status_code, 400)
+
+    def test_delete_archives_the_technician_and_its_assignments(self):
+        technician = self.technicians[0]
+        cursor = self.client.get("/api/changes").data["cursor"]
+        response = self.client.delete(f"/api/technician/{technician.pk}/")
+
+        self.assertEqual(response.status_code, 204)
+        technician.refresh_from_db()
+        self.assertFalse(technician.active)
+        self.assertEqual(ResourceAssignment.all_objects.filter(technician=technician, active=False).count(), 2)  # noqa
+        self.assertEqual(ResourceAssignment.objects.count(), 4)  # noqa
+        self.assertEqual(len(self.list_ids("/api/resource-assignment/?include_inactive=true")), 6)
+        self.assertEqual(self.client.delete(f"/api/technician/{technician.pk}/").status_code, 404)
+
+        summary = BranchOfficeSummary.objects.get()  # noqa
+        self.assertEqual((summary.technician_count, summary.total_base_salary), (2, 200.0))
+        self.assertEqual(BranchResourceSummary.objects.order_by("resource").first().quantity, 2)  # noqa
+
+        changes = self.client.get("/api/changes", {"since": cursor}).data["changes"]
+        self.assertEqual(changes["technician"], {"upserted": [], "deleted": [technician.pk]})
+        self.assertEqual(len(changes["resource_assignment"]["deleted"]), 2)
+
+    def test_update_restores_archived_technicians(self):
+        technician = self.technicians[0]
+        incremental = SummaryTests.snapshot()
+        self.client.delete(f"/api/technician/{technician.pk}/")
+        self.assertEqual(self.client.patch(f"/api/technician/{technician.pk}/", {"active": True},
+                                           format="json").status_code, 404)
+
+        response = self.client.patch(f"/api/technician/{technician.pk}/?include_inactive=true", {"active": True},
+                                     format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ResourceAssignment.objects.filter(technician=technician).count(), 2)  # noqa
+        self.assertEqual(SummaryTests.snapshot(), incremental)
+
+    def test_archived_rows_keep_their_unique_values_and_cannot_be_referenced(self):
+        self.client.delete(f"/api/technician/{self.technicians[0].pk}/")
+        Resource.objects.filter(pk=self.resources[1].pk).update(active=False)  # noqa
+
+        response = self.client.post("/api/new-technician/bulk", [{
+            "name": "Name", "last_name": "Last", "id_number": "ID0", "code": "NEW", "description": "New",
+            "base_salary": 1.0, "branch_office": self.branch_office.pk,
+            "assigned_resources": [{"id": self.resources[0].pk, "quantity": 1}],
+        }], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("id_number", response.data["results"][0]["errors"])
+
+        response = self.client.patch(f"/api/technician/{self.technicians[1].pk}/", {"code": "CODE0"},
+                                     format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/resource-assignment/", {
+            "technician": self.technicians[0].pk, "resource": self.resources[0].pk}, format="json")
+        self.assertIn("technician", response.data)
+        ResourceAssignment.objects.filter(technician=self.technicians[1], resource=self.resources[1]).delete()  # noqa
+        response = self.client.post("/api/resource-assignment/", {
+            "technician": self.technicians[1].pk, "resource": self.resources[1].pk}, format="json")
+        self.assertIn("resource", response.data)
+
+    def test_hot_path_reads_the_partial_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Checks SQLite query plans.")
+        ordering = ["creation_date", "id"]
+        self.assertIn("technician_active_idx", Technician.objects.order_by(*ordering)[:100].explain())  # noqa
+        self.assertIn("technician_branch_idx", Technician.objects.filter(  # noqa
+            branch_office=self.branch_office).order_by(*ordering)[:100].explain())
+        self.assertIn("assignment_active_idx", ResourceAssignment.objects.order_by("id")[:100].explain())  # noqa
+
+
+class InventoryTests(APITestCase):
+    """Tests for the resources' stock and the availability endpoint."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="stock", password="stock", is_staff=True)
+        self.client.force_authenticate(self.user)
+        self.branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        self.resources = [Resource.objects.create(name=f"Resource {i}") for i in range(3)]  # noqa
+        self.technicians = [
+            Technician.objects.create(name="Name", last_name="Last", id_number=f"ID{i}", code=f"CODE{i}",  # noqa
+                                      branch_office=self.branch_office, resource_quantity=2)
+            for i in range(3)
+        ]
+        self.assignments = [ResourceAssignment.objects.create(technician=technician, resource=self.resources[0],  # noqa
+                                                              quantity=2)
+                            for technician in self.technicians]
+
+    def set_stock(self, resource, total_stock):
+        """Sets a resource's total stock through the API."""
+        return self.client.put(f"/api/resource/{resource.pk}/stock", {"total_stock": total_stock}, format="json")
+
+    def available(self, resource):
+        """Returns the resource's available stock."""
+        return Resource.all_objects.values_list("available_stock", flat=True).get(pk=resource.pk)  # noqa
+
+    def test_setting_the_stock_keeps_assigned_units_reserved(self):
+        response = self.set_stock(self.resources[0], 10)
+        self.assertEqual(response.data, {"id": self.resources[0].pk, "total_stock": 10, "available_stock": 4})
+        self.assertEqual(self.set_stock(self.resources[0], 5).status_code, 400)
+        self.assertEqual(self.set_stock(self.resources[0], None).data["available_stock"], None)
+
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.set_stock(self.resources[0], 10).status_code, 403)
+
+    def test_assignment_writes_reserve_and_release_stock(self):
+        self.set_stock(self.resources[1], 5)
+        technician = self.technicians[0]
+
+        response = self.client.post("/api/resource-assignment/", {
+            "technician": technician.pk, "resource": self.resources[1].pk, "quantity": 6}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.available(self.resources[1]), 5)
+
+        response = self.client.post("/api/resource-assignment/", {
+            "technician": technician.pk, "resource": self.resources[1].pk, "quantity": 4}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.available(self.resources[1]), 1)
+
+        url = f"/api/resource-assignment/{response.data['id']}/"
+        self.assertEqual(self.client.patch(url, {"quantity": 6}, format="json").status_code, 400)
+        self.assertEqual(self.client.patch(url, {"quantity": 5}, format="json").status_code, 200)
+        self.assertEqual(self.available(self.resources[1]), 0)
+        self.assertEqual(self.client.patch(url, {"resource": self.resources[2].pk}, format="json").status_code, 200)
+        self.assertEqual(self.available(self.resources[1]), 5)
+        self.assertEqual(self.client.patch(url, {"resource": self.resources[1].pk}, format="json").status_code, 200)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.available(self.resources[1]), 5)
+
+    def test_archived_technicians_release_their_stock(self):
+        self.set_stock(self.resources[0], 6)
+        technician = self.technicians[0]
+
+        self.client.delete(f"/api/technician/{technician.pk}/")
+        self.assertEqual(self.available(self.resources[0]), 2)
+        ResourceAssignment.objects.filter(pk=self.assignments[1].pk).update(quantity=3)  # noqa
+        self.set_stock(self.resources[0], 5)
+
+        response = self.client.patch(f"/api/technician/{technician.pk}/?include_inactive=true", {"active": True},
+                                     format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Technician.all_objects.get(pk=technician.pk).active)  # noqa
+        self.assertEqual(self.available(self.resources[0]), 0)
+
+    def test_bulk_and_batch_writes_check_the_stock(self):
+        self.set_stock(self.resources[1], 5)
+        row = {"last_name": "Last", "description": "New", "base_salary": 1.0, "branch_office": self.branch_office.pk}
+        response = self.client.post("/api/new-technician/bulk", [
+            {**row, "name": "A", "id_number": "NEW1", "code": "NEW1",
+             "assigned_resources": [{"id": self.resources[1].pk, "quantity": 3}]},
+            {**row, "name": "B", "id_number": "NEW2", "code": "NEW2",
+             "assigned_resources": [{"id": self.resources[1].pk, "quantity": 3}]},
+            {**row, "name": "C", "id_number": "NEW3", "code": "NEW3",
+             "assigned_resources": [{"id": self.resources[1].pk, "quantity": 2}]},
+        ], format="json")
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result["status"] for result in response.data["results"]], ["created", "failed", "created"])
+        self.assertEqual(self.available(self.resources[1]), 0)
+
+        created = ResourceAssignment.objects.filter(resource=self.resources[1]).order_by("pk").first()  # noqa
+        operations = [{"op": "create", "technician": self.technicians[0].pk, "resource": self.resources[1].pk,
+                       "quantity": 3}]
+        response = self.client.post("/api/resource-assignment/batch", operations, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("resource", response.data["operations"][0])
+
+        operations.append({"op": "update", "id": created.pk, "resource": self.resources[2].pk})
+        response = self.client.post("/api/resource-assignment/batch", operations, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.available(self.resources[1]), 0)
+
+    def test_availability(self):
+        self.set_stock(self.resources[0], 10)
+        self.set_stock(self.resources[1], 2)
+        Resource.objects.filter(pk=self.resources[2].pk).update(active=False)  # noqa
+
+        url = f"/api/resource/availability?ids={self.resources[0].pk},{self.resources[1].pk},{self.resources[2].pk}"
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.data["results"], [
+            {"id": self.resources[0].pk, "total_stock": 10, "available_stock": 4},
+            {"id": self.resources[1].pk, "total_stock": 2, "available_stock": 2},
+        ])
+        self.assertFalse(any("resourceassignment" in query["sql"] for query in queries.captured_queries))
+
+        response = self.client.get("/api/resource/availability?min_available=3")
+        self.assertEqual([row["id"] for row in response.data["results"]], [self.resources[0].pk])
+        self.assertEqual(self.client.get("/api/resource/availability?ids=1,x").status_code, 400)
+
+
+class CachingTests(APITestCase):
+    """Tests for the cached list and retrieve responses."""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.force_authenticate(User.objects.create_user(username="cache", password="cache"))
+        self.branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        self.resource = Resource.objects.create(name="Drill")  # noqa
+        self.technician = Technician.objects.create(name="Ana", last_name="Perez", id_number="1", code="A1",  # noqa
+                                                    branch_office=self.branch_office, resource_quantity=1)
+        self.assignment = ResourceAssignment.objects.create(technician=self.technician,  # noqa
+                                                            resource=self.resource)
+
+    def test_repeated_reads_skip_the_database(self):
+        first = self.client.get("/api/technician/")
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/technician/")
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_writes_invalidate_dependent_responses(self):
+        self.client.get(f"/api/technician/{self.technician.pk}/")
+        self.client.patch(f"/api/technician/{self.technician.pk}/", {"name": "Anna"}, format="json")
+        self.assertEqual(self.client.get(f"/api/technician/{self.technician.pk}/").data["name"], "Anna")
+
+        self.client.get("/api/technician/")
+        self.client.patch(f"/api/resource-assignment/{self.assignment.pk}/", {"quantity": 4}, format="json")
+        self.assertEqual(self.client.get("/api/technician/").data["results"][0]["resource_quantity"], 4)
+
+    def test_unrelated_writes_keep_the_cache(self):
+        self.client.get("/api/technician/")
+        self.client.get("/api/technician/?expand=assignments,resource")
+        self.resource.name = "Hammer"
+        self.resource.save()
+
+        with self.assertNumQueries(0):
+            self.client.get("/api/technician/")
+        response = self.client.get("/api/technician/?expand=assignments,resource")
+        self.assertEqual(response.data["results"][0]["assignments"][0]["resource"]["name"], "Hammer")
+
+    def test_if_none_match(self):
+        etag = self.client.get("/api/technician/")["ETag"]
+        self.assertEqual(self.client.get("/api/technician/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.patch(f"/api/technician/{self.technician.pk}/", {"name": "Anna"}, format="json")
+        self.assertEqual(self.client.get("/api/technician/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_shared_cache_deployment_check(self):
+        self.assertEqual([error.id for error in check_shared_caches(None)], ["resource_manager_app.E001"])
+        shared = {"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "cache"}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_shared_caches(None), [])
+
+
+class OptimisticConcurrencyTests(APITestCase):
+    """Tests for the version checks of technician and assignment writes."""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.force_authenticate(User.objects.create_user(username="versions", password="versions"))
+        branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        self.resources = [Resource.objects.create(name=f"Resource {i}") for i in range(3)]  # noqa
+        self.technician = Technician.objects.create(name="Ana", last_name="Perez", id_number="1", code="A1",  # noqa
+                                                    branch_office=branch_office, resource_quantity=2)
+        self.assignment, _ = ResourceAssignment.objects.bulk_create([  # noqa
+            ResourceAssignment(technician=self.technician, resource=resource) for resource in self.resources[:2]
+        ])
+        self.url = f"/api/technician/{self.technician.pk}/"
+
+    def test_if_match_with_the_current_version(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.assertTrue(etag.startswith('"1-'))
+
+        response = self.client.patch(self.url, {"name": "Anna"}, format="json", HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["version"], 2)
+        self.assertEqual(response["ETag"], '"2"')
+
+        response = self.client.patch(self.url, {"name": "Hanna"}, format="json", HTTP_IF_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.url).data["version"], 3)
+
+    def test_stale_if_match_is_rejected(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.client.patch(self.url, {"name": "Anna"}, format="json")
+
+        for if_match in (etag, 'W/"2"', "invalid"):
+            response = self.client.patch(self.url, {"name": "Hanna"}, format="json", HTTP_IF_MATCH=if_match)
+            self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.client.patch(self.url, {"name": "Hanna"}, format="json", HTTP_IF_MATCH="*").status_code,
+                         200)
+        self.technician.refresh_from_db()
+        self.assertEqual((self.technician.name, self.technician.version), ("Hanna", 3))
+
+    def test_version_is_checked_by_the_update_without_extra_selects(self):
+        queries = []
+        with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+            response = self.client.patch(self.url, {"name": "Anna"}, format="json", HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, 200)
+
+        technician_queries = [sql for sql in queries if '"resource_manager_app_technician"' in sql.split(" WHERE ")[0]]
+        self.assertEqual([sql.split()[0] for sql in technician_queries], ["SELECT", "UPDATE"])
+        self.assertIn('"version" = %s', technician_queries[1])
+
+    def test_save_of_a_changed_row_fails(self):
+        first = Technician.objects.get(pk=self.technician.pk)  # noqa
+        second = Technician.objects.get(pk=self.technician.pk)  # noqa
+        first.name = "Anna"
+        first.save()
+
+        second.name = "Hanna"
+        with self.assertRaises(StaleVersionError), transaction.atomic():
+            second.save()
+        self.technician.refresh_from_db()
+        self.assertEqual((self.technician.name, self.technician.version), ("Anna", 2))
+
+    def test_assignment_writes_change_the_technician_version(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.client.post("/api/resource-assignment/", {
+            "technician": self.technician.pk, "resource": self.resources[2].pk, "quantity": 1}, format="json")
+
+        response = self.client.patch(self.url, {"name": "Anna"}, format="json", HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+
+    def test_assignment_if_match(self):
+        url = f"/api/resource-assignment/{self.assignment.pk}/"
+        response = self.client.patch(url, {"quantity": 3}, format="json", HTTP_IF_MATCH='"1"')
+        self.assertEqual(response["ETag"], '"2"')
+
+        self.assertEqual(self.client.patch(url, {"quantity": 4}, format="json", HTTP_IF_MATCH='"1"').status_code, 412)
+        self.assertEqual(self.client.delete(url, HTTP_IF_MATCH='"1"').status_code, 412)
+        self.assertEqual(self.client.delete(url, HTTP_IF_MATCH='"2"').status_code, 204)
+
+
+class ChangeFeedTests(APITestCase):
+    """Tests for the change log and the incremental sync feed."""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.force_authenticate(User.objects.create_user(username="changes", password="changes"))
+        self.branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        self.resources = [Resource.objects.create(name=f"Resource {i}") for i in range(3)]  # noqa
+        self.technicians = [
+            Technician.objects.create(name="Name", last_name="Last", id_number=f"ID{i}", code=f"CODE{i}",  # noqa
+                                      branch_office=self.branch_office, resource_quantity=1)
+            for i in range(20)
+        ]
+        self.assignments = [ResourceAssignment.objects.create(technician=technician,  # noqa
+                                                              resource=self.resources[0])
+                            for technician in self.technicians]
+        self.cursor = self.client.get("/api/changes").data["cursor"]
+
+    def sync(self, cursor=None, **params):
+        """Returns the feed's response after the cursor, the one of setUp by default."""
+        params.setdefault("since", self.cursor if cursor is None else cursor)
+        return self.client.get("/api/changes", params)
+
+    def test_starts_from_the_current_cursor(self):
+        self.assertEqual(self.cursor, Change.objects.order_by("id").last().pk)  # noqa
+        response = self.sync()
+        self.assertEqual((response.data["cursor"], response.data["has_more"], response.data["changes"]),
+                         (self.cursor, False, {}))
+
+    def test_changes_are_coalesced_by_object(self):
+        technician = self.technicians[0]
+        self.client.patch(f"/api/technician/{technician.pk}/", {"name": "Anna"}, format="json")
+        self.client.patch(f"/api/technician/{technician.pk}/", {"name": "Hanna"}, format="json")
+        response = self.client.post("/api/resource-assignment/", {
+            "technician": technician.pk, "resource": self.resources[1].pk, "quantity": 2}, format="json")
+        self.client.delete(f"/api/resource-assignment/{self.assignments[0].pk}/")
+
+        data = self.sync().data
+        self.assertEqual(data["changes"]["technician"]["upserted"],
+                         [self.client.get(f"/api/technician/{technician.pk}/").data])
+        self.assertEqual(data["changes"]["resource_assignment"], {
+            "upserted": [response.data],
+            "deleted": [self.assignments[0].pk],
+        })
+        self.assertEqual(self.sync(data["cursor"]).data["changes"], {})
+
+    def test_bulk_writes_and_cascades_are_logged(self):
+        response = self.client.post("/api/resource-assignment/batch", [
+            {"op": "create", "technician": self.technicians[1].pk, "resource": self.resources[2].pk},
+            {"op": "update", "id": self.assignments[2].pk, "quantity": 3},
+        ], format="json")
+        self.assertEqual(response.status_code, 200)
+        self.client.delete(f"/api/technician/{self.technicians[5].pk}/")
+
+        changes = self.sync().data["changes"]
+        self.assertEqual([row["id"] for row in changes["technician"]["upserted"]],
+                         [self.technicians[1].pk, self.technicians[2].pk])
+        self.assertEqual(changes["technician"]["deleted"], [self.technicians[5].pk])
+        self.assertEqual([row["id"] for row in changes["resource_assignment"]["upserted"]],
+                         [self.assignments[2].pk, response.data["results"][0]["id"]])
+        self.assertEqual(changes["resource_assignment"]["deleted"], [self.assignments[5].pk])
+
+    def test_rolled_back_writes_leave_no_trace(self):
+        response = self.client.delete(f"/api/resource-assignment/{self.assignments[0].pk}/")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(f"/api/technician/{self.technicians[0].pk}/", {"name": "Anna"}, format="json",
+                                     HTTP_IF_MATCH='"5"')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.sync().data["changes"], {})
+
+    def test_batches_and_model_filter(self):
+        for technician in self.technicians[:5]:
+            self.client.patch(f"/api/technician/{technician.pk}/", {"name": "Anna"}, format="json")
+        self.resources[0].name = "Hammer"
+        self.resources[0].save()
+
+        data = self.sync(limit=3).data
+        self.assertTrue(data["has_more"])
+        self.assertEqual(len(data["changes"]["technician"]["upserted"]), 3)
+        data = self.sync(data["cursor"], limit=3).data
+        self.assertFalse(data["has_more"])
+        self.assertEqual(len(data["changes"]["technician"]["upserted"]), 2)
+        self.assertEqual(data["changes"]["resource"]["upserted"][0]["name"], "Hammer")
+
+        self.assertEqual(list(self.sync(models="resource").data["changes"]), ["resource"])
+        self.assertEqual(self.sync(models="unknown").status_code, 400)
+        self.assertEqual(self.sync(cursor="-1").status_code, 400)
+
+    def test_cost_depends_on_the_changes_only(self):
+        self.client.patch(f"/api/technician/{self.technicians[0].pk}/", {"name": "Anna"}, format="json")
+        queries = []
+        with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+            response = self.sync()
+        self.assertEqual(len(response.data["changes"]["technician"]["upserted"]), 1)
+        # Watermark, the entries after the cursor and the changed technicians.
+        self.assertEqual(len(queries), 3)
+
+    def test_pruned_cursors_expire(self):
+        Change.objects.update(changed_at=timezone.now() - timedelta(days=60))  # noqa
+        self.client.patch(f"/api/technician/{self.technicians[0].pk}/", {"name": "Anna"}, format="json")
+        self.assertGreater(prune_changes(30), 0)
+
+        self.assertEqual(self.sync(0).status_code, 410)
+        self.assertEqual(self.sync().status_code, 200)
+
+    def test_gaps_in_the_log_dont_expire_cursors(self):
+        # IDs of rolled back writes are never committed, which leaves the same gap before the oldest entry as pruning.
+        Change.objects.filter(id__lte=self.cursor).delete()  # noqa
+        self.client.patch(f"/api/technician/{self.technicians[0].pk}/", {"name": "Anna"}, format="json")
+
+        response = self.sync(0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["changes"]["technician"]["upserted"][0]["name"], "Anna")
+
+
+class JobTests(APITestCase):
+    """Tests for the background job queue and the endpoints answering with jobs."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="jobs", password="jobs")
+        self.client.force_authenticate(self.user)
+        self.branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        self.resource = Resource.objects.create(name="Drill")  # noqa
+        files_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(files_dir.cleanup)
+        settings_override = override_settings(JOB_FILES_DIR=files_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def build_row(self, number):
+        """Returns a valid bulk technician row."""
+        return {"name": f"Name{number}", "last_name": "Last", "id_number": f"ID{number}", "code": f"CODE{number}",
+                "description": "Technician", "base_salary": 1000.0, "branch_office": self.branch_office.pk,
+                "assigned_resources": [{"id": self.resource.pk, "quantity": 2}]}
+
+    def register(self, name, handler):
+        """Registers a job handler for the test."""
+        handlers[name] = handler
+        self.addCleanup(handlers.pop, name)
+
+    @staticmethod
+    def work():
+        """Runs the due jobs one after the other and returns how many ran."""
+        count = 0
+        while (claimed := claim_job("test")) is not None:
+            run_job(claimed)
+            count += 1
+        return count
+
+    def test_bulk_import_job(self):
+        response = self.client.post("/api/new-technician/bulk", [self.build_row(i) for i in range(3)], format="json",
+                                    HTTP_PREFER="respond-async, wait=10")
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response["Location"], f"/api/jobs/{response.data['id']}/")
+        self.assertEqual(response.data["status"], Job.QUEUED)
+        self.assertFalse(Technician.objects.exists())  # noqa
+
+        self.assertEqual(self.work(), 1)
+        job = self.client.get(response["Location"]).data
+        self.assertEqual((job["status"], job["progress"], job["attempts"]), (Job.SUCCEEDED, 1.0, 1))
+        self.assertEqual((job["result"]["status_code"], job["result"]["data"]["created"]), (201, 3))
+        self.assertEqual(Technician.objects.count(), 3)  # noqa
+
+    def test_anonymous_requests_stay_synchronous(self):
+        self.client.force_authenticate(None)
+        response = self.client.post("/api/new-technician/bulk", [self.build_row(0)], format="json",
+                                    HTTP_PREFER="respond-async")
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(Job.objects.exists())  # noqa
+
+    def test_export_job(self):
+        for i in range(3):
+            Technician.objects.create(name=f"Name{i}", last_name="Last", id_number=f"ID{i}", code=f"CODE{i}",  # noqa
+                                      branch_office=self.branch_office, resource_quantity=1)
+        streamed = self.client.get("/api/technician/export/?file_format=ndjson&search=CODE1")
+        response = self.client.get("/api/technician/export/?file_format=ndjson&search=CODE1",
+                                   HTTP_PREFER="respond-async")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.client.get(f"/api/jobs/{response.data['id']}/download/").status_code, 404)
+
+        self.work()
+        download = self.client.get(f"/api/jobs/{response.data['id']}/download/")
+        self.assertEqual(download["Content-Disposition"], 'attachment; filename="technician.ndjson"')
+        self.assertEqual(b"".join(download.streaming_content), b"".join(streamed.streaming_content))
+
+    def test_summary_rebuild_job(self):
+        self.assertEqual(self.client.post("/api/report/rebuild").status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        Technician.objects.create(name="Name", last_name="Last", id_number="ID", code="CODE",  # noqa
+                                  branch_office=self.branch_office, resource_quantity=1, base_salary=10.0)
+
+        response = self.client.post("/api/report/rebuild")
+        self.assertEqual(response.status_code, 202)
+        self.work()
+        self.assertEqual(Job.objects.get().result, {"branch_offices": 1, "branch_resources": 0})  # noqa
+        self.assertEqual(BranchOfficeSummary.objects.get().total_base_salary, 10.0)  # noqa
+
+    def test_jobs_are_private(self):
+        self.register("noop", lambda job: None)
+        other = enqueue("noop", user=User.objects.create_user(username="other", password="other"))
+        own = enqueue("noop", user=self.user)
+
+        self.assertEqual([job["id"] for job in self.client.get("/api/jobs/").data["results"]], [own.pk])
+        self.assertEqual(self.client.get(f"/api/jobs/{other.pk}/").status_code, 404)
+
+    @override_settings(JOB_RETRY_BACKOFF=10)
+    def test_failures_are_retried_with_backoff(self):
+        calls = []
+
+        def flaky(job):  # noqa
+            calls.append(job.attempts)
+            if len(calls) == 1:
+                raise OperationalError("database is locked")
+            return len(calls)
+
+        self.register("flaky", flaky)
+        job = enqueue("flaky", max_attempts=3)
+
+        start = timezone.now()
+        with self.assertLogs("resource_manager_app.jobs", "WARNING"):
+            self.assertEqual(self.work(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn("database is locked", job.error)
+        self.assertGreaterEqual(job.run_at, start + timedelta(seconds=10))
+        self.assertEqual(self.work(), 0)
+
+        Job.objects.update(run_at=timezone.now())  # noqa
+        self.assertEqual(self.work(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.error, calls), (Job.SUCCEEDED, 2, "", [1, 2]))
+
+    def test_permanent_failures(self):
+        def reject(job):  # noqa
+            raise JobFailed("Nothing to do.")
+
+        self.register("rejected", reject)
+        self.register("broken", lambda job: 1 / 0)
+        rejected = enqueue("rejected")
+        broken = enqueue("broken", max_attempts=1)
+        with self.assertLogs("resource_manager_app.jobs", "ERROR"):
+            self.work()
+
+        rejected.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertEqual((rejected.status, rejected.attempts, rejected.error), (Job.FAILED, 1, "Nothing to do."))
+        self.assertEqual((broken.status, broken.attempts), (Job.FAILED, 1))
+
+    def test_claims_and_abandoned_jobs(self):
+        self.register("noop", lambda job: None)
+        job = enqueue("noop")
+        self.assertEqual(claim_job("first").pk, job.pk)
+        self.assertIsNone(claim_job("second"))
+
+        self.assertEqual(requeue_abandoned_jobs(), 0)
+        Job.objects.update(heartbeat_at=timezone.now() - timedelta(hours=1))  # noqa
+        with self.assertLogs("resource_manager_app.jobs", "WARNING"):
+            self.assertEqual(requeue_abandoned_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.worker), (Job.QUEUED, 1, ""))
+
+
+class JobWorkerTests(TransactionTestCase):
+    """Tests for the run_jobs worker command."""
+
+    def test_runs_the_queued_jobs_on_a_thread_pool(self):
+        results = []
+        handlers["collect"] = lambda job: results.append(job.payload["number"]) or job.payload["number"]
+        self.addCleanup(handlers.pop, "collect")
+        for number in range(6):
+            enqueue("collect", {"number": number})
+
+        call_command("run_jobs", workers=3, once=True, poll_interval=0.01, stdout=io.StringIO())
+
+        self.assertEqual(sorted(results), list(range(6)))
+        self.assertEqual(sorted(Job.objects.values_list("status", "result")),  # noqa
+                         [(Job.SUCCEEDED, number) for number in range(6)])
+
+    def test_database_errors_are_retried_on_the_next_poll(self):
+        results = []
+        handlers["collect"] = lambda job: results.append(job.payload["number"]) or job.payload["number"]
+        self.addCleanup(handlers.pop, "collect")
+        enqueue("collect", {"number": 1})
+
+        with mock.patch("resource_manager_app.jobs.requeue_abandoned_jobs",
+                        side_effect=chain([OperationalError("database is locked")], repeat(0))), \
+                self.assertLogs("resource_manager_app.jobs", "ERROR") as logs:
+            call_command("run_jobs", workers=1, once=True, poll_interval=0.01, stdout=io.StringIO())
+
+        self.assertIn("poll failed", logs.output[0])
+        self.assertEqual(results, [1])
+        self.assertEqual(Job.objects.get().status, Job.SUCCEEDED)  # noqa
+
+
+class ApiProfileTests(APITestCase):
+    """Tests for the API only settings profile and the worker warm up."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username="profile", password="profile")
+        self.token = Token.objects.create(user=self.user)  # noqa
+        self.client = APIClient(enforce_csrf_checks=True)
+
+    @override_settings(MIDDLEWARE=settings_api.MIDDLEWARE, ROOT_URLCONF=settings_api.ROOT_URLCONF,
+                       REST_FRAMEWORK=settings_api.REST_FRAMEWORK)
+    def test_requests_through_the_lean_stack(self):
+        branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        technician = Technician.objects.create(name="Name", last_name="Last", id_number="ID", code="CODE",  # noqa
+                                               branch_office=branch_office)
+        authorization = f"Token {self.token.key}"
+
+        self.assertEqual(self.client.get("/api/technician/", HTTP_AUTHORIZATION=authorization).status_code, 200)
+        response = self.client.patch(f"/api/technician/{technician.pk}/", {"description": "Lean"}, format="json",
+                                     HTTP_AUTHORIZATION=authorization)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get("/api/technician/").status_code, 401)
+        self.assertEqual(self.client.get("/admin/").status_code, 404)
+
+        response = self.client.post("/api/login/", {"username": "profile", "password": "profile"}, format="json")
+        self.assertEqual(response.data["token"], self.token.key)
+
+    def test_warm_up_compiles_the_serializers_without_queries(self):
+        row_serializers.clear()
+        with self.assertNumQueries(0):
+            warm_up()
+        self.assertIn(TechnicianSerializer, row_serializers)
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    """Tests for the cached token authentication."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username="token", password="token")
+        self.token = Token.objects.create(user=self.user)  # noqa
+
+    def get(self, key):
+        """Requests the assignment list with the given token."""
+        return self.client.get("/api/resource-assignment/", HTTP_AUTHORIZATION=f"Token {key}")
+
+    def test_token_lookup_is_cached(self):
+        with CaptureQueriesContext(connection) as first:
+            self.assertEqual(self.get(self.token.key).status_code, 200)
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(self.get(self.token.key).status_code, 200)
+        self.assertEqual(len(second.captured_queries), len(first.captured_queries) - 1)
+
+    def test_deleted_and_deactivated_tokens_are_rejected(self):
+        self.get(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get(self.token.key).status_code, 401)
+
+        self.user.is_active = True
+        self.user.save()
+        self.get(self.token.key)
+        self.token.delete()
+        self.assertEqual(self.get(self.token.key).status_code, 401)
+
+    def test_rotate_and_logout(self):
+        self.get(self.token.key)
+        response = self.client.post("/api/login/rotate/", HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        new_key = response.data["token"]
+        self.assertEqual(self.get(self.token.key).status_code, 401)
+        self.assertEqual(self.get(new_key).status_code, 200)
+
+        self.client.post("/api/login/logout/", HTTP_AUTHORIZATION=f"Token {new_key}")
+        self.assertEqual(self.get(new_key).status_code, 401)
+
+    def test_revocations_reach_the_other_processes(self):
+        key = self.token.key
+        self.assertEqual(self.get(key).status_code, 200)
+        self.assertIsNotNone(token_cache.get(key))
+
+        # Another worker, with its own LRU, deletes the token: this one's entry is outdated by the revocation count.
+        with mock.patch("resource_manager_app.authentication.token_cache", TokenCache(max_size=10, ttl=60)):
+            self.token.delete()
+        self.assertIsNotNone(token_cache.get(key))
+        self.assertEqual(self.get(key).status_code, 401)
+
+
+class AsyncApiTests(APITestCase):
+    """Tests for the async technician and assignment endpoints."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username="async", password="async")
+        self.headers = {"AUTHORIZATION": f"Token {Token.objects.create(user=self.user).key}"}  # noqa
+        branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        self.resources = [Resource.objects.create(name=f"Resource {i}") for i in range(2)]  # noqa
+        self.technicians = [
+            Technician.objects.create(name="Name", last_name="Last", id_number=f"ID{i}", code=f"CODE{i}",  # noqa
+                                      branch_office=branch_office, resource_quantity=1)
+            for i in range(3)
+        ]
+        for technician in self.technicians:
+            ResourceAssignment.objects.create(technician=technician, resource=self.resources[0])  # noqa
+        self.client.force_authenticate(self.user)
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get("/api/async/technician/")
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get("/api/async/technician/", AUTHORIZATION="Token invalid")
+        self.assertEqual(response.status_code, 401)
+
+    async def test_reads_match_the_sync_endpoints(self):
+        for url in ("technician/?page_size=2", f"technician/{self.technicians[0].pk}/",
+                    "resource-assignment/?pagination=offset&limit=2"):
+            response = await self.async_client.get(f"/api/async/{url}", **self.headers)
+            sync_response = await sync_to_async(self.client.get)(f"/api/{url}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content.replace(b"/async", b"")),
+                             json.loads(sync_response.content))
+
+        response = await self.async_client.get("/api/async/technician/0/", **self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_assignment_writes_keep_quantities(self):
+        technician = self.technicians[0]
+        response = await self.async_client.post("/api/async/resource-assignment/", {
+            "technician": technician.pk, "resource": self.resources[1].pk, "quantity": 4,
+        }, content_type="application/json", **self.headers)
+        self.assertEqual(response.status_code, 201)
+        assignment_id = response.json()["id"]
+
+        response = await self.async_client.patch(f"/api/async/resource-assignment/{assignment_id}/", {
+            "quantity": 2,
+        }, content_type="application/json", **self.headers)
+        self.assertEqual(response.json()["quantity"], 2)
+        self.assertEqual((await Technician.objects.aget(pk=technician.pk)).resource_quantity, 3)  # noqa
+
+        response = await self.async_client.patch(f"/api/async/resource-assignment/{assignment_id}/", {
+            "quantity": 20,
+        }, content_type="application/json", **self.headers)
+        self.assertEqual(response.status_code, 400)
+
+        response = await self.async_client.delete(f"/api/async/resource-assignment/{assignment_id}/",
+                                                  **self.headers)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual((await Technician.objects.aget(pk=technician.pk)).resource_quantity, 1)  # noqa
+
+    async def test_token_writes_skip_csrf_checks(self):
+        client = AsyncClient(enforce_csrf_checks=True)
+        body = {"technician": self.technicians[1].pk, "resource": self.resources[1].pk, "quantity": 2}
+        response = await client.post("/api/async/resource-assignment/", body, content_type="application/json",
+                                     **self.headers)
+        self.assertEqual(response.status_code, 201)
+        response = await client.patch(f"/api/async/resource-assignment/{response.json()['id']}/", {"quantity": 3},
+                                      content_type="application/json", **self.headers)
+        self.assertEqual(response.status_code, 200)
+
+
+class IdempotencyTests(APITestCase):
+    """Tests for the Idempotency-Key middleware."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username="retry", password="retry")
+        self.token = Token.objects.create(user=self.user)  # noqa
+        self.branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        self.resource = Resource.objects.create(name="Resource")  # noqa
+        self.technician = Technician.objects.create(name="Name", last_name="Last", id_number="ID",  # noqa
+                                                    code="CODE", branch_office=self.branch_office)
+
+    def new_technician(self, code="NEW1"):
+        """Returns the body of a new technician request."""
+        return {
+            "name": "Ana", "last_name": "Perez", "id_number": code, "code": code, "description": "New",
+            "base_salary": 1500.0, "branch_office": self.branch_office.pk,
+            "assigned_resources": [{"id": self.resource.pk, "quantity": 2}],
+        }
+
+    def post(self, path, data, key="retry-1", token=None):
+        """Sends the request with the key and the token's credentials."""
+        return self.client.post(path, data, format="json", HTTP_IDEMPOTENCY_KEY=key,
+                                HTTP_AUTHORIZATION=f"Token {(token or self.token).key}")
+
+    def get_hashes(self, path, data, key="retry-1"):
+        """Returns the key and fingerprint the middleware computes for the request."""
+        request = APIRequestFactory().post(path, data, format="json", HTTP_IDEMPOTENCY_KEY=key,
+                                           HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        return IdempotencyMiddleware.get_hashes(request)
+
+    def test_retries_replay_the_response_without_writing_again(self):
+        first = self.post("/api/new-technician", self.new_technician())
+        retry = self.post("/api/new-technician", self.new_technician())
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual((retry.status_code, retry.content), (first.status_code, first.content))
+        self.assertEqual(retry["Content-Type"], "application/json")
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertNotIn("Idempotent-Replayed", first)
+        self.assertEqual(Technician.objects.filter(code="NEW1").count(), 1)  # noqa
+
+        body = {"technician": self.technician.pk, "resource": self.resource.pk, "quantity": 3}
+        created = self.post("/api/resource-assignment/", body, key="retry-2")
+        replayed = self.post("/api/resource-assignment/", body, key="retry-2")
+        self.assertEqual(created.status_code, 201)
+        self.assertEqual(replayed.json(), created.json())
+        self.assertEqual(replayed["ETag"], created["ETag"])
+        self.technician.refresh_from_db()
+        self.assertEqual(self.technician.resource_quantity, 3)
+
+        # Without a key, requests run every time.
+        self.assertEqual(self.client.post("/api/new-technician", self.new_technician(), format="json",
+                                          HTTP_AUTHORIZATION=f"Token {self.token.key}").status_code, 400)
+
+    def test_keys_are_scoped_by_request_and_credentials(self):
+        self.post("/api/new-technician", self.new_technician())
+        response = self.post("/api/new-technician", self.new_technician("NEW2"))
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(Technician.objects.filter(code="NEW2").exists())  # noqa
+
+        other = Token.objects.create(user=User.objects.create_user(username="other", password="other"))  # noqa
+        response = self.post("/api/new-technician", self.new_technician("NEW2"), token=other)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertTrue(Technician.objects.filter(code="NEW2").exists())  # noqa
+
+        self.assertEqual(self.post("/api/new-technician", self.new_technician("NEW3"), key="").status_code, 400)
+        self.assertEqual(self.post("/api/new-technician", self.new_technician("NEW3"), key="k" * 256).status_code,
+                         400)
+        self.assertEqual(IdempotencyKey.objects.count(), 2)  # noqa
+
+    def test_anonymous_keys_are_scoped_by_client(self):
+        for _ in range(2):
+            response = self.client.post("/api/new-technician", self.new_technician("NEW2"), format="json",
+                                        HTTP_IDEMPOTENCY_KEY="anonymous", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+        self.assertEqual(Technician.objects.filter(code="NEW2").count(), 1)  # noqa
+
+        # Another client's key runs its own request.
+        response = self.client.post("/api/new-technician", self.new_technician("NEW2"), format="json",
+                                    HTTP_IDEMPOTENCY_KEY="anonymous", REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("Idempotent-Replayed", response)
+
+        factory = APIRequestFactory()
+        request = factory.post("/api/new-technician", HTTP_IDEMPOTENCY_KEY="anonymous", REMOTE_ADDR="10.0.0.1")
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = "session"
+        self.assertEqual(IdempotencyMiddleware.get_scope(request), "session:session")
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=100)
+    def test_large_bodies_are_fingerprinted_whole(self):
+        body = self.new_technician()
+        self.assertNotEqual(self.get_hashes("/api/new-technician", body),
+                            self.get_hashes("/api/new-technician", dict(body, description="Old")))
+
+        first = self.post("/api/new-technician", body)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(Technician.objects.get(code="NEW1").description, "New")  # noqa
+        self.assertEqual(self.post("/api/new-technician", body)["Idempotent-Replayed"], "true")
+        self.assertEqual(self.post("/api/new-technician", dict(body, description="Old")).status_code, 422)
+
+    def test_server_errors_release_the_key(self):
+        body = {"technician": self.technician.pk, "resource": self.resource.pk, "quantity": 3}
+        with mock.patch.object(ResourceAssignmentViewSet, "perform_create", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.post("/api/resource-assignment/", body)
+        self.assertFalse(IdempotencyKey.objects.exists())  # noqa
+
+        response = self.post("/api/resource-assignment/", body)
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", response)
+
+    def test_retries_wait_for_the_running_request(self):
+        key, fingerprint = self.get_hashes("/api/new-technician", self.new_technician())
+        IdempotencyKey.objects.create(key=key, fingerprint=fingerprint,  # noqa
+                                      expires_at=timezone.now() + timedelta(minutes=1))
+
+        def finish_first_request(_):
+            IdempotencyKey.objects.filter(key=key).update(  # noqa
+                status_code=200, headers={"Content-Type": "application/json"},
+                body=zlib.compress(b'{"detail": "First"}'))
+
+        with mock.patch("resource_manager_app.idempotency.time.sleep", side_effect=finish_first_request) as sleep:
+            response = self.post("/api/new-technician", self.new_technician())
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(response.json(), {"detail": "First"})
+        self.assertFalse(Technician.objects.filter(code="NEW1").exists())  # noqa
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_lost_requests_are_taken_over(self):
+        key, fingerprint = self.get_hashes("/api/new-technician", self.new_technician())
+        record = IdempotencyKey.objects.create(key=key, fingerprint=fingerprint,  # noqa
+                                               expires_at=timezone.now() + timedelta(minutes=1))
+        response = self.post("/api/new-technician", self.new_technician())
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Retry-After"], "1")
+
+        record.expires_at = timezone.now() - timedelta(seconds=1)
+        record.save()
+        response = self.post("/api/new-technician", self.new_technician())
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Technician.objects.filter(code="NEW1").exists())  # noqa
+
+        IdempotencyKey.objects.filter(key=key).update(expires_at=timezone.now() - timedelta(seconds=1))  # noqa
+        out = io.StringIO()
+        call_command("prune_idempotency_keys", stdout=out)
+        self.assertIn("1 idempotency keys deleted.", out.getvalue())
+        self.assertFalse(IdempotencyKey.objects.exists())  # noqa
+
+    async def test_async_views(self):
+        headers = {"AUTHORIZATION": f"Token {self.token.key}", "IDEMPOTENCY_KEY": "retry-async"}
+        body = {"technician": self.technician.pk, "resource": self.resource.pk, "quantity": 2}
+        responses = [await self.async_client.post("/api/async/resource-assignment/", body,
+                                                  content_type="application/json", **headers)
+                     for _ in range(2)]
+        self.assertEqual(responses[0].status_code, 201)
+        self.assertEqual(responses[1].json(), responses[0].json())
+        self.assertEqual(responses[1]["Idempotent-Replayed"], "true")
+        self.assertEqual(await ResourceAssignment.objects.filter(technician=self.technician).acount(), 1)  # noqa
+
+
+class InstrumentationTests(APITestCase):
+    """Tests for the request instrumentation middleware and the metrics endpoint."""
+
+    def setUp(self):
+        registry.clear()
+        token_cache.clear()
+        get_cache().clear()
+        self.user = User.objects.create_user(username="metrics", password="metrics")
+        self.token = Token.objects.create(user=self.user)  # noqa
+        branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        for i in range(3):
+            Technician.objects.create(name="Name", last_name="Last", id_number=f"ID{i}", code=f"CODE{i}",  # noqa
+                                      branch_office=branch_office)
+
+    def metrics(self):
+        """Returns the metrics endpoint's lines."""
+        response = self.client.get("/metrics")
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        return response.content.decode().splitlines()
+
+    def test_records_requests_by_view(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        for _ in range(2):
+            self.client.get("/api/technician/?page_size=2")
+        self.client.get("/api/technician/0/")
+
+        labels = 'view="technician-list",method="GET"'
+        lines = self.metrics()
+        self.assertIn(f'resource_manager_http_requests_total{{{labels},status="200"}} 2', lines)
+        self.assertIn('resource_manager_http_requests_total{view="technician-detail",method="GET",status="404"} 1',
+                      lines)
+        self.assertIn(f'resource_manager_http_request_duration_seconds_count{{{labels}}} 2', lines)
+        # The first request authenticates and fills the response cache, the second one hits both caches.
+        self.assertIn(f'resource_manager_db_queries_per_request_bucket{{{labels},le="0"}} 1', lines)
+        serializer_time = next(line for line in lines
+                               if line.startswith(f"resource_manager_serializer_duration_seconds_total{{{labels}}}"))
+        self.assertGreater(float(serializer_time.split()[-1]), 0)
+
+    async def test_records_async_views(self):
+        await self.async_client.get("/api/async/technician/", AUTHORIZATION=f"Token {self.token.key}")
+        lines = await sync_to_async(self.metrics)()
+        self.assertIn('resource_manager_db_queries_per_request_bucket{view="resource_manager_app.async_views.'
+                      'AsyncTechnicianListView",method="GET",le="1"} 0', lines)
+        self.assertIn('resource_manager_db_queries_per_request_count{view="resource_manager_app.async_views.'
+                      'AsyncTechnicianListView",method="GET"} 1', lines)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=0)
+    def test_slow_request_log(self):
+        self.client.force_authenticate(self.user)
+        with self.assertLogs("resource_manager_app.slow_requests", level="WARNING") as logs:
+            self.client.get("/api/resource-assignment/")
+        self.assertIn("Slow request GET /api/resource-assignment/", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
+
+    @override_settings(METRICS_ALLOWED_IPS=["10.0.0.0/8"])
+    def test_metrics_are_only_exposed_to_the_allowed_addresses(self):
+        get_metrics_networks.cache_clear()
+        self.addCleanup(get_metrics_networks.cache_clear)
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="192.168.0.1").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.1.2.3").status_code, 200)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+
+        get_metrics_networks.cache_clear()
+        with override_settings(METRICS_ALLOWED_IPS=["10.0.0.0/33"]), self.assertRaises(ImproperlyConfigured):
+            get_metrics_networks()
+        with mock.patch.dict(os.environ, {"METRICS_ALLOWED_IPS": " 10.0.0.1, ,"}):
+            profile = runpy.run_path(str(settings.BASE_DIR / "resource_manager" / "settings.py"))
+        self.assertEqual(profile["METRICS_ALLOWED_IPS"], ["10.0.0.1"])
+
+
+class BenchmarkComparisonTests(SimpleTestCase):
+    """Tests for the regression check of the benchmark suite."""
+
+    baseline = {
+        "list": {"value": 10.0, "unit": "ms"},
+        "throughput": {"value": 100.0, "unit": "operations/s"},
+        "errors": {"value": 0, "unit": "errors"},
+    }
+
+    def test_changes_within_the_threshold_pass(self):
+        current = {
+            "list": {"value": 11.5, "unit": "ms"},
+            "throughput": {"value": 130.0, "unit": "operations/s"},
+            "errors": {"value": 0, "unit": "errors"},
+            "new": {"value": 1.0, "unit": "ms"},
+        }
+        self.assertEqual(compare_results(self.baseline, current, 0.2), [])
+
+    def test_slower_timings_lower_throughputs_and_new_errors_regress(self):
+        current = {
+            "list": {"value": 13.0, "unit": "ms"},
+            "throughput": {"value": 70.0, "unit": "operations/s"},
+            "errors": {"value": 2, "unit": "errors"},
+        }
+        regressions = {name: change for name, old, new, change in compare_results(self.baseline, current, 0.2)}
+        self.assertAlmostEqual(regressions["list"], 0.3)
+        self.assertAlmostEqual(regressions["throughput"], 0.3)
+        self.assertEqual(regressions["errors"], float("inf"))
+
+    def test_changes_within_the_spread_of_the_runs_are_noise(self):
+        baseline = {"list": {"value": 10.0, "spread": 2.0, "unit": "ms"}}
+        self.assertEqual(compare_results(baseline, {"list": {"value": 13.0, "spread": 1.5, "unit": "ms"}}, 0.2), [])
+        self.assertEqual(len(compare_results(baseline, {"list": {"value": 14.0, "spread": 1.5, "unit": "ms"}}, 0.2)),
+                         1)
+
+        timing = summarize([0.01, 0.02, 0.03, 0.04, 0.05])
+        self.assertAlmostEqual(timing, 0.03)
+        self.assertAlmostEqual(timing.spread, 0.03)
+
+        with self.assertRaisesMessage(CommandError, "--compare needs --repeat 5 at least"):
+            call_command("benchmark_suite", repeat=3, compare="baseline.json", stdout=io.StringIO())
+
+
+class DatabaseProfileTests(TransactionTestCase):
+    """Tests for the tuned SQLite backend of the sqlite-wal database profile."""
+
+    def setUp(self):
+        if not isinstance(connections["default"], SQLiteWALDatabaseWrapper):
+            self.skipTest("The tuned SQLite backend is not in use.")
+
+    def test_pragmas_are_applied(self):
+        pragmas = settings.DATABASES["default"]["OPTIONS"]["pragmas"]
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], pragmas["busy_timeout"])
+            cursor.execute("PRAGMA temp_store")
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    def test_transactions_take_the_write_lock_up_front(self):
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            Technician.objects.exists()  # noqa
+        self.assertEqual(queries.captured_queries[0]["sql"], "BEGIN IMMEDIATE")
+
+
+class FileDatabaseTestCase(TransactionTestCase):
+    """
+    TransactionTestCase running its tests on a migrated SQLite file database when the test database is in memory.
+    Threads of the in memory database share its cache, whose table locks fail right away instead of waiting, while
+    on a file the sqlite-wal profile's writers queue for the write lock within the busy timeout, as in production.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.memory_connection = None
+        if connection.vendor != "sqlite" or not connection.is_in_memory_db():
+            return
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.memory_name = connection.settings_dict["NAME"]
+        # Closing an in memory database would destroy it, so its connection is put aside until the tests are done.
+        cls.memory_connection, connection.connection = connection.connection, None
+        connection.settings_dict["NAME"] = str(Path(cls.directory.name) / "test.sqlite3")
+        call_command("migrate", verbosity=0, interactive=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.memory_connection is not None:
+            connection.close()
+            connection.settings_dict["NAME"] = cls.memory_name
+            connection.connection = cls.memory_connection
+            cls.directory.cleanup()
+        super().tearDownClass()
+
+
+class ResourceQuantityConcurrencyTests(FileDatabaseTestCase):
+    """Stress tests for the technicians' resource quantity under concurrent assignment writes."""
+
+    threads = 8
+    operations_per_thread = 25
+    min_success_ratio = 0.5
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="stress", password="stress")
+        branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        self.resources = [Resource.objects.create(name=f"Resource {i}") for i in range(10)]  # noqa
+        self.technicians = [
+            Technician.objects.create(name=f"Name{i}", last_name="Last", id_number=f"ID{i}", code=f"CODE{i}",  # noqa
+                                      branch_office=branch_office, resource_quantity=1)
+            for i in range(3)
+        ]
+        for technician in self.technicians:
+            ResourceAssignment.objects.create(technician=technician, resource=self.resources[0], quantity=1)  # noqa
+        self.succeeded = []
+        self.lock_failures = []
+
+    def run_operations(self, seed):
+        """Randomly creates, updates and deletes assignments through the API."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        generator = random.Random(seed)
+        succeeded = lock_failures = 0
+        try:
+            for _ in range(self.operations_per_thread):
+                technician = generator.choice(self.technicians)
+                resource = generator.choice(self.resources[1:])
+                try:
+                    assignment = ResourceAssignment.objects.filter(resource=resource).order_by("?").first()  # noqa
+                    if assignment is None or generator.random() < 0.4:
+                        response = client.post("/api/resource-assignment/", {
+                            "technician": technician.pk, "resource": resource.pk,
+                            "quantity": generator.randint(1, 10),
+                        }, format="json")
+                    elif generator.random() < 0.5:
+                        response = client.put(f"/api/resource-assignment/{assignment.pk}/", {
+                            "technician": technician.pk, "resource": resource.pk,
+                            "quantity": generator.randint(1, 10),
+                        }, format="json")
+                    else:
+                        response = client.delete(f"/api/resource-assignment/{assignment.pk}/")
+                    succeeded += response.status_code < 300
+                except OperationalError:
+                    # A busy timeout aborts the whole transaction, which must leave the counters untouched.
+                    lock_failures += 1
+        finally:
+            self.succeeded.append(succeeded)
+            self.lock_failures.append(lock_failures)
+            connection.close()
+
+    def test_resource_quantity_matches_assignments(self):
+        workers = [threading.Thread(target=self.run_operations, args=(seed,)) for seed in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        # Writers queue for the lock instead of failing, so most operations go through (the others are refused by
+        # the API, like assignments of a technician and resource that are already assigned).
+        self.assertEqual(sum(self.lock_failures), 0)
+        self.assertGreaterEqual(sum(self.succeeded), self.threads * self.operations_per_thread * self.min_success_ratio)
+        for technician in Technician.objects.all():  # noqa
+            total = ResourceAssignment.objects.filter(technician=technician).aggregate(  # noqa
+                total=Sum("quantity"))["total"] or 0
+            self.assertEqual(technician.resource_quantity, total)
+            self.assertGreaterEqual(technician.resource_quantity, 1)
+
+
+class StockConcurrencyTests(FileDatabaseTestCase):
+    """Stress tests for the resources' stock under concurrent assignment writes."""
+
+    threads = 8
+    operations_per_thread = 20
+    min_success_ratio = 0.5
+    total_stock = 30
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="stress", password="stress", is_staff=True)
+        branch_office = BranchOffice.objects.create(name="Main", address="Street 1", nit="1", phone="1")  # noqa
+        self.resources = [Resource.objects.create(name=f"Resource {i}") for i in range(3)]  # noqa
+        self.technicians = [
+            Technician.objects.create(name=f"Name{i}", last_name="Last", id_number=f"ID{i}", code=f"CODE{i}",  # noqa
+                                      branch_office=branch_office, resource_quantity=1)
+            for i in range(12)
+        ]
+        for technician in self.technicians:
+            ResourceAssignment.objects.create(technician=technician, resource=self.resources[0], quantity=1)  # noqa
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for resource in self.resources[1:]:
+            client.put(f"/api/resource/{resource.pk}/stock", {"total_stock": self.total_stock}, format="json")
+        self.succeeded = []
+        self.lock_failures = []
+
+    def run_operations(self, seed):
+        """Randomly creates, updates and deletes assignments of the tracked resources through the API."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        generator = random.Random(seed)
+        succeeded = lock_failures = 0
+        try:
+            for _ in range(self.operations_per_thread):
+                technician = generator.choice(self.technicians)
+                resource = generator.choice(self.resources[1:])
+                quantity = generator.randint(1, 10)
+                try:
+                    assignment = ResourceAssignment.objects.filter(resource=resource).order_by("?").first()  # noqa
+                    if assignment is None or generator.random() < 0.5:
+                        response = client.post("/api/resource-assignment/", {
+                            "technician": technician.pk, "resource": resource.pk, "quantity": quantity,
+                        }, format="json")
+                    elif generator.random() < 0.6:
+                        response = client.patch(f"/api/resource-assignment/{assignment.pk}/", {"quantity": quantity},
+                                     format="json")
+                    else:
+                        response = client.delete(f"/api/resource-assignment/{assignment.pk}/")
+                    succeeded += response.status_code < 300
+                except OperationalError:
+                    # A busy timeout aborts the whole transaction, which must leave the stock untouched.
+                    lock_failures += 1
+        finally:
+            self.succeeded.append(succeeded)
+            self.lock_failures.append(lock_failures)
+            connection.close()
+
+    def test_stock_never_goes_negative(self):
+        workers = [threading.Thread(target=self.run_operations, args=(seed,)) for seed in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        # Writers queue for the lock instead of failing, so most operations go through (the others are refused by
+        # the API, like assignments of a technician and resource that are already assigned).
+        self.assertEqual(sum(self.lock_failures), 0)
+        self.assertGreaterEqual(sum(self.succeeded), self.threads * self.operations_per_thread * self.min_success_ratio)
+        for resource in Resource.objects.filter(pk__in=[resource.pk for resource in self.resources[1:]]):  # noqa
+            assigned = ResourceAssignment.objects.filter(resource=resource).aggregate(  # noqa
+                total=Sum("quantity"))["total"] or 0
+            self.assertGreaterEqual(resource.available_stock, 0)
+            self.assertEqual(resource.available_stock, self.total_stock - assigned)
@@ -2,15 +2,34 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TechnicianViewSet, ResourceAssignmentViewSet, LoginViewSet, CreateTechnicanApiView
+from .async_views import (AsyncTechnicianListView, AsyncTechnicianDetailView, AsyncResourceAssignmentListView,
+                          AsyncResourceAssignmentDetailView)
+from .views import (TechnicianViewSet, ResourceAssignmentViewSet, LoginViewSet, CreateTechnicanApiView,
+                    BulkCreateTechnicianApiView, BatchResourceAssignmentApiView, BranchOfficeReportViewSet,
+                    BranchResourceReportViewSet, ChangeFeedApiView, JobViewSet, RebuildSummariesApiView,
+                    ResourceAvailabilityApiView, ResourceStockApiView, PayrollProjectionApiView)
 
 router = DefaultRouter()
 router.register("technician", TechnicianViewSet)
 router.register("resource-assignment", ResourceAssignmentViewSet)
 router.register("login", LoginViewSet, basename="login")
+router.register("report/branch-office", BranchOfficeReportViewSet)
+router.register("report/branch-resource", BranchResourceReportViewSet)
+router.register("jobs", JobViewSet)
 
 
 urlpatterns = [
     path("new-technician", CreateTechnicanApiView.as_view()),
+    path("new-technician/bulk", BulkCreateTechnicianApiView.as_view()),
+    path("resource-assignment/batch", BatchResourceAssignmentApiView.as_view()),
+    path("changes", ChangeFeedApiView.as_view()),
+    path("report/rebuild", RebuildSummariesApiView.as_view()),
+    path("report/payroll-projection", PayrollProjectionApiView.as_view()),
+    path("resource/availability", ResourceAvailabilityApiView.as_view()),
+    path("resource/<int:pk>/stock", ResourceStockApiView.as_view()),
+    path("async/technician/", AsyncTechnicianListView.as_view()),
+    path("async/technician/<int:pk>/", AsyncTechnicianDetailView.as_view()),
+    path("async/resource-assignment/", AsyncResourceAssignmentListView.as_view()),
+    path("async/resource-assignment/<int:pk>/", AsyncResourceAssignmentDetailView.as_view()),
     path("", include(router.urls)),
 ]
@@ -1,17 +1,46 @@
 """API utils."""
 
+import csv
+import json
+import re
 import string
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 
 ALPHABET = string.ascii_letters + string.digits
 
+NOT_LETTER_NUMBER = re.compile(f"[^{ALPHABET}]")
+
 
 def letter_number_only_validator(value: str):
     """Raises ValidationError if the given value contains any character other than letters or numbers."""
-    params = {"values": ""}
-    for letter in value:
-        if letter not in ALPHABET:
-            params["values"] += letter
+    # Valid values, nearly all of them, are accepted by two C level string scans.
+    if value.isascii() and value.isalnum():
+        return
+
+    values = "".join(NOT_LETTER_NUMBER.findall(value))
+    if values:
+        raise ValidationError("Values not allowed", params={"values": values})
+
+
+class EchoBuffer:
+    """File-like object that returns what is written to it, so csv.writer can produce rows one by one."""
+
+    def write(self, value):  # noqa
+        """Returns the value instead of storing it."""
+        return value
+
+
+def stream_csv(rows, fields):
+    """Yields a CSV header followed by one line per row dict, without holding more than one row in memory."""
+    writer = csv.writer(EchoBuffer())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([row[field] for field in fields])
+
 
-    if len(params["values"]) > 0:
-        raise ValidationError("Values not allowed", params=params)
+def stream_ndjson(rows):
+    """Yields one JSON document per row dict, each one ending with a newline."""
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    for row in rows:
+        yield encoder.encode(row) + "\n"
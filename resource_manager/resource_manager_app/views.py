@@ -1,32 +1,484 @@
 """API views."""
 
-from rest_framework.authentication import TokenAuthentication
+import re
+from collections import Counter
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.db.models import F, Prefetch, Q, Sum
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.serializers import AuthTokenSerializer
 from rest_framework.authtoken.views import ObtainAuthToken
-from rest_framework.exceptions import ValidationError
-from rest_framework.filters import SearchFilter
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.generics import CreateAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet, ViewSet
-from .models import Technician, ResourceAssignment, BranchOffice, Resource
-from .serializers import CreateTechnicianSerializer, TechnicianSerializer, ResourceAssignmentSerializer
+from rest_framework.views import APIView
+from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet, ViewSet
+from .authentication import CachedTokenAuthentication
+from .caching import CachedResponseMixin, invalidate
+from .changes import CursorExpired, SYNCED_MODELS, get_cursor, read_changes, record_changes
+from .jobs import enqueue, get_job_file
+from .models import (Technician, ResourceAssignment, BranchOffice, Resource, BranchOfficeSummary,
+                     BranchResourceSummary, Change, Job, StaleVersionError)
+from .pagination import KeysetPagination
+from .parsers import NDJSONParser
+from .projections import load_payroll, project_payroll
+from .renderers import FastJSONRenderer
+from .search import TechnicianSearchFilter, get_search_backend
+from .serializers import (CreateTechnicianSerializer, TechnicianSerializer, ResourceAssignmentSerializer,
+                          BulkCreateTechnicianSerializer, BatchAssignmentOperationSerializer,
+                          BranchOfficeSummarySerializer, BranchResourceSummarySerializer, JobSerializer,
+                          PayrollProjectionSerializer, ResourceStockSerializer, get_row_serializer,
+                          get_row_validator)
+from .summaries import (record_assignment_changes, record_assignments, record_technicians,
+                        update_branch_office_summary, update_branch_resource_summary)
+from .utils import stream_csv, stream_ndjson
 
+VERSION_ETAG = re.compile(r'"(\d+)(?:-[0-9a-f]+)?"')
 
-class TechnicianViewSet(ModelViewSet):
-    """Handles creating, listing, retrieving, updating and deleting technicians."""
+
+class PreconditionFailed(APIException):
+    """The row doesn't have the version named by If-Match, or it changed while the request was saving it."""
+
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The resource was modified since it was read."
+    default_code = "precondition_failed"
+
+
+class ExpiredCursor(APIException):
+    """The changes following the cursor were pruned from the change log."""
+
+    status_code = status.HTTP_410_GONE
+    default_detail = "The changes after this cursor were pruned. Download everything again and sync from a new cursor."
+    default_code = "expired_cursor"
+
+
+def get_version_etag(version):
+    """Returns the ETag naming a row version."""
+    return f'"{version}"'
+
+
+def check_if_match(header, instance):
+    """
+    Raises PreconditionFailed unless the instance has the version named by one of the If-Match header's ETags. Weak
+    and malformed ETags never match, as RFC 9110 requires, and a missing header or "*" matches any version.
+    """
+    if header is None:
+        return
+    etags = parse_etags(header)
+    if etags == ["*"]:
+        return
+    versions = {int(match[1]) for match in map(VERSION_ETAG.fullmatch, etags) if match is not None}
+    if instance.version not in versions:
+        raise PreconditionFailed()
+
+
+def get_integer(request, name, default, minimum):
+    """Returns the query param as an integer, raising ValidationError if it's invalid or below the minimum."""
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    if not value.isdigit() or int(value) < minimum:
+        raise ValidationError({name: f"Expected an integer greater than or equal to {minimum}."})
+    return int(value)
+
+
+def prefers_async(request):
+    """
+    Whether an authenticated request asked, with a Prefer: respond-async header (RFC 7240), to be answered before its
+    work is done. Anonymous requests are always served synchronously, as they couldn't follow their job.
+    """
+    preferences = {preference.split(";")[0].strip().lower()
+                   for preference in request.headers.get("Prefer", "").split(",")}
+    return "respond-async" in preferences and request.user.is_authenticated
+
+
+def accepted(job):
+    """Returns the 202 response of a queued job, pointing to its status."""
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED,
+                    headers={"Location": f"/api/jobs/{job.pk}/", "Preference-Applied": "respond-async"})
+
+
+def adjust_resource_quantity(technician_id, delta):
+    """
+    Adds the delta to a technician's resource quantity with a single UPDATE statement, so concurrent requests can't
+    lose each other's changes. Raises ValidationError if the technician would be left with 0 resources.
+    """
+    if delta == 0:
+        return
+
+    technicians = Technician.objects.filter(pk=technician_id)  # noqa
+    if delta < 0:
+        technicians = technicians.filter(resource_quantity__gte=1 - delta)
+
+    if technicians.update(resource_quantity=F("resource_quantity") + delta, version=F("version") + 1) == 0:
+        raise ValidationError("Technicians cannot have 0 resources assigned.")
+    record_changes(Technician, [technician_id], Change.UPDATE)
+
+
+def reserve_stock(quantities):
+    """
+    Takes the {resource_id: units} from the resources' available stock, or gives them back for negative units, with a
+    conditional UPDATE per resource: a reservation larger than the stock left matches no row, so concurrent requests
+    can't over-allocate. Raises ValidationError naming the resources short of units; the caller's transaction must roll
+    the other reservations back. Resources without a total stock aren't limited.
+    """
+    shortages = []
+    # Rows are always updated in primary key order so concurrent reservations can't deadlock each other.
+    for resource_id, units in sorted(quantities.items()):
+        if units == 0:
+            continue
+        resources = Resource.all_objects.filter(pk=resource_id)  # noqa
+        if units > 0:
+            resources = resources.filter(Q(available_stock__gte=units) | Q(available_stock__isnull=True))
+        if resources.update(available_stock=F("available_stock") - units) == 0:
+            shortages.append(f"Resource {resource_id} doesn't have {units} units available.")
+    if shortages:
+        raise ValidationError({"resource": shortages})
+
+
+def set_total_stock(resource_id, total_stock):
+    """
+    Sets a resource's total stock, or stops tracking it with None, keeping the units of the active assignments
+    reserved. Raises ValidationError if the total is below them.
+    """
+    with transaction.atomic():
+        # Locking the row first makes concurrent reservations wait, so the sum below can't miss any.
+        Resource.all_objects.select_for_update().filter(pk=resource_id).exists()  # noqa
+        assigned = ResourceAssignment.objects.filter(resource_id=resource_id).aggregate(  # noqa
+            total=Sum("quantity"))["total"] or 0
+        if total_stock is not None and total_stock < assigned:
+            raise ValidationError({"total_stock": f"{assigned} units are already assigned."})
+        Resource.all_objects.filter(pk=resource_id).update(  # noqa
+            total_stock=total_stock, available_stock=None if total_stock is None else total_stock - assigned)
+
+
+def set_assignments_active(technician_id, active):
+    """
+    Archives (or restores) every assignment of a technician with a single UPDATE, releasing (or reserving) their stock
+    and logging the changes and invalidating the cached responses as the signals do for single saves. Returns their
+    (resource_id, quantity) pairs.
+    """
+    rows = list(ResourceAssignment.all_objects.filter(technician_id=technician_id, active=not active)  # noqa
+                .values_list("pk", "resource_id", "quantity"))
+    if rows:
+        ids = [pk for pk, _, _ in rows]
+        # Archived assignments don't hold stock.
+        reserve_stock({resource_id: quantity if active else -quantity for _, resource_id, quantity in rows})
+        ResourceAssignment.all_objects.filter(pk__in=ids).update(active=active, version=F("version") + 1)  # noqa
+        record_changes(ResourceAssignment, ids, Change.UPDATE)
+        invalidate(ResourceAssignment)
+    return [(resource_id, quantity) for _, resource_id, quantity in rows]
+
+
+def create_assignment(serializer):
+    """Saves a new assignment, reserving its stock and adding to the technician's quantity and to the summaries."""
+    assignment = serializer.save()
+    reserve_stock({assignment.resource_id: assignment.quantity})
+    adjust_resource_quantity(assignment.technician_id, assignment.quantity)
+    record_assignments([(assignment.technician.branch_office_id, assignment.resource_id, assignment.quantity)])
+
+
+def delete_assignment(instance):
+    """Deletes an assignment, releasing its stock and removing from the technician's quantity and the summaries."""
+    reserve_stock({instance.resource_id: -instance.quantity})
+    adjust_resource_quantity(instance.technician_id, -instance.quantity)
+    record_assignments([(instance.technician.branch_office_id, instance.resource_id, instance.quantity)], sign=-1)
+    instance.delete()
+
+
+def update_assignment(serializer):
+    """Saves an assignment, moving the quantities between the previous and the new technician and resource."""
+    previous_technician_id = serializer.instance.technician_id
+    previous_quantity = serializer.instance.quantity
+    new_technician = serializer.validated_data.get("technician")
+    new_technician_id = previous_technician_id if new_technician is None else new_technician.pk
+    new_quantity = serializer.validated_data.get("quantity", previous_quantity)
+    new_resource = serializer.validated_data.get("resource")
+    new_resource_id = serializer.instance.resource_id if new_resource is None else new_resource.pk
+
+    stock = {serializer.instance.resource_id: -previous_quantity}
+    stock[new_resource_id] = stock.get(new_resource_id, 0) + new_quantity
+    reserve_stock(stock)
+
+    deltas = {previous_technician_id: -previous_quantity}
+    deltas[new_technician_id] = deltas.get(new_technician_id, 0) + new_quantity
+
+    previous_assignment = (serializer.instance.technician.branch_office_id, serializer.instance.resource_id,
+                           previous_quantity)
+
+    # Rows are always updated in primary key order so concurrent updates can't deadlock each other.
+    for technician_id, delta in sorted(deltas.items()):
+        adjust_resource_quantity(technician_id, delta)
+    assignment = serializer.save()
+
+    new_assignment = (assignment.technician.branch_office_id, assignment.resource_id, assignment.quantity)
+    if new_assignment[:2] == previous_assignment[:2]:
+        update_branch_resource_summary(*new_assignment[:2], quantity=new_assignment[2] - previous_assignment[2])
+    else:
+        record_assignments([previous_assignment], sign=-1)
+        record_assignments([new_assignment])
+
+
+class ExpandMixin:
+    """
+    Adds the ?expand= query param to list and retrieve actions. Expanded relations are nested in the response and
+    eager loaded, so a page costs the same number of queries regardless of its size.
+    """
+
+    expand_fields = {}
+
+    def get_expand(self):
+        """Returns the set of relations to expand, raising ValidationError for unknown ones."""
+        if self.action not in ("list", "retrieve"):  # noqa
+            return set()
+
+        expand = {name.strip() for name in self.request.query_params.get("expand", "").split(",")}  # noqa
+        expand.discard("")
+        invalid = expand.difference(self.expand_fields)
+        if invalid:
+            raise ValidationError({"expand": f"Invalid values: {', '.join(sorted(invalid))}. "
+                                             f"Allowed values: {', '.join(self.expand_fields)}."})
+        return expand
+
+    def expand_queryset(self, queryset, expand):
+        """Adds the select_related and prefetch_related calls needed by the expanded relations."""
+        return queryset
+
+    def get_queryset(self):
+        """Eager loads the expanded relations."""
+        return self.expand_queryset(super().get_queryset(), self.get_expand())  # noqa
+
+    def get_serializer_context(self):
+        """Passes the expanded relations to the serializers."""
+        context = super().get_serializer_context()  # noqa
+        context["expand"] = self.get_expand()
+        return context
+
+
+class IncludeInactiveMixin:
+    """
+    Serves the active rows only, unless ?include_inactive=true asks for the archived ones too on the actions in
+    include_inactive_actions. Must come right before the generic view in the bases, as it replaces the queryset.
+    """
+
+    include_inactive_actions = ("list", "retrieve", "export")
+
+    def include_inactive(self):
+        """Whether the request asked for the archived rows, raising ValidationError for invalid values."""
+        value = self.request.query_params.get("include_inactive", "false").lower()  # noqa
+        if value not in ("true", "false", "1", "0"):
+            raise ValidationError({"include_inactive": "Expected true or false."})
+        return value in ("true", "1") and self.action in self.include_inactive_actions  # noqa
+
+    def get_queryset(self):
+        """Reads every row through the model's all_objects manager when the archived ones are included."""
+        if self.include_inactive():
+            return self.queryset.model.all_objects.all()  # noqa
+        return super().get_queryset()  # noqa
+
+
+class ExportMixin:
+    """
+    Adds an export action that streams the filtered rows as CSV or NDJSON. Rows are read as dicts with values() in
+    chunks, so memory stays flat regardless of the number of rows.
+    """
+
+    export_fields = ()
+    export_expressions = {}
+    export_chunk_size = 2000
+    export_formats = {
+        "csv": "text/csv",
+        "ndjson": "application/x-ndjson",
+    }
+
+    @action(detail=False, methods=["get"])
+    def export(self, request, *args, **kwargs):
+        """
+        Streams every row as CSV or NDJSON, as requested with ?file_format=. With a Prefer: respond-async header an
+        export job writes the file instead, to be downloaded from the job once it succeeds.
+        """
+        file_format = request.query_params.get("file_format", "csv")
+        if file_format not in self.export_formats:
+            raise ValidationError({"file_format": f"Allowed values: {', '.join(self.export_formats)}."})
+
+        if prefers_async(request):
+            payload = {"model": self.basename, "query_params": dict(request.query_params.lists())}  # noqa
+            return accepted(enqueue("export", payload, user=request.user))
+
+        queryset = self.filter_queryset(self.get_queryset())  # noqa
+        response = StreamingHttpResponse(self.export_lines(queryset, file_format),
+                                         content_type=self.export_formats[file_format])
+        response["Content-Disposition"] = f'attachment; filename="{self.basename}.{file_format}"'  # noqa
+        return response
+
+    def export_lines(self, queryset, file_format):
+        """Yields the lines of the queryset's export in the given format."""
+        rows = queryset.values(*self.export_fields, **self.export_expressions).iterator(
+            chunk_size=self.export_chunk_size)
+        columns = [*self.export_fields, *self.export_expressions]
+        return stream_csv(rows, columns) if file_format == "csv" else stream_ndjson(rows)
+
+
+class VersionedMixin:
+    """
+    Optimistic concurrency for versioned models. Responses carry the row's version in their ETag, writes with If-Match
+    only apply to the version it names, and saves match the version they read in the UPDATE statement itself, so
+    changes made in the meantime are never overwritten. Conflicts answer 412 Precondition Failed.
+    """
+
+    def get_etag(self, key, data):
+        """Prefixes the retrieve ETags with the row version, so they can be sent back with If-Match."""
+        if self.action == "retrieve":  # noqa
+            return f'"{data["version"]}-{key}"'
+        return super().get_etag(key, data)  # noqa
+
+    def get_object(self):
+        """Checks If-Match against the version of the row about to be written."""
+        instance = super().get_object()  # noqa
+        if self.action in ("update", "partial_update", "destroy"):  # noqa
+            check_if_match(self.request.headers.get("If-Match"), instance)  # noqa
+        return instance
+
+    def update(self, request, *args, **kwargs):
+        """Answers 412 when the row changed between reading and saving it."""
+        try:
+            return super().update(request, *args, **kwargs)  # noqa
+        except StaleVersionError:
+            raise PreconditionFailed()
+
+    def destroy(self, request, *args, **kwargs):
+        """Answers 412 when the row changed between reading and archiving it."""
+        try:
+            return super().destroy(request, *args, **kwargs)  # noqa
+        except StaleVersionError:
+            raise PreconditionFailed()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Adds the ETag of the new version to the write responses."""
+        response = super().finalize_response(request, response, *args, **kwargs)  # noqa
+        if self.action in ("create", "update", "partial_update") and response.status_code in (  # noqa
+                status.HTTP_200_OK, status.HTTP_201_CREATED):
+            response["ETag"] = get_version_etag(response.data["version"])
+        return response
+
+
+class RowListMixin:
+    """
+    Serves list requests without expansions through the serializer's RowSerializer: rows are read with values_list()
+    and JSON is encoded by FastJSONRenderer, skipping model instances and serializer fields. Responses are the same
+    as the regular list ones, which can be restored by setting row_list to False.
+    """
+
+    row_list = True
+
+    def list(self, request, *args, **kwargs):
+        """Lists values_list() rows, or falls back to the serializer when relations are expanded."""
+        if not self.row_list or self.get_expand():  # noqa
+            return super().list(request, *args, **kwargs)  # noqa
+
+        row_serializer = get_row_serializer(self.get_serializer_class())  # noqa
+        queryset = self.filter_queryset(self.get_queryset())  # noqa
+        # Cursors are built from the ordering fields, so they're read along with the serialized columns.
+        ordering = [field.lstrip("-") for field in KeysetPagination.get_ordering(queryset, self)]
+        rows = row_serializer.get_queryset(queryset, ordering)
+        if type(request.accepted_renderer) is JSONRenderer:
+            request.accepted_renderer = FastJSONRenderer()
+
+        page = self.paginate_queryset(rows)  # noqa
+        if page is not None:
+            return self.get_paginated_response(row_serializer.to_representation(page))  # noqa
+        return Response(row_serializer.to_representation(rows))
+
+
+class TechnicianViewSet(VersionedMixin, CachedResponseMixin, RowListMixin, ExportMixin, ExpandMixin,
+                        IncludeInactiveMixin, ModelViewSet):
+    """
+    Handles creating, listing, retrieving, updating and archiving technicians. Deleting a technician archives it along
+    with its assignments; updating an archived one (?include_inactive=true) with active set restores them.
+    """
 
     queryset = Technician.objects.all()  # noqa
     serializer_class = TechnicianSerializer
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
-    filter_backends = (SearchFilter,)
+    filter_backends = (TechnicianSearchFilter,)
     search_fields = ("name", "last_name", "id_number", "code",)
 
     http_method_names = ["get", "put", "patch", "delete", "head", "options", "trace"]
 
+    expand_fields = {
+        "branch_office": BranchOffice,
+        "assignments": ResourceAssignment,
+        "resource": Resource,
+    }
+    cache_models = (Technician, ResourceAssignment,)
+    include_inactive_actions = ("list", "retrieve", "export", "update", "partial_update")
+
+    export_fields = ("id", "name", "last_name", "id_number", "code", "description", "resource_quantity",
+                     "creation_date", "active", "base_salary", "branch_office",)
+    export_expressions = {
+        "branch_office_name": F("branch_office__name"),
+    }
+
+    def expand_queryset(self, queryset, expand):
+        """Joins the branch office and prefetches the assignments, along with their resources if expanded."""
+        if "branch_office" in expand:
+            queryset = queryset.select_related("branch_office")
+        if "assignments" in expand:
+            assignments = ResourceAssignment.objects.all()  # noqa
+            if "resource" in expand:
+                assignments = assignments.select_related("resource")
+            queryset = queryset.prefetch_related(Prefetch("resourceassignment_set", queryset=assignments))
+        return queryset
+
+    @staticmethod
+    def set_active(technician, counted, active):
+        """
+        Archives (or restores) the technician's assignments and removes (or adds) the counted technician, the saved
+        one or its state before the save, and its assignments from (to) the summaries, which only count active rows.
+        """
+        sign = 1 if active else -1
+        assignments = set_assignments_active(technician.pk, active)
+        record_technicians([counted], sign=sign)
+        record_assignments([(counted.branch_office_id, *assignment) for assignment in assignments], sign=sign)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        """Moves the technician's salary and assignments between the branch office summaries."""
+        previous = Technician(branch_office_id=serializer.instance.branch_office_id,
+                              base_salary=serializer.instance.base_salary, active=serializer.instance.active)
+        technician = serializer.save()
+        if previous.active != technician.active:
+            self.set_active(technician, technician if technician.active else previous, technician.active)
+            return
+        if not technician.active:
+            return
+        if previous.branch_office_id == technician.branch_office_id:
+            update_branch_office_summary(technician.branch_office_id,
+                                         base_salary=technician.base_salary - previous.base_salary)
+            return
+
+        record_technicians([previous], sign=-1)
+        record_technicians([technician])
+        assignments = list(technician.resourceassignment_set.values_list("resource_id", "quantity"))
+        record_assignments([(previous.branch_office_id, *assignment) for assignment in assignments], sign=-1)
+        record_assignments([(technician.branch_office_id, *assignment) for assignment in assignments])
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        """Archives the technician and its assignments, keeping their rows, and removes them from the summaries."""
+        instance.active = False
+        instance.save(update_fields=["active"])
+        self.set_active(instance, instance, False)
+
 
 class CreateTechnicanApiView(CreateAPIView):
     """
@@ -54,74 +506,706 @@ class CreateTechnicanApiView(CreateAPIView):
         )
 
         try:
-            new_technician.save()
-            for resource_serializer in serializer["assigned_resources"].value:
-                assignment = ResourceAssignment(
-                    quantity=resource_serializer["quantity"],
-                    technician=new_technician,
-                    resource=Resource.objects.get(pk=resource_serializer["id"])  # noqa
-                )
-                assignment.save()
+            with transaction.atomic():
+                new_technician.save()
+                stock = Counter()
+                for resource_serializer in serializer["assigned_resources"].value:
+                    assignment = ResourceAssignment(
+                        quantity=resource_serializer["quantity"],
+                        technician=new_technician,
+                        resource=Resource.objects.get(pk=resource_serializer["id"])  # noqa
+                    )
+                    assignment.save()
+                    stock[assignment.resource_id] += assignment.quantity
+                reserve_stock(stock)
+
+                record_technicians([new_technician])
+                record_assignments([(new_technician.branch_office_id, item["id"], item["quantity"])
+                                    for item in serializer["assigned_resources"].value])
 
+        except ValidationError:
+            raise
         except Exception:
-            if new_technician.pk is not None:
-                new_technician.delete()
             raise ValidationError("The given body may contain errors.")
 
         return Response(data={"detail": "Technician created and resources assigned successfully."})
 
 
-class ResourceAssignmentViewSet(ModelViewSet):
+class BulkCreateTechnicianApiView(CreateAPIView):
+    """
+    Creates many technicians with their assigned resources at once. Accepts a JSON array or an NDJSON stream and
+    answers with a per-row report. Rows with errors are skipped, the valid ones are created in a single transaction.
+    """
+
+    serializer_class = BulkCreateTechnicianSerializer
+    parser_classes = (JSONParser, NDJSONParser)
+
+    def post(self, request, *args, **kwargs):
+        """
+        Creates the technicians, or with a Prefer: respond-async header queues a bulk_create_technicians job and
+        answers 202 with it right away.
+        """
+        rows = request.data
+        if not isinstance(rows, list) or len(rows) == 0:
+            raise ValidationError("Expected a non-empty list of technicians.")
+
+        if prefers_async(request):
+            return accepted(enqueue("bulk_create_technicians", {"rows": rows}, user=request.user))
+        data, response_status = self.import_rows(rows)
+        return Response(data=data, status=response_status)
+
+    def import_rows(self, rows, job=None):
+        """
+        Validates the whole batch with set-based queries and creates the valid rows with bulk inserts. Returns the
+        report and its status code. Reports the progress of the job running the import, if any.
+        """
+        valid_rows, errors = get_row_validator(BulkCreateTechnicianSerializer).validate(rows)
+        self.check_references(valid_rows, errors)
+        self.check_duplicates(valid_rows, errors)
+        if job is not None:
+            job.set_progress(1, 2)
+
+        created = {}
+        if valid_rows:
+            try:
+                with transaction.atomic():
+                    self.check_stock(valid_rows, errors)
+                    if valid_rows:
+                        created = self.create_technicians(valid_rows)
+            except IntegrityError:
+                raise ValidationError("The given body may contain errors.")
+
+        results = []
+        for index in range(len(rows)):
+            if index in created:
+                results.append({"index": index, "status": "created", "id": created[index]})
+            else:
+                results.append({"index": index, "status": "failed", "errors": errors[index]})
+
+        if not created:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif errors:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+
+        return {"created": len(created), "failed": len(errors), "results": results}, response_status
+
+    @staticmethod
+    def reject(index, field, message, valid_rows, errors):
+        """Moves a row from the valid rows to the errors, keeping any previous error for that row."""
+        valid_rows.pop(index, None)
+        errors.setdefault(index, {}).setdefault(field, []).append(message)
+
+    def check_references(self, valid_rows, errors):
+        """Checks every referenced branch office and resource exists using one query per model."""
+        branch_office_ids = {row["branch_office"] for row in valid_rows.values()}
+        resource_ids = {item["id"] for row in valid_rows.values() for item in row["assigned_resources"]}
+
+        existing_branch_offices = set(BranchOffice.objects.filter(pk__in=branch_office_ids)  # noqa
+                                      .values_list("pk", flat=True))
+        existing_resources = set(Resource.objects.filter(pk__in=resource_ids).values_list("pk", flat=True))  # noqa
+
+        for index, row in list(valid_rows.items()):
+            if row["branch_office"] not in existing_branch_offices:
+                self.reject(index, "branch_office", f"Branch office {row['branch_office']} does not exist.",
+                            valid_rows, errors)
+            for item in row["assigned_resources"]:
+                if item["id"] not in existing_resources:
+                    self.reject(index, "assigned_resources", f"Resource {item['id']} does not exist.",
+                                valid_rows, errors)
+
+    def check_duplicates(self, valid_rows, errors):
+        """
+        Flags id_number and code values repeated inside the batch or already taken in the database, looking both up
+        with one query.
+        """
+        fields = ("id_number", "code")
+        taken = {field: set() for field in fields}
+        for values in Technician.all_objects.filter(  # noqa
+                Q(id_number__in={row["id_number"] for row in valid_rows.values()})
+                | Q(code__in={row["code"] for row in valid_rows.values()})).order_by().values_list(*fields):
+            for field, value in zip(fields, values):
+                taken[field].add(value)
+
+        for field in fields:
+            counts = Counter(row[field] for row in valid_rows.values())
+            for index, row in list(valid_rows.items()):
+                value = row[field]
+                if value in taken[field]:
+                    self.reject(index, field, f"A technician with {field} {value} already exists.",
+                                valid_rows, errors)
+                elif counts[value] > 1:
+                    self.reject(index, field, f"The {field} {value} is repeated in the batch.", valid_rows, errors)
+
+    def check_stock(self, valid_rows, errors):
+        """
+        Locks the tracked resources of the batch and rejects the rows asking for more units than are left once the
+        previous rows are served, using one query. Must run inside the transaction creating the rows.
+        """
+        resource_ids = {item["id"] for row in valid_rows.values() for item in row["assigned_resources"]}
+        available = dict(Resource.all_objects.select_for_update().order_by("pk").filter(  # noqa
+            pk__in=resource_ids, available_stock__isnull=False).values_list("pk", "available_stock"))
+
+        for index, row in list(valid_rows.items()):
+            needed = Counter()
+            for item in row["assigned_resources"]:
+                needed[item["id"]] += item["quantity"]
+            short = [resource_id for resource_id, units in needed.items()
+                     if resource_id in available and units > available[resource_id]]
+            for resource_id in short:
+                self.reject(index, "assigned_resources", f"Resource {resource_id} doesn't have {needed[resource_id]} "
+                                                         f"units available.", valid_rows, errors)
+            if not short:
+                for resource_id, units in needed.items():
+                    if resource_id in available:
+                        available[resource_id] -= units
+
+    @staticmethod
+    def create_technicians(valid_rows):
+        """Inserts the technicians and their assignments with bulk inserts and returns the new IDs by row index."""
+        technicians = {
+            index: Technician(
+                name=row["name"],
+                last_name=row["last_name"],
+                id_number=row["id_number"],
+                code=row["code"],
+                description=row["description"],
+                base_salary=row["base_salary"],
+                branch_office_id=row["branch_office"],
+                resource_quantity=sum([item["quantity"] for item in row["assigned_resources"]])
+            )
+            for index, row in valid_rows.items()
+        }
+
+        with transaction.atomic():
+            Technician.objects.bulk_create(technicians.values())  # noqa
+            if any(technician.pk is None for technician in technicians.values()):
+                # Backends that can't return the inserted primary keys need them looked up by a unique column.
+                ids = dict(Technician.objects.filter(  # noqa
+                    id_number__in=[technician.id_number for technician in technicians.values()]
+                ).values_list("id_number", "pk"))
+                for technician in technicians.values():
+                    technician.pk = ids[technician.id_number]
+
+            assignments = ResourceAssignment.objects.bulk_create([  # noqa
+                ResourceAssignment(quantity=item["quantity"], technician=technicians[index], resource_id=item["id"])
+                for index, row in valid_rows.items()
+                for item in row["assigned_resources"]
+            ])
+            if any(assignment.pk is None for assignment in assignments):
+                assignment_ids = ResourceAssignment.objects.filter(  # noqa
+                    technician__in=technicians.values()).values_list("pk", flat=True)
+            else:
+                assignment_ids = [assignment.pk for assignment in assignments]
+
+            stock = Counter()
+            for row in valid_rows.values():
+                for item in row["assigned_resources"]:
+                    stock[item["id"]] += item["quantity"]
+            reserve_stock(stock)
+
+            record_technicians(technicians.values())
+            record_assignments([(row["branch_office"], item["id"], item["quantity"])
+                                for row in valid_rows.values()
+                                for item in row["assigned_resources"]])
+
+            # bulk_create doesn't send post_save, so the search index, the cache and the change log are updated here.
+            search_backend = get_search_backend()
+            if search_backend is not None:
+                search_backend.index(technicians.values())
+            invalidate(Technician, ResourceAssignment)
+            record_changes(Technician, [technician.pk for technician in technicians.values()], Change.CREATE)
+            record_changes(ResourceAssignment, assignment_ids, Change.CREATE)
+
+        return {index: technician.pk for index, technician in technicians.items()}
+
+
+class BatchResourceAssignmentApiView(CreateAPIView):
+    """
+    Applies a list of create, update and delete operations on resource assignments in a single transaction. The
+    affected assignments and technicians are loaded with one query each, the technicians' quantities are computed in
+    memory and checked on the final state, and the changes are written with bulk queries. Any error rejects the whole
+    batch.
+    """
+
+    serializer_class = BatchAssignmentOperationSerializer
+    parser_classes = (JSONParser, NDJSONParser)
+
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        """Validates the batch and applies it, answering with the ID of every operation's assignment."""
+        operations = request.data
+        if not isinstance(operations, list) or len(operations) == 0:
+            raise ValidationError("Expected a non-empty list of operations.")
+
+        valid_operations, errors = get_row_validator(BatchAssignmentOperationSerializer).validate(operations)
+        if errors:
+            self.raise_errors(len(operations), errors)
+
+        try:
+            with transaction.atomic():
+                results = self.apply(valid_operations, len(operations))
+        except IntegrityError:
+            raise ValidationError("The batch conflicts with concurrent changes to the same assignments.")
+
+        return Response(data={"results": results}, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def raise_errors(count, errors, technician_errors=None):
+        """
+        Raises the ValidationError listing the errors of every operation, like DRF does for lists (an empty dict for
+        valid operations), and of the technicians left without resources.
+        """
+        detail = {"operations": [errors.get(index, {}) for index in range(count)]}
+        if technician_errors:
+            detail["technicians"] = technician_errors
+        raise ValidationError(detail)
+
+    @staticmethod
+    def reject(index, field, message, errors):
+        """Adds an error to an operation."""
+        errors.setdefault(index, {}).setdefault(field, []).append(message)
+
+    def apply(self, operations, count):
+        """Loads the affected rows, computes and checks the final state, and writes it."""
+        errors = {}
+        assignments = self.load_assignments(operations, errors)
+        technicians = self.load_technicians(operations, assignments, errors)
+        self.check_resources(operations, errors)
+        if errors:
+            self.raise_errors(count, errors)
+
+        changes = self.compute_changes(operations, assignments, technicians)
+        self.check_duplicates(operations, changes, errors)
+        self.check_stock(changes, errors)
+        technician_errors = {
+            technician_id: ["Technicians cannot have 0 resources assigned."]
+            for technician_id, delta in changes["deltas"].items()
+            if delta and technicians[technician_id].resource_quantity + delta < 1
+        }
+        if errors or technician_errors:
+            self.raise_errors(count, errors, technician_errors)
+
+        return self.write(operations, changes, technicians)
+
+    def load_assignments(self, operations, errors):
+        """Locks and returns the assignments updated or deleted by the batch, using one query."""
+        counts = Counter(operation["id"] for operation in operations.values() if "id" in operation)
+        assignments = ResourceAssignment.objects.select_for_update().order_by("pk").in_bulk(list(counts))  # noqa
+
+        for index, operation in operations.items():
+            if "id" not in operation:
+                continue
+            if operation["id"] not in assignments:
+                self.reject(index, "id", f"Resource assignment {operation['id']} does not exist.", errors)
+            elif counts[operation["id"]] > 1:
+                self.reject(index, "id", f"Resource assignment {operation['id']} is repeated in the batch.", errors)
+        return assignments
+
+    def load_technicians(self, operations, assignments, errors):
+        """Locks and returns every technician whose quantity the batch may change, using one query."""
+        technician_ids = {operation["technician"] for operation in operations.values() if "technician" in operation}
+        technician_ids.update(assignment.technician_id for assignment in assignments.values())
+        technicians = Technician.objects.select_for_update().order_by("pk").only(  # noqa
+            "id", "resource_quantity", "branch_office", "version").in_bulk(list(technician_ids))
+
+        for index, operation in operations.items():
+            if "technician" in operation and operation["technician"] not in technicians:
+                self.reject(index, "technician", f"Technician {operation['technician']} does not exist.", errors)
+        return technicians
+
+    def check_resources(self, operations, errors):
+        """Checks every referenced resource exists using one query."""
+        resource_ids = {operation["resource"] for operation in operations.values() if "resource" in operation}
+        existing_resources = set(Resource.objects.filter(pk__in=resource_ids).values_list("pk", flat=True))  # noqa
+
+        for index, operation in operations.items():
+            if "resource" in operation and operation["resource"] not in existing_resources:
+                self.reject(index, "resource", f"Resource {operation['resource']} does not exist.", errors)
+
+    @staticmethod
+    def compute_changes(operations, assignments, technicians):
+        """
+        Applies the operations to the loaded rows in memory. Returns the created, updated and deleted assignments by
+        operation index, the net quantity delta per technician and the summary entries to remove and add.
+        """
+        changes = {"created": {}, "updated": {}, "deleted": {}, "deltas": Counter(), "removed": [], "added": []}
+        for index, operation in operations.items():
+            assignment = assignments.get(operation.get("id"))
+            if assignment is not None:
+                changes["deltas"][assignment.technician_id] -= assignment.quantity
+                changes["removed"].append((technicians[assignment.technician_id].branch_office_id,
+                                           assignment.resource_id, assignment.quantity))
+
+            if operation["op"] == "delete":
+                changes["deleted"][index] = assignment
+                continue
+
+            if assignment is None:
+                assignment = ResourceAssignment(technician_id=operation["technician"],
+                                                resource_id=operation["resource"],
+                                                quantity=operation.get("quantity", 1))
+                changes["created"][index] = assignment
+            else:
+                assignment.technician_id = operation.get("technician", assignment.technician_id)
+                assignment.resource_id = operation.get("resource", assignment.resource_id)
+                assignment.quantity = operation.get("quantity", assignment.quantity)
+                assignment.version += 1
+                changes["updated"][index] = assignment
+
+            changes["deltas"][assignment.technician_id] += assignment.quantity
+            changes["added"].append((technicians[assignment.technician_id].branch_office_id,
+                                     assignment.resource_id, assignment.quantity))
+        return changes
+
+    def check_duplicates(self, operations, changes, errors):
+        """Flags resources assigned twice to a technician in the final state, in the batch or in the database."""
+        final = {**changes["created"], **changes["updated"]}
+        pairs = {index: (assignment.technician_id, assignment.resource_id) for index, assignment in final.items()}
+        counts = Counter(pairs.values())
+        touched_ids = [operation["id"] for operation in operations.values() if "id" in operation]
+        taken = set(ResourceAssignment.all_objects.filter(  # noqa
+            technician_id__in={technician_id for technician_id, _ in counts},
+            resource_id__in={resource_id for _, resource_id in counts},
+        ).exclude(pk__in=touched_ids).values_list("technician_id", "resource_id"))
+
+        for index, pair in pairs.items():
+            if pair in taken:
+                self.reject(index, "resource", f"Technician {pair[0]} already has resource {pair[1]} assigned.",
+                            errors)
+            elif counts[pair] > 1:
+                self.reject(index, "resource", f"Resource {pair[1]} is assigned to technician {pair[0]} more than "
+                                               f"once in the batch.", errors)
+
+    def check_stock(self, changes, errors):
+        """
+        Locks the tracked resources whose stock the batch takes units from and rejects the operations assigning them if
+        the batch's net reservation, units released by its updates and deletes included, exceeds the stock left.
+        """
+        stock = self.get_stock_deltas(changes)
+        available = dict(Resource.all_objects.select_for_update().order_by("pk").filter(  # noqa
+            pk__in=[resource_id for resource_id, units in stock.items() if units > 0],
+            available_stock__isnull=False).values_list("pk", "available_stock"))
+
+        for index, assignment in {**changes["created"], **changes["updated"]}.items():
+            resource_id = assignment.resource_id
+            if resource_id in available and stock[resource_id] > available[resource_id]:
+                self.reject(index, "resource", f"Resource {resource_id} doesn't have {stock[resource_id]} units "
+                                               f"available.", errors)
+
+    @staticmethod
+    def get_stock_deltas(changes):
+        """Returns the net units the batch takes from every resource's stock."""
+        stock = Counter()
+        for _, resource_id, quantity in changes["removed"]:
+            stock[resource_id] -= quantity
+        for _, resource_id, quantity in changes["added"]:
+            stock[resource_id] += quantity
+        return stock
+
+    @classmethod
+    def write(cls, operations, changes, technicians):
+        """Writes the final state with bulk queries and returns the result of every operation."""
+        deleted_ids = [assignment.pk for assignment in changes["deleted"].values()]
+        if deleted_ids:
+            ResourceAssignment.objects.filter(pk__in=deleted_ids).delete()  # noqa
+        if changes["updated"]:
+            ResourceAssignment.objects.bulk_update(changes["updated"].values(),  # noqa
+                                                   ["technician", "resource", "quantity", "version"])
+        if changes["created"]:
+            created = list(changes["created"].values())
+            ResourceAssignment.objects.bulk_create(created)  # noqa
+            if any(assignment.pk is None for assignment in created):
+                # Backends that can't return the inserted primary keys need them looked up by the unique pair.
+                ids = {(technician_id, resource_id): pk for pk, technician_id, resource_id in
+                       ResourceAssignment.objects.filter(  # noqa
+                           technician_id__in={assignment.technician_id for assignment in created},
+                           resource_id__in={assignment.resource_id for assignment in created},
+                       ).values_list("pk", "technician_id", "resource_id")}
+                for assignment in created:
+                    assignment.pk = ids[assignment.technician_id, assignment.resource_id]
+
+        changed_technicians = []
+        for technician_id, delta in changes["deltas"].items():
+            if delta:
+                technicians[technician_id].resource_quantity += delta
+                technicians[technician_id].version += 1
+                changed_technicians.append(technicians[technician_id])
+        Technician.objects.bulk_update(changed_technicians, ["resource_quantity", "version"])  # noqa
+
+        reserve_stock(cls.get_stock_deltas(changes))
+        record_assignment_changes(changes["removed"], changes["added"])
+
+        # bulk_update and bulk_create don't send post_save, so the cache and the change log are updated here. Deletes
+        # send post_delete, which logs them.
+        invalidate(Technician, ResourceAssignment)
+        record_changes(ResourceAssignment, [assignment.pk for assignment in changes["updated"].values()],
+                       Change.UPDATE)
+        record_changes(ResourceAssignment, [assignment.pk for assignment in changes["created"].values()],
+                       Change.CREATE)
+        record_changes(Technician, [technician.pk for technician in changed_technicians], Change.UPDATE)
+
+        return [
+            {"index": index, "op": operation["op"],
+             "id": operation["id"] if "id" in operation else changes["created"][index].pk}
+            for index, operation in operations.items()
+        ]
+
+
+class ResourceAssignmentViewSet(VersionedMixin, CachedResponseMixin, RowListMixin, ExportMixin, ExpandMixin,
+                                IncludeInactiveMixin, ModelViewSet):
     """Handles creating, listing, retrieving, updating and deleting resource assignments."""
 
     queryset = ResourceAssignment.objects.all()  # noqa
     serializer_class = ResourceAssignmentSerializer
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
+    ordering = ("id",)
+
+    expand_fields = {
+        "technician": Technician,
+        "resource": Resource,
+        "branch_office": BranchOffice,
+    }
+    cache_models = (ResourceAssignment,)
+
+    export_fields = ("id", "assignment_date", "quantity", "technician", "resource", "active",)
+    export_expressions = {
+        "technician_code": F("technician__code"),
+        "resource_name": F("resource__name"),
+    }
+
+    def expand_queryset(self, queryset, expand):
+        """Joins the technician, its branch office and the resource as expanded."""
+        related = []
+        if "technician" in expand:
+            related.append("technician__branch_office" if "branch_office" in expand else "technician")
+        if "resource" in expand:
+            related.append("resource")
+        return queryset.select_related(*related) if related else queryset
+
+    def get_queryset(self):
+        """Locks the assignment row for the actions that move quantities between technicians."""
+        queryset = super().get_queryset()
+        if self.action in ("update", "partial_update", "destroy"):
+            queryset = queryset.select_for_update().select_related("technician")
+        return queryset
+
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
-        """Adds to a technician's quantity before creation."""
-        technician = Technician.objects.get(pk=request.data["technician"])  # noqa
-        technician.resource_quantity += int(request.data["quantity"])
-        technician.save()
+        """Creates the assignment and updates the technician's quantity in a single transaction."""
         return super().create(request, *args, **kwargs)
 
+    @transaction.atomic
+    def update(self, request, *args, **kwargs):
+        """Updates the assignment and the technicians' quantities in a single transaction."""
+        return super().update(request, *args, **kwargs)
+
+    @transaction.atomic
     def destroy(self, request, *args, **kwargs):
-        """Removes from a technician's quantity before deletion."""
-        assignment = ResourceAssignment.objects.get(pk=kwargs["pk"])  # noqa
-        technician = Technician.objects.get(pk=assignment.technician.pk)  # noqa
-        assignment_quantity = int(assignment.quantity)
-        if technician.resource_quantity - assignment_quantity < 1:
-            raise ValidationError("Technicians cannot have 0 resources assigned.")
-        technician.resource_quantity -= assignment_quantity
-        technician.save()
+        """Deletes the assignment and updates the technician's quantity in a single transaction."""
         return super().destroy(request, *args, **kwargs)
 
-    def update(self, request, *args, **kwargs):
-        """Updates a technician's quantities before updating."""
-        new_quantity = int(request.data["quantity"])
-        if new_quantity < 1 or new_quantity > 10:
-            raise ValidationError("Invalid quantity.")
-
-        assignment = ResourceAssignment.objects.get(pk=kwargs["pk"])  # noqa
-        previous_technician = Technician.objects.get(pk=assignment.technician.pk)  # noqa
-        new_technician = Technician.objects.get(pk=request.data["technician"])  # noqa
-
-        previous_quantity = assignment.quantity
-        if previous_technician == new_technician:
-            previous_technician.resource_quantity += new_quantity - previous_quantity
-            previous_technician.save()
-            return super().update(request, *args, **kwargs)
-
-        if previous_technician.resource_quantity - previous_quantity < 1:
-            raise ValidationError("Technicians cannot have 0 resources assigned.")
-
-        previous_technician.resource_quantity -= previous_quantity
-        new_technician.resource_quantity += int(request.data["quantity"])
-        previous_technician.save()
-        new_technician.save()
-        return super().update(request, *args, **kwargs)
+    def perform_create(self, serializer):
+        """Adds to the technician's quantity and to the branch office's summary."""
+        create_assignment(serializer)
+
+    def perform_destroy(self, instance):
+        """Removes from the technician's quantity and from the branch office's summary."""
+        delete_assignment(instance)
+
+    def perform_update(self, serializer):
+        """Moves the quantities between the previous and the new technician."""
+        update_assignment(serializer)
+
+
+class SummaryFilterMixin:
+    """Filters summary rows by the branch_office and resource query params."""
+
+    summary_filters = ()
+
+    def get_queryset(self):
+        """Applies the filters present in the query params."""
+        queryset = super().get_queryset()  # noqa
+        for field in self.summary_filters:
+            value = self.request.query_params.get(field)  # noqa
+            if value is not None:
+                if not value.isdigit():
+                    raise ValidationError({field: "Expected an ID."})
+                queryset = queryset.filter(**{f"{field}_id": int(value)})
+        return queryset
+
+
+class BranchOfficeReportViewSet(SummaryFilterMixin, ReadOnlyModelViewSet):
+    """Lists the technician count and total base salary of every branch office, served from the summary table."""
+
+    queryset = BranchOfficeSummary.objects.select_related("branch_office")  # noqa
+    serializer_class = BranchOfficeSummarySerializer
+
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    ordering = ("pk",)
+    summary_filters = ("branch_office",)
+
+
+class BranchResourceReportViewSet(SummaryFilterMixin, ReadOnlyModelViewSet):
+    """Lists the assigned units of every resource per branch office, served from the summary table."""
+
+    queryset = BranchResourceSummary.objects.select_related("branch_office", "resource")  # noqa
+    serializer_class = BranchResourceSummarySerializer
+
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    ordering = ("branch_office_id", "resource_id",)
+    summary_filters = ("branch_office", "resource",)
+
+
+class PayrollProjectionApiView(APIView):
+    """
+    Projects the payroll and resource costs of the active technicians per branch office, computed from one query
+    over their columns. GET /api/report/payroll-projection takes raise_percent, branch_raises=3:10,4:2.5 overriding
+    it for some branch offices, unit_cost per assigned resource unit, percentiles=50,90 of the projected salaries and
+    branch_offices=1,2 to limit the projection to some branch offices.
+    """
+
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        """Returns the totals and the per branch office figures."""
+        serializer = PayrollProjectionSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        return Response(project_payroll(load_payroll(params["branch_offices"]), params["raise_percent"],
+                                        params["branch_raises"], params["unit_cost"], params["percentiles"]))
+
+
+class ChangeFeedApiView(APIView):
+    """
+    Incremental sync of technicians, assignments, branch offices and resources. GET /api/changes?since=<cursor>
+    returns the objects changed after the cursor, each one once as its current row or as a deleted ID, and the
+    cursor to send next; has_more asks to call again right away. Without since only the current cursor is returned,
+    to sync from after a full download. ?models= limits the feed to some models and ?limit= the log entries read.
+    """
+
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    # Every row goes through the row serializers, whose output FastJSONRenderer encodes exactly.
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
+
+    default_limit = 1000
+    max_limit = 10000
+
+    def get(self, request):
+        """Returns the changes after the cursor, or the current cursor."""
+        if "since" not in request.query_params:
+            return Response({"cursor": get_cursor(), "has_more": False, "changes": {}})
+
+        since = get_integer(request, "since", 0, 0)
+        limit = min(get_integer(request, "limit", self.default_limit, 1), self.max_limit)
+        models = {name.strip() for name in request.query_params.get("models", "").split(",")}
+        models.discard("")
+        invalid = models.difference(SYNCED_MODELS)
+        if invalid:
+            raise ValidationError({"models": f"Invalid values: {', '.join(sorted(invalid))}. "
+                                             f"Allowed values: {', '.join(SYNCED_MODELS)}."})
+
+        try:
+            changes, cursor, has_more = read_changes(since, limit, models)
+        except CursorExpired:
+            raise ExpiredCursor()
+        return Response({"cursor": cursor, "has_more": has_more, "changes": changes})
+
+
+class ResourceAvailabilityApiView(APIView):
+    """
+    Answers how many units of many resources are free at once. GET /api/resource/availability?ids=1,2,3 returns the
+    total and available stock of the given active resources, ?min_available= keeps the ones with at least that many
+    units free (untracked resources, never short, included). Both are read from the resources' stock columns and
+    availability index, never summed from the assignments.
+    """
+
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    max_ids = 1000
+
+    def get(self, request):
+        """Returns the stock of the resources."""
+        resources = Resource.objects.order_by("id")  # noqa
+        if "ids" in request.query_params:
+            ids = [value.strip() for value in request.query_params["ids"].split(",") if value.strip()]
+            if not all(value.isdigit() for value in ids) or len(ids) > self.max_ids:
+                raise ValidationError({"ids": f"Expected up to {self.max_ids} comma separated IDs."})
+            resources = resources.filter(pk__in=[int(value) for value in ids])
+
+        min_available = get_integer(request, "min_available", None, 1)
+        if min_available is not None:
+            resources = resources.filter(Q(available_stock__gte=min_available) | Q(available_stock__isnull=True))
+        return Response({"results": list(resources.values("id", "total_stock", "available_stock"))})
+
+
+class ResourceStockApiView(APIView):
+    """Sets the total stock of a resource, or stops tracking it with null. Staff only."""
+
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    def put(self, request, pk):
+        """Updates the stock and answers with the resource's availability."""
+        serializer = ResourceStockSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if not Resource.all_objects.filter(pk=pk).exists():  # noqa
+            raise Http404()
+        set_total_stock(pk, serializer.validated_data["total_stock"])
+        return Response(Resource.all_objects.values("id", "total_stock", "available_stock").get(pk=pk))  # noqa
+
+
+class RebuildSummariesApiView(APIView):
+    """Queues a rebuild_summaries job recomputing the report tables from scratch. Staff only."""
+
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    def post(self, request):
+        """Answers 202 with the queued job."""
+        return accepted(enqueue("rebuild_summaries", user=request.user))
+
+
+class JobViewSet(ReadOnlyModelViewSet):
+    """Lists and retrieves the status, progress and result of the user's jobs, or of every job for staff."""
+
+    queryset = Job.objects.all()  # noqa
+    serializer_class = JobSerializer
+
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    ordering = ("-id",)
+
+    def get_queryset(self):
+        """Keeps the other users' jobs out of reach of non staff users."""
+        queryset = super().get_queryset()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(user=self.request.user)
+        return queryset
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, *args, **kwargs):
+        """Downloads the file written by a succeeded export job."""
+        job = self.get_object()
+        path = get_job_file(job)
+        if job.status != Job.SUCCEEDED or path is None or not path.exists():
+            raise Http404("The job has no file to download.")
+        return FileResponse(path.open("rb"), as_attachment=True, filename=job.result["filename"],
+                            content_type=job.result["content_type"])
 
 
 class LoginViewSet(ViewSet):
@@ -133,3 +1217,19 @@ class LoginViewSet(ViewSet):
     def create(self, request):
         """Creates auth tokens on successful login."""
         return self.obtain_auth_token.as_view()(request=request._request)  # noqa
+
+    @action(detail=False, methods=["post"], authentication_classes=(CachedTokenAuthentication,),
+            permission_classes=(IsAuthenticated,))
+    def rotate(self, request):
+        """Replaces the request's token with a new one."""
+        with transaction.atomic():
+            Token.objects.filter(user=request.user).delete()  # noqa
+            token = Token.objects.create(user=request.user)  # noqa
+        return Response(data={"token": token.key})
+
+    @action(detail=False, methods=["post"], authentication_classes=(CachedTokenAuthentication,),
+            permission_classes=(IsAuthenticated,))
+    def logout(self, request):
+        """Deletes the request's token."""
+        Token.objects.filter(user=request.user).delete()  # noqa
+        return Response(status=status.HTTP_204_NO_CONTENT)
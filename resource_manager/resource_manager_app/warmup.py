@@ -0,0 +1,57 @@
+"""Worker warm up before serving the first request."""
+
+import gc
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.settings import api_settings
+from .changes import SYNCED_MODELS
+from .serializers import get_row_serializer
+
+API_SETTINGS = ("DEFAULT_AUTHENTICATION_CLASSES", "DEFAULT_PERMISSION_CLASSES", "DEFAULT_RENDERER_CLASSES",
+                "DEFAULT_PARSER_CLASSES", "DEFAULT_CONTENT_NEGOTIATION_CLASS", "DEFAULT_PAGINATION_CLASS",
+                "EXCEPTION_HANDLER")
+
+
+def get_view_classes(patterns):
+    """Yields the class of every class based view routed by the URL patterns."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from get_view_classes(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            view_class = getattr(pattern.callback, "cls", None) or getattr(pattern.callback, "view_class", None)
+            if view_class is not None:
+                yield view_class
+
+
+def warm_up():
+    """
+    Does the work the first requests of a worker would otherwise pay for: compiles the URL patterns, imports the
+    REST framework classes named in its settings, builds the fields of every view's serializer and compiles the row
+    serializers.
+    """
+    resolver = get_resolver()
+    resolver.reverse_dict  # noqa
+    for name in API_SETTINGS:
+        getattr(api_settings, name)
+
+    serializer_classes = {serializer_class for _, serializer_class in SYNCED_MODELS.values()}
+    for view_class in set(get_view_classes(resolver.url_patterns)):
+        serializer_class = getattr(view_class, "serializer_class", None)
+        if serializer_class is not None:
+            serializer_class().fields  # noqa
+            if getattr(view_class, "row_list", False):
+                serializer_classes.add(serializer_class)
+    for serializer_class in serializer_classes:
+        get_row_serializer(serializer_class)
+
+
+def preload():
+    """
+    Warms the application up in a server process about to fork its workers, so they start warm and share the memory.
+    Database connections opened meanwhile are closed, as children must not inherit them, and the objects created so
+    far are moved out of the garbage collector's reach, whose collections would otherwise copy their pages in every
+    worker.
+    """
+    warm_up()
+    connections.close_all()
+    gc.freeze()